@@ -1,36 +1,1283 @@
+import argparse
+import bisect
+import io
+import json
+import math
+import multiprocessing
+import queue
+import re
+import resource
+import signal
 import subprocess
 import os
 import sys
 import shutil
-import pytesseract
-from PIL import Image
-import pyperclip
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+from pdf_writer import PdfWriter, fit_options
+from md_writer import MarkdownWriter, format_timestamp
+from frame_index import FrameIndex, frame_number
+from frame_cache import FrameCache, DEFAULT_MAX_BYTES, settings_key
+from ocr_engine import ENGINES as OCR_ENGINES, create_engine, engine_class, resolve_engine
+from search_index import SearchIndex, INDEX_FILE as SEARCH_INDEX_FILE
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 def check_command(command):
     if shutil.which(command) is None:
         print(f"Error: {command} is not installed or not in PATH.")
         sys.exit(1)
 
-def extract_text_from_images(image_dir):
-    print("Extracting text from images using OCR...")
-    text_content = ""
-    image_files = sorted([
+def list_frames(image_dir):
+    """Frame image paths in image_dir, in frame order.
+
+    Sorted by frame number rather than by name, as ffmpeg's frame%04d names
+    grow a fifth digit after frame9999.
+    """
+    return sorted([
         os.path.join(image_dir, img)
         for img in os.listdir(image_dir)
         if img.endswith('.png') or img.endswith('.jpg')
-    ])
-    for img_path in image_files:
-        print(f"Processing {img_path}...")
+    ], key=lambda path: (frame_number(path) or 0, path))
+
+# Video timestamp of every extracted frame, written next to the frames
+FRAME_TIMES_FILE = 'frame_times.json'
+
+# Per-run frame index, written next to output.pdf and output.md
+INDEX_FILE = 'frames.db'
+
+def save_frame_times(image_dir, timestamps):
+    """Record the video timestamp of frame0001.png, frame0002.png, ... in image_dir"""
+    times = {f'frame{index + 1:04d}.png': round(timestamp, 6) for index, timestamp in enumerate(timestamps)}
+    with open(os.path.join(image_dir, FRAME_TIMES_FILE), 'w') as f:
+        json.dump(times, f)
+
+def load_frame_times(image_dir):
+    """Video timestamps by frame name, as saved by extract_frames ({} if unknown)"""
+    try:
+        with open(os.path.join(image_dir, FRAME_TIMES_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _frame_id(frame):
+    """Frame number of a frame path (from its name) or a PIL frame (from its info)"""
+    if isinstance(frame, str):
+        return frame_number(frame)
+    return frame.info.get('frame')
+
+def index_frames(index, image_dir):
+    """Add a row to index for every frame in image_dir, with its video timestamp"""
+    timestamps = load_frame_times(image_dir)
+    for img_path in list_frames(image_dir):
+        name = os.path.basename(img_path)
+        index.add(frame_number(name), name, timestamps.get(name))
+    index.commit()
+
+def _index_stream(frames, index):
+    """Pass streamed frames through, adding a row to index for each one"""
+    for frame in frames:
+        index.add(frame.info.get('frame'), None, frame.info.get('timestamp'))
+        yield frame
+
+def _frame_time(frame, timestamps=None):
+    """Video timestamp of a frame path (looked up in timestamps) or a PIL frame (from its info)"""
+    if isinstance(frame, str):
+        return (timestamps or {}).get(os.path.basename(frame))
+    return frame.info.get('timestamp')
+
+# OCR engines created in this process, by name; each keeps its model loaded
+_ocr_engines = {}
+
+def _init_ocr_worker(engine=None):
+    # Tesseract spins up its own OpenMP threads per call; with one process per
+    # core that oversubscribes the CPU, so pin each worker to a single thread.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    # Load the recognizer once per worker rather than once per frame
+    _ocr_engines[engine] = create_engine(engine)
+
+def _prepare_frame(frame, preprocess, layout=None):
+    import ocr_preprocess
+    if isinstance(frame, str):
+        from PIL import Image
+        with Image.open(frame) as img:
+            return ocr_preprocess.prepare(img, preprocess, layout)
+    return ocr_preprocess.prepare(frame, preprocess, layout)
+
+def _ocr_batch(images, engine=None, preprocess="grayscale", words=False):
+    """OCR a list of frames (paths or PIL images) with this process's engine, returning
+    [(text, error)], or [(text, error, words)] with word boxes in frame pixels if words is set"""
+    if engine not in _ocr_engines:
+        _ocr_engines[engine] = create_engine(engine)
+    results = [None] * len(images)
+    prepared = []
+    for index, frame in enumerate(images):
+        layout = []
         try:
-            img = Image.open(img_path)
-            # Optionally preprocess the image for better OCR accuracy
-            img = img.convert('L')  # Convert to grayscale
-            # img = img.point(lambda x: 0 if x < 128 else 255, '1')  # Binarize image
-            text = pytesseract.image_to_string(img)
-            text_content += text + "\n\n"
+            img = _prepare_frame(frame, preprocess, layout)
         except Exception as e:
-            print(f"Error processing {img_path}: {e}")
-    return text_content
+            results[index] = ("", str(e), []) if words else ("", str(e))
+            continue
+        if img is None:
+            results[index] = ("", None, []) if words else ("", None)  # no text found, nothing to recognize
+        else:
+            prepared.append((index, img, layout))
+    recognized = []
+    if prepared:
+        recognizer = _ocr_engines[engine]
+        images = [img for _, img, _ in prepared]
+        recognized = recognizer.recognize_batch(images, words=True) if words else recognizer.recognize_batch(images)
+    for (index, _, layout), result in zip(prepared, recognized):
+        if words:
+            import ocr_preprocess
+            text, error, boxes = result
+            result = (text, error, ocr_preprocess.map_words(boxes, layout))
+        results[index] = result
+    return results
+
+def _batches(frames, size, grayscale=False):
+    batch = []
+    for frame in frames:
+        if grayscale and not isinstance(frame, str):
+            frame = frame.convert('L')  # a third of the bytes to pickle
+        batch.append(frame)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def ocr_frames(frames, ocr_workers=None, progress=None, engine=None, preprocess="regions", words=False):
+    """OCR an iterable of frame paths or PIL images, yielding (text, error) in frame order,
+    or (text, error, words) with each frame's word boxes if words is set.
+
+    ocr_workers sets the size of the process pool (defaults to the core
+    count); 1 runs everything in the current process. Only a few frames
+    per worker are in flight at once, so streamed input stays bounded.
+    progress(done, total, "frames") is called after each frame; total is
+    None when frames has no length.
+
+    engine is one of ocr_engine.ENGINES (default "auto": tesserocr when
+    installed, else batched tesseract runs). Each worker keeps its engine for
+    the whole run and gets frames in batches of the engine's batch_size.
+
+    preprocess is one of ocr_preprocess.MODES: "regions" (default) OCRs only
+    the detected text regions, scaled to a fixed x-height and binarized, and
+    skips frames without any; "grayscale" OCRs the whole frame.
+    """
+    if ocr_workers is None:
+        ocr_workers = os.cpu_count() or 1
+    ocr_workers = max(1, int(ocr_workers))
+    if progress is not None:
+        yield from _counted(ocr_frames(frames, ocr_workers, engine=engine, preprocess=preprocess, words=words),
+                            progress, len(frames) if hasattr(frames, '__len__') else None)
+        return
+    engine = resolve_engine(engine)
+    batch_size = engine_class(engine).batch_size
+    if hasattr(frames, '__len__'):
+        # Enough batches to keep every worker busy
+        batch_size = max(1, min(batch_size, math.ceil(len(frames) / ocr_workers)))
+
+    if ocr_workers == 1:
+        for batch in _batches(frames, batch_size):
+            yield from _ocr_batch(batch, engine, preprocess, words)
+        return
+
+    print(f"Using {ocr_workers} OCR workers ({engine})")
+    executor = ProcessPoolExecutor(max_workers=ocr_workers, initializer=_init_ocr_worker, initargs=(engine,))
+    pending = deque()
+    try:
+        for batch in _batches(frames, batch_size, grayscale=True):
+            pending.append(executor.submit(_ocr_batch, batch, engine, preprocess, words))
+            if len(pending) >= ocr_workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def _load_gray(frame):
+    if isinstance(frame, str):
+        from PIL import Image
+        with Image.open(frame) as img:
+            return img.convert('L')
+    return frame.convert('L')
+
+def ocr_frames_incremental(frames, ocr_workers=None, progress=None, engine=None, words=False):
+    """Diff-aware OCR of an iterable of frame paths or PIL images, yielding
+    (markdown, error) per frame with only the text that changed.
+
+    Each frame is compared with the previous one tile by tile
+    (ocr_preprocess.changed_tiles). A text region with the same box as in the
+    previous frame and no changed tile keeps its text; only new or changed
+    regions go to the OCR pool. A frame's markdown holds the text of those
+    regions that the previous frame did not already show, or, when less than
+    half of the previous frame's regions are kept (a new slide), all of its
+    text after a horizontal rule.
+
+    With words set, (markdown, error, words) is yielded instead, words being
+    the boxes of every word on the frame, reused regions included.
+    """
+    import ocr_preprocess
+    if ocr_workers is None:
+        ocr_workers = os.cpu_count() or 1
+    ocr_workers = max(1, int(ocr_workers))
+    if progress is not None:
+        yield from _counted(ocr_frames_incremental(frames, ocr_workers, engine=engine, words=words), progress,
+                            len(frames) if hasattr(frames, '__len__') else None)
+        return
+    engine = resolve_engine(engine)
+    executor = None
+    if ocr_workers > 1:
+        print(f"Using {ocr_workers} OCR workers ({engine}, incremental)")
+        executor = ProcessPoolExecutor(max_workers=ocr_workers, initializer=_init_ocr_worker, initargs=(engine,))
+
+    previous = None      # (analysis copy, regions) of the last planned frame
+    previous_texts = []  # region texts of the last finished frame
+    previous_words = []  # and their word boxes, in frame pixels
+    shown = False        # whether any markdown has been produced yet
+
+    def plan(frame):
+        """Work out which regions need OCR and start it; returns (reuse, new_slide, work)"""
+        nonlocal previous
+        gray = _load_gray(frame)
+        small, factor, regions, scale = ocr_preprocess.find_text(gray)
+        changed = ocr_preprocess.changed_tiles(previous[0] if previous else None, small)
+        known = {} if changed is None else {box: index for index, box in enumerate(previous[1])}
+        # Index of the same region in the previous frame, or None to OCR it
+        reuse = [None if changed is None or ocr_preprocess.region_changed(changed, box) else known.get(box)
+                 for box in regions]
+        kept = sum(index is not None for index in reuse)
+        new_slide = changed is None or kept * 2 < len(previous[1])
+        crops, layouts = [], []
+        for box, index in zip(regions, reuse):
+            if index is None:
+                layouts.append([])  # where the crop came from, to map its word boxes back
+                crops.append(ocr_preprocess.render(gray, [box], factor, scale, layouts[-1]))
+        previous = (small, regions)
+        if not crops:
+            return reuse, new_slide, layouts, []
+        if executor is None:
+            return reuse, new_slide, layouts, _ocr_batch(crops, engine, words=words)
+        return reuse, new_slide, layouts, executor.submit(_ocr_batch, crops, engine, "grayscale", words)
+
+    def finish(planned):
+        """Markdown and error (and words) for a planned frame, once its OCR is done"""
+        nonlocal previous_texts, previous_words, shown
+        reuse, new_slide, layouts, work = planned
+        results = iter(work if isinstance(work, list) else work.result())
+        layouts = iter(layouts)
+        texts, boxes, fresh, errors = [], [], [], []
+        for index in reuse:
+            if index is None:
+                text, error, *found = next(results)
+                if error is not None:
+                    errors.append(error)
+                texts.append(text.strip() if error is None else None)
+                boxes.append(ocr_preprocess.map_words(found[0], next(layouts)) if words else [])
+            else:
+                texts.append(previous_texts[index])
+                boxes.append(previous_words[index])
+            fresh.append(index is None)
+        if new_slide:
+            markdown = "\n\n".join(text for text in texts if text)
+            if markdown and shown:
+                markdown = "---\n\n" + markdown
+        else:
+            seen = set(previous_texts)
+            markdown = "\n\n".join(text for text, new in zip(texts, fresh) if new and text and text not in seen)
+        previous_texts = texts
+        previous_words = boxes
+        shown = shown or bool(markdown)
+        if words:
+            return markdown, "; ".join(errors) or None, [word for region in boxes for word in region]
+        return markdown, "; ".join(errors) or None
+
+    def failed(e):
+        return ("", str(e), []) if words else ("", str(e))
+
+    pending = deque()
+    try:
+        for frame in frames:
+            try:
+                pending.append(plan(frame))
+            except Exception as e:
+                previous = None  # compare the next frame with nothing
+                pending.append(e)
+            while len(pending) > (ocr_workers * 2 if executor else 0):
+                item = pending.popleft()
+                yield failed(item) if isinstance(item, Exception) else finish(item)
+        while pending:
+            item = pending.popleft()
+            yield failed(item) if isinstance(item, Exception) else finish(item)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def _counted(items, progress, total=None, unit="frames"):
+    """Pass items through, calling progress(done, total, unit) after each one"""
+    for done, item in enumerate(items, start=1):
+        yield item
+        progress(done, total, unit)
+
+def extract_text_from_frames(frames, ocr_workers=None, progress=None, engine=None, preprocess="regions",
+                             incremental=False, writer=None, timestamps=None):
+    """OCR an iterable of frame paths or PIL images into Markdown, in frame order.
+
+    Each frame's text goes to writer (a MarkdownWriter) as soon as it is
+    recognized, headed by its position (the PDF page) and video timestamp:
+    from timestamps (by frame name) for paths, from info['timestamp'] for
+    images. Without a writer the Markdown is returned as a string.
+    With incremental set, only text that changed from frame to frame is kept
+    (see ocr_frames_incremental); preprocess is then always "regions".
+    """
+    if writer is None:
+        buffer = io.StringIO()
+        with MarkdownWriter(buffer) as writer:
+            extract_text_from_frames(frames, ocr_workers, progress, engine, preprocess, incremental,
+                                     writer, timestamps)
+        return buffer.getvalue()
+
+    if hasattr(frames, '__len__'):
+        times = deque(_frame_time(frame, timestamps) for frame in frames)
+    else:
+        # Streamed frames: note each timestamp as the frame is pulled into OCR
+        times = deque()
+
+        def noted(frames):
+            for frame in frames:
+                times.append(_frame_time(frame, timestamps))
+                yield frame
+
+        frames = noted(frames)
+    if incremental:
+        results = ocr_frames_incremental(frames, ocr_workers, progress, engine)
+    else:
+        results = ocr_frames(frames, ocr_workers, progress, engine, preprocess)
+    for page, (text, error) in enumerate(results, start=1):
+        timestamp = times.popleft()
+        if error is not None:
+            print(f"Error processing frame {page}: {error}")
+            continue
+        print(f"Processed frame {page}")
+        writer.add_frame(page, text, timestamp)
+
+def extract_text_from_images(image_dir, ocr_workers=None, progress=None, engine=None, preprocess="regions",
+                             incremental=False, writer=None):
+    """OCR every frame in image_dir, in frame order (see extract_text_from_frames)"""
+    print("Extracting text from images using OCR...")
+    image_files = list_frames(image_dir)
+    if ocr_workers is None:
+        ocr_workers = os.cpu_count() or 1
+    return extract_text_from_frames(image_files, min(int(ocr_workers), len(image_files) or 1), progress,
+                                    engine, preprocess, incremental, writer, load_frame_times(image_dir))
+
+def compile_searchable_pdf(frames, pdf_file, writer, pdf_options=None, index=None, timestamps=None,
+                           ocr_workers=None, progress=None, engine=None, preprocess="regions", incremental=False):
+    """OCR frames and build a searchable pdf_file from them in the same pass.
+
+    Each page gets the frame plus an invisible text layer from the OCR word
+    boxes, and its text goes to writer (a MarkdownWriter) as in
+    extract_text_from_frames, so every frame is decoded and recognized once.
+    Page numbers and offsets are recorded in index as in compile_pdf.
+    """
+    print("Compiling images into a searchable PDF...")
+    options = pdf_writer_options(pdf_options, frames)
+    if hasattr(frames, '__len__'):
+        next_frame = iter(frames).__next__
+    else:
+        # Streamed frames: keep the ones in flight in OCR until their text is back
+        in_flight = deque()
+
+        def noted(frames):
+            for frame in frames:
+                in_flight.append(frame)
+                yield frame
+
+        next_frame = in_flight.popleft
+        frames = noted(frames)
+    if incremental:
+        results = ocr_frames_incremental(frames, ocr_workers, progress, engine, words=True)
+    else:
+        results = ocr_frames(frames, ocr_workers, progress, engine, preprocess, words=True)
+    with PdfWriter(pdf_file, **options) as pdf:
+        for text, error, words in results:
+            frame = next_frame()
+            page = pdf.add_page(frame, words=words) + 1
+            if index is not None:
+                index.set_page(_frame_id(frame), page, pdf.image_offset(page - 1))
+            if error is not None:
+                print(f"Error processing frame {page}: {error}")
+                continue
+            print(f"Processed frame {page}")
+            writer.add_frame(page, text, _frame_time(frame, timestamps))
+
+def dhash(img, hash_size=8):
+    """Difference hash of an image as a hash_size*hash_size bit integer"""
+    from PIL import Image
+    img = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = img.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+# A 64-bit dHash barely sees text, so slides sharing a template hash alike.
+# Before a frame is dropped as a duplicate, grayscale copies this wide are
+# compared: it differs when more than DEDUP_PIXEL_SHARE of the pixels are
+# over DEDUP_PIXEL_LEVELS apart. Compression and sensor noise average out
+# at this size; a changed line of text does not.
+DEDUP_THUMBNAIL_WIDTH = 160
+DEDUP_PIXEL_LEVELS = 32
+DEDUP_PIXEL_SHARE = 0.002
+
+def dedup_thumbnail(img):
+    """Small grayscale copy of a frame for thumbnails_differ"""
+    from PIL import Image
+    height = max(1, round(img.height * DEDUP_THUMBNAIL_WIDTH / img.width))
+    return img.convert('L').resize((DEDUP_THUMBNAIL_WIDTH, height), Image.BILINEAR)
+
+def thumbnail_change(a, b):
+    """Share of the pixels of two dedup_thumbnail copies that are over DEDUP_PIXEL_LEVELS apart"""
+    if a.size != b.size:
+        return 1.0
+    import numpy as np
+    changed = np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)) > DEDUP_PIXEL_LEVELS
+    return float(changed.mean())
+
+def thumbnails_differ(a, b):
+    """Whether two dedup_thumbnail copies show different content"""
+    return thumbnail_change(a, b) > DEDUP_PIXEL_SHARE
+
+def _thumbnail_file(img_path):
+    from PIL import Image
+    with Image.open(img_path) as img:
+        return dedup_thumbnail(img)
+
+def select_unique_frames(image_files, max_distance=5, hashes=None, progress=None):
+    """Frames whose dHash is more than max_distance bits from the last kept frame.
+
+    A frame within max_distance is only dropped if thumbnails_differ also
+    finds it unchanged. hashes maps frame file names to already known dHashes
+    and is filled in for every frame hashed here, so callers can keep it
+    between runs.
+    """
+    from PIL import Image
+    if hashes is None:
+        hashes = {}
+    kept = []
+    last_hash = None
+    last_thumbnail = None  # of kept[-1], made when first needed
+    frames = image_files if progress is None else _counted(image_files, progress, len(image_files))
+    for img_path in frames:
+        name = os.path.basename(img_path)
+        if name not in hashes:
+            try:
+                with Image.open(img_path) as img:
+                    hashes[name] = dhash(img)
+            except Exception as e:
+                print(f"Error hashing {img_path}: {e}")
+                kept.append(img_path)
+                # Compare the next frame with this one, which cannot match anything
+                last_hash = last_thumbnail = None
+                continue
+        frame_hash = hashes[name]
+        if last_hash is not None and hamming_distance(frame_hash, last_hash) <= max_distance:
+            try:
+                if last_thumbnail is None:
+                    last_thumbnail = _thumbnail_file(kept[-1])
+                duplicate = not thumbnails_differ(last_thumbnail, _thumbnail_file(img_path))
+            except Exception as e:
+                print(f"Error comparing {img_path}: {e}")
+                duplicate = False
+            if duplicate:
+                continue
+        last_hash = frame_hash
+        last_thumbnail = None
+        kept.append(img_path)
+    print(f"Dropped {len(image_files) - len(kept)} of {len(image_files)} frames as duplicates")
+    return kept
+
+def dedup_frames(image_dir, max_distance=5, progress=None, hashes=None):
+    """Delete frames whose dHash is within max_distance bits of the last kept frame.
+
+    hashes is filled in as in select_unique_frames. Returns the number of frames dropped.
+    """
+    print("Removing near-duplicate frames...")
+    image_files = list_frames(image_dir)
+    kept = set(select_unique_frames(image_files, max_distance, hashes=hashes, progress=progress))
+    for img_path in image_files:
+        if img_path not in kept:
+            os.remove(img_path)
+    return len(image_files) - len(kept)
+
+def iter_unique_frames(frames, max_distance=5, hashes=None):
+    """Streaming counterpart of dedup_frames: yield only frames that differ from the last kept one.
+
+    hashes, if given, is filled with the dHash of every frame by frame number.
+    """
+    last_hash = last_thumbnail = None
+    total = dropped = 0
+    for frame in frames:
+        total += 1
+        frame_hash = dhash(frame)
+        if hashes is not None:
+            hashes[_frame_id(frame)] = frame_hash
+        thumbnail = dedup_thumbnail(frame)
+        if (last_hash is not None and hamming_distance(frame_hash, last_hash) <= max_distance
+                and not thumbnails_differ(last_thumbnail, thumbnail)):
+            dropped += 1
+            continue
+        last_hash, last_thumbnail = frame_hash, thumbnail
+        yield frame
+    print(f"Dropped {dropped} of {total} frames as duplicates")
+
+def build_ffmpeg_cmd(video_file, method, param, output_args):
+    """ffmpeg command extracting frames by method "1" (fixed interval) or "2" (scene change)"""
+    if method == "1":
+        return [
+            'ffmpeg',
+            '-i', video_file,
+            '-vf', f'fps=1/{param}',
+            *output_args
+        ]
+    return [
+        'ffmpeg',
+        '-i', video_file,
+        '-vf', f"select='gt(scene,{param})',showinfo",  # showinfo logs each kept frame's pts_time
+        '-vsync', 'vfr',
+        *output_args
+    ]
+
+# ffmpeg output options for uncompressed frames on stdout, read back with _read_ppm
+PPM_PIPE_ARGS = ['-f', 'image2pipe', '-pix_fmt', 'rgb24', '-vcodec', 'ppm', '-']
+
+def _read_ppm(stream):
+    """Read one binary PPM image from stream, or None at end of stream"""
+    tokens = []
+    token = b""
+    while len(tokens) < 4:  # magic, width, height, maxval
+        c = stream.read(1)
+        if not c:
+            return None
+        if c.isspace():
+            if token:
+                tokens.append(token)
+                token = b""
+        else:
+            token += c
+    size = (int(tokens[1]), int(tokens[2]))
+    data = stream.read(size[0] * size[1] * 3)
+    if len(data) < size[0] * size[1] * 3:
+        return None
+    from PIL import Image
+    return Image.frombytes('RGB', size, data)
+
+def iter_video_frames(video_file, method="1", param=0.5, fast_seek=None, extract_workers=None,
+                      scene_detector=None, progress=None):
+    """Yield extracted frames as PIL images piped straight out of ffmpeg.
+
+    ffmpeg writes uncompressed PPM frames to stdout, so nothing touches the
+    disk and no PNG is encoded or decoded along the way. fast_seek applies to
+    method "1" as in extract_frames; "keyframes" decodes the keyframes in a
+    single pass here and gives every sample time the latest one at or before
+    it, so the frames are the same as on disk. scene_detector also works as
+    in extract_frames, without a score cache.
+    progress is reported as in extract_frames.
+    """
+    print("Extracting frames...")
+    if method == "1" and fast_seek == "seek":
+        yield from _iter_seek_frames(video_file, param, extract_workers, progress)
+        return
+    if method == "1" and fast_seek == "keyframes":
+        yield from _iter_keyframe_frames(video_file, param, progress)
+        return
+    if method == "3":
+        yield from _iter_frames_at(video_file, adaptive_timestamps(video_file, param, extract_workers, progress),
+                                   extract_workers)
+        return
+    if method != "1" and scene_detector == "numpy":
+        cuts = scene_scores(video_file, progress=progress).cuts(param)
+        yield from _iter_frames_at(video_file, [timestamp for timestamp, _ in cuts], extract_workers, progress)
+        return
+    ffmpeg_cmd = build_ffmpeg_cmd(video_file, method, param, PPM_PIPE_ARGS)
+    duration = get_video_duration(video_file) if progress is not None else None
+    if duration:
+        ffmpeg_cmd = _with_progress(ffmpeg_cmd)
+    # Scene frames get their timestamps from showinfo on stderr
+    scene_times = queue.Queue() if method != "1" else None
+    proc = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE if duration or scene_times else subprocess.DEVNULL)
+    if duration or scene_times:
+        lines = io.TextIOWrapper(proc.stderr, errors='replace')
+        if scene_times is not None:
+            lines = _note_frame_times(lines, scene_times)
+        threading.Thread(target=_watch_progress if duration else _drain, daemon=True,
+                         args=(lines, progress, duration)).start()
+    count = 0
+    try:
+        while True:
+            frame = _read_ppm(proc.stdout)
+            if frame is None:
+                break
+            if scene_times is None:
+                frame.info['timestamp'] = round(count * param, 6)
+            else:
+                try:
+                    frame.info['timestamp'] = scene_times.get(timeout=5.0)
+                except queue.Empty:
+                    pass
+            count += 1
+            frame.info['frame'] = count  # numbered like the frame%04d files
+            yield frame
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    if count == 0:
+        raise Exception("No frames were extracted. Try adjusting the parameters.")
+
+def _with_progress(cmd):
+    """ffmpeg cmd with -progress reports on stderr.
+
+    The extra null output decodes alongside the real one, so the reported
+    position keeps moving while a filter such as the scene select drops frames.
+    """
+    return [cmd[0], '-nostats', '-progress', 'pipe:2', *cmd[1:], '-map', '0:v:0', '-f', 'null', '-']
+
+def _note_frame_times(lines, times):
+    """Pass ffmpeg stderr lines through, putting showinfo's pts_time values on the times queue"""
+    for line in lines:
+        match = re.search(r"pts_time:\s*(-?[\d.]+)", line)
+        if match:
+            times.put(float(match.group(1)))
+        yield line
+
+def _drain(lines, *_):
+    for _ in lines:
+        pass
+
+def _watch_progress(lines, progress, duration, output=None):
+    """Turn ffmpeg -progress lines into progress(seconds, duration, "seconds") calls.
+
+    Every line is also appended to output, if given.
+    """
+    for line in lines:
+        if output is not None:
+            output.append(line)
+        if line.startswith('out_time_us='):
+            value = line.split('=', 1)[1].strip()
+            if value.lstrip('-').isdigit():
+                progress(min(max(int(value) / 1e6, 0.0), duration), duration, "seconds")
+        elif line.startswith('progress=end'):
+            progress(duration, duration, "seconds")
+
+def _run_ffmpeg(cmd, progress=None, duration=None):
+    """Run an ffmpeg command to completion and return its stderr.
+
+    With progress and the input duration (seconds of input cmd decodes),
+    progress(seconds, duration, "seconds") follows how far it has got.
+    """
+    if progress is None or not duration:
+        result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True)
+        return result.stderr
+    proc = subprocess.Popen(_with_progress(cmd), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    output = []
+    try:
+        _watch_progress(proc.stderr, progress, duration, output)
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stderr.close()
+    return ''.join(output)
+
+def _split_progress(progress, total, parts, unit="seconds"):
+    """Callbacks for parts running in parallel, reporting their summed progress to progress"""
+    if progress is None:
+        return [None] * parts
+    done = [0.0] * parts
+
+    def part(index):
+        def report(value, _total=None, _unit=None):
+            done[index] = value
+            progress(min(sum(done), total), total, unit)
+        return report
+    return [part(index) for index in range(parts)]
+
+def get_video_duration(video_file):
+    """Duration in seconds from ffmpeg's input summary, or None if the container doesn't say"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-i', video_file],
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def interval_timestamps(duration, interval):
+    """Sample times of fixed-interval extraction: 0, interval, 2*interval, ... before the end"""
+    count = max(1, math.ceil(duration / interval - 1e-9))
+    return [round(k * interval, 6) for k in range(count)]
+
+def _seek_cmd(video_file, timestamp, output_args):
+    # Input-side -ss seeks to the keyframe before timestamp and decodes only
+    # from there, instead of decoding the video from the start. Rounding down
+    # keeps a frame's exact timestamp from landing on the frame after it.
+    return ['ffmpeg', '-ss', f'{math.floor(timestamp * 1000) / 1000:.3f}', '-i', video_file,
+            '-frames:v', '1', *output_args]
+
+def _grab_frame(video_file, timestamp, output):
+    subprocess.run(_seek_cmd(video_file, timestamp, ['-y', output]),
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def _grab_frame_image(video_file, timestamp):
+    result = subprocess.run(_seek_cmd(video_file, timestamp, PPM_PIPE_ARGS),
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return _read_ppm(io.BytesIO(result.stdout))
+
+def _iter_seek_frames(video_file, interval, workers=None, progress=None):
+    duration = get_video_duration(video_file)
+    if not duration:
+        raise Exception("Could not read the video duration needed for fast seeking.")
+    yield from _iter_frames_at(video_file, interval_timestamps(duration, interval), workers, progress)
+
+def _iter_keyframe_frames(video_file, interval, progress=None):
+    """Streaming counterpart of extract_frames_fast with mode "keyframes".
+
+    One ffmpeg pass decodes only the keyframes; each sample time gets the
+    latest keyframe at or before it, as on disk, so samples past the last
+    keyframe repeat it rather than being cut.
+    """
+    duration = get_video_duration(video_file)
+    if not duration:
+        raise Exception("Could not read the video duration needed for fast seeking.")
+    timestamps = interval_timestamps(duration, interval)
+    cmd = ['ffmpeg', '-skip_frame', 'nokey', '-i', video_file, '-vf', 'showinfo', '-vsync', 'vfr', *PPM_PIPE_ARGS]
+    if progress is not None:
+        cmd = _with_progress(cmd)
+    keyframe_times = queue.Queue()
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    lines = _note_frame_times(io.TextIOWrapper(proc.stderr, errors='replace'), keyframe_times)
+    threading.Thread(target=_watch_progress if progress is not None else _drain, daemon=True,
+                     args=(lines, progress, duration)).start()
+
+    def next_keyframe():
+        frame = _read_ppm(proc.stdout)
+        if frame is None:
+            return None, None
+        try:
+            return frame, keyframe_times.get(timeout=5.0)
+        except queue.Empty:
+            return frame, None
+
+    try:
+        current = None
+        upcoming, upcoming_time = next_keyframe()
+        for index, timestamp in enumerate(timestamps):
+            # Move on to every keyframe at or before this sample
+            while upcoming is not None and (current is None or (upcoming_time is not None
+                                                                and upcoming_time <= timestamp + 1e-6)):
+                current = upcoming
+                upcoming, upcoming_time = next_keyframe()
+            if current is None:
+                break
+            frame = current.copy()
+            frame.info['timestamp'] = timestamp
+            frame.info['frame'] = index + 1
+            yield frame
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    if current is None:
+        raise Exception("No frames were extracted. Try adjusting the parameters.")
+
+def _iter_frames_at(video_file, timestamps, workers=None, progress=None):
+    """Yield the frames at timestamps in order, grabbed by parallel seeks"""
+    workers = workers or os.cpu_count() or 1
+    count = done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for timestamp in timestamps:
+            pending.append(executor.submit(_grab_frame_image, video_file, timestamp))
+            while pending and (len(pending) >= workers * 2 or done + len(pending) == len(timestamps)):
+                frame = pending.popleft().result()
+                done += 1
+                if progress is not None:
+                    progress(done, len(timestamps), "frames")
+                if frame is not None:
+                    frame.info['timestamp'] = timestamps[done - 1]
+                    frame.info['frame'] = done
+                    count += 1
+                    yield frame
+    if count == 0:
+        raise Exception("No frames were extracted. Try adjusting the parameters.")
+
+# Without a keyframe list, slide changes are bisected down to this many seconds
+ADAPTIVE_PRECISION = 0.1
+
+# A frame that changes a slide takes a good share of a keyframe's bytes to
+# encode. When no packet before a keyframe is more than this share of it over
+# the typical (median) packet there, the picture only changed at the
+# keyframe and nothing needs decoding to tell
+STATIC_PACKET_SHARE = 0.05
+
+def video_packets(video_file):
+    """(time, bytes, keyframe) of every video packet in presentation order,
+    from a stream copy (nothing is decoded); [] if ffmpeg cannot list them"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-nostats', '-i', video_file, '-map', '0:v:0', '-c', 'copy',
+                             '-f', 'framecrc', '-'],
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    timebase = re.search(r"^#tb 0: (\d+)/(\d+)", result.stdout, re.MULTILINE)
+    if result.returncode != 0 or not timebase:
+        return []
+    scale = int(timebase.group(1)) / int(timebase.group(2))
+    start = re.search(r"start: (-?[\d.]+)", result.stderr)
+    offset = float(start.group(1)) if start else 0.0
+    packets = []
+    for line in result.stdout.splitlines():
+        # stream, dts, pts, duration, size, crc[, F=flags]: flags only show when the packet is no keyframe
+        fields = line.split(',')
+        if not line.startswith('#') and len(fields) >= 6:
+            packets.append((round(int(fields[2]) * scale - offset, 6), int(fields[4]), len(fields) == 6))
+    return sorted(packets)
+
+def _thumbnail_cmd(video_file, start, output_args):
+    # Input-side seek as in _seek_cmd; ffmpeg averages the frames down to
+    # thumbnails (flags=area is the cheapest scaler that evens out noise)
+    return ['ffmpeg', '-ss', f'{math.floor(start * 1000) / 1000:.3f}', '-i', video_file, *output_args,
+            '-vf', f'scale={DEDUP_THUMBNAIL_WIDTH}:-2:flags=area' + (',showinfo' if '-t' in output_args else ''),
+            *PPM_PIPE_ARGS]
+
+def _grab_thumbnail(video_file, timestamp):
+    """Grayscale thumbnail of the frame at timestamp for thumbnails_differ (None past the end)"""
+    result = subprocess.run(_thumbnail_cmd(video_file, timestamp, ['-frames:v', '1']),
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame = _read_ppm(io.BytesIO(result.stdout))
+    return frame.convert('L') if frame is not None else None
+
+def _sample_thumbnails(video_file, start, length, step):
+    """[(time, thumbnail)] of the first frame in every step seconds of
+    [start, start + length), all from one decoding pass"""
+    seek = math.floor(start * 1000) / 1000
+    times = queue.Queue()
+    every = f"floor(t/{step}+0.000001)"
+    cmd = ['ffmpeg', '-ss', f'{seek:.3f}', '-t', f'{start + length - seek:.3f}', '-i', video_file,
+           '-vf', f"select='isnan(prev_t)+gt({every},{every.replace('(t', '(prev_t')})',"
+                  f"scale={DEDUP_THUMBNAIL_WIDTH}:-2:flags=area,showinfo",
+           '-vsync', 'vfr', *PPM_PIPE_ARGS]
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    threading.Thread(target=_drain, daemon=True,
+                     args=(_note_frame_times(io.TextIOWrapper(proc.stderr, errors='replace'), times),)).start()
+    samples = []
+    try:
+        while True:
+            frame = _read_ppm(proc.stdout)
+            if frame is None:
+                break
+            try:
+                samples.append((round(seek + times.get(timeout=5.0), 6), frame.convert('L')))
+            except queue.Empty:
+                break
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    return samples
+
+def _scan_change(video_file, start, end, reference):
+    """(time, thumbnail) of the first frame from start to end that
+    thumbnails_differ from the reference thumbnail, decoding the span once
+    and stopping there; (end, None) if no frame before end does"""
+    seek = math.floor(start * 1000) / 1000
+    times = queue.Queue()
+    proc = subprocess.Popen(_thumbnail_cmd(video_file, start, ['-t', f'{end - seek:.3f}']),
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    threading.Thread(target=_drain, daemon=True,
+                     args=(_note_frame_times(io.TextIOWrapper(proc.stderr, errors='replace'), times),)).start()
+    try:
+        while True:
+            frame = _read_ppm(proc.stdout)
+            if frame is None:
+                return end, None
+            try:
+                timestamp = round(seek + times.get(timeout=5.0), 6)  # output times start at the seek point
+            except queue.Empty:
+                return end, None
+            if timestamp >= end:
+                return end, None
+            thumbnail = frame.convert('L')
+            if timestamp > start and thumbnails_differ(reference, thumbnail):
+                return timestamp, thumbnail
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+def _inner_keyframe(keyframes, a, b):
+    """Keyframe strictly between times a and b nearest their middle, or None"""
+    low, high = bisect.bisect_right(keyframes, a), bisect.bisect_left(keyframes, b)
+    if low >= high:
+        return None
+    middle = bisect.bisect_left(keyframes, (a + b) / 2, low, high)
+    return min(keyframes[max(low, middle - 1):min(high, middle + 1)], key=lambda k: abs(k - (a + b) / 2))
+
+def _changes_at_keyframe(packets, a, b):
+    """Whether packet sizes rule out a change after time a before the keyframe at time b"""
+    end = bisect.bisect_left(packets, b, key=lambda packet: packet[0])
+    if end == len(packets) or packets[end][0] != b or not packets[end][2]:
+        return False
+    sizes = sorted(size for _, size, _ in packets[bisect.bisect_right(packets, a, key=lambda packet: packet[0]):end])
+    return not sizes or sizes[-1] <= sizes[len(sizes) // 2] + STATIC_PACKET_SHARE * packets[end][1]
+
+def _coarse_samples(video_file, duration, step, keyframes, executor, workers, report):
+    """[(time, thumbnail)] of a frame about every step seconds, plus one near
+    the end, for adaptive_timestamps"""
+    end = round(duration - ADAPTIVE_PRECISION, 6)
+    samples = []
+    if keyframes and step < duration / len(keyframes):
+        # Seeks would decode the same frames over and over: decode once, in parallel segments
+        parts = max(1, min(workers, int(duration // step)))
+        length = math.ceil(duration / parts / step) * step
+        for part in executor.map(lambda n: _sample_thumbnails(video_file, n * length, length, step), range(parts)):
+            samples.extend(part)
+            report(len(samples) * step / 2)
+        if samples and end - samples[-1][0] > 2 * ADAPTIVE_PRECISION:
+            thumbnail = _grab_thumbnail(video_file, end)
+            if thumbnail is not None:
+                samples.append((end, thumbnail))
+        return samples
+    # Seek to the keyframe before each sample time when it is close enough
+    times = set()
+    for timestamp in interval_timestamps(duration, step):
+        nearest = keyframes[bisect.bisect_right(keyframes, timestamp) - 1] if keyframes else None
+        times.add(nearest if nearest is not None and 0 <= timestamp - nearest <= step / 2 else float(timestamp))
+    if end - max(times) > 2 * ADAPTIVE_PRECISION:
+        times.add(end)  # the last slide may be shown for less than step
+    times = sorted(times)
+    for timestamp, thumbnail in zip(times, executor.map(lambda t: _grab_thumbnail(video_file, t), times)):
+        if thumbnail is not None:
+            samples.append((timestamp, thumbnail))
+        report(timestamp / 2)
+    return samples
+
+def _refine_changes(video_file, samples, packets, keyframes, executor, report, duration):
+    """Time of the change between every two neighbouring samples that differ,
+    narrowed down by keyframe seeks, scans or bisection (see adaptive_timestamps)"""
+    changes = []
+    intervals = [(a, b) for a, b in zip(samples, samples[1:]) if thumbnails_differ(a[1], b[1])]
+    width = sum(b[0] - a[0] for a, b in intervals) or 1.0
+    while intervals:
+        report(duration / 2 * (2 - sum(b[0] - a[0] for a, b in intervals) / width))
+        seeks, scans = [], []
+        for a, b in intervals:
+            middle = _inner_keyframe(keyframes, a[0], b[0])
+            if middle is None and not keyframes and b[0] - a[0] > ADAPTIVE_PRECISION:
+                middle = round((a[0] + b[0]) / 2, 6)
+            if middle is not None:
+                seeks.append((a, b, middle))
+            elif keyframes and not _changes_at_keyframe(packets, a[0], b[0]):
+                scans.append((b, executor.submit(_scan_change, video_file, a[0], b[0], a[1])))
+            else:
+                changes.append(b[0])
+        narrowed = []
+        for (a, b, middle), thumbnail in zip(
+                seeks, executor.map(lambda seek: _grab_thumbnail(video_file, seek[2]), seeks)):
+            if thumbnail is None:
+                changes.append(b[0])
+                continue
+            left, right = thumbnails_differ(a[1], thumbnail), thumbnails_differ(thumbnail, b[1])
+            if not left and not right:
+                # A gradual change: follow the half that changed most
+                left = thumbnail_change(a[1], thumbnail) >= thumbnail_change(thumbnail, b[1])
+                right = not left
+            if left:
+                narrowed.append((a, (middle, thumbnail)))
+            if right:
+                narrowed.append(((middle, thumbnail), b))
+        for b, scan in scans:
+            timestamp, thumbnail = scan.result()
+            changes.append(timestamp)
+            if thumbnail is not None and thumbnails_differ(thumbnail, b[1]):
+                narrowed.append(((timestamp, thumbnail), b))  # another change before b
+        intervals = narrowed
+    return changes
+
+def adaptive_timestamps(video_file, step, workers=None, progress=None):
+    """Times at which the picture changes, found coarse to fine.
+
+    A thumbnail of a frame about every step seconds is taken first
+    (_coarse_samples), at a keyframe when there is one within step / 2
+    (keyframes decode on their own). When step is shorter than the keyframe
+    interval those seeks would decode the same frames over and over, so the
+    video is decoded once instead, in parallel time segments.
+
+    Wherever two neighbouring samples differ (see thumbnails_differ; a
+    changed line of text counts), the keyframe nearest the middle of the gap
+    is sampled and the half that changed is searched again
+    (_refine_changes). Once no keyframe is left in between, any seek would
+    decode the same frames, so the span is decoded once and the first
+    changed frame ends the search, unless the packet sizes show the change
+    can only be at the keyframe ending the gap (see STATIC_PACKET_SHARE).
+    Without a packet list the gap is bisected down to ADAPTIVE_PRECISION.
+    Seeks and scans run in parallel.
+
+    Returns the first sample time and the time of each change, so the
+    decoding done grows with the number of slide changes rather than the
+    video length. A slide shown for less than step seconds is missed if the
+    slides either side of it match, so step should be shorter than the
+    shortest slide. progress(done, total, "seconds") counts the first pass
+    as half of the video's duration and the search as the rest.
+    """
+    duration = get_video_duration(video_file)
+    if not duration:
+        raise Exception("Could not read the video duration needed for adaptive sampling.")
+    packets = video_packets(video_file)
+    keyframes = [packet[0] for packet in packets if packet[2]]
+    workers = workers or os.cpu_count() or 1
+
+    def report(done):
+        if progress is not None:
+            progress(min(done, duration), duration, "seconds")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        samples = _coarse_samples(video_file, duration, step, keyframes, executor, workers, report)
+        if not samples:
+            raise Exception("No frames were extracted. Try adjusting the parameters.")
+        changes = _refine_changes(video_file, samples, packets, keyframes, executor, report, duration)
+    report(duration)
+    print(f"Found {len(changes)} slide changes")
+    return [samples[0][0]] + sorted(changes)
+
+def _grab_frames(video_file, timestamps, output_dir, workers=None, progress=None):
+    """Write the frames at timestamps as frame%04d.png, grabbed by parallel seeks"""
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = [
+            executor.submit(_grab_frame, video_file, timestamp,
+                            os.path.join(output_dir, f'frame{index + 1:04d}.png'))
+            for index, timestamp in enumerate(timestamps)
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            if progress is not None:
+                progress(done, len(futures), "frames")
+
+def extract_frames_fast(video_file, interval, output_dir, mode="seek", workers=None, progress=None):
+    """Fixed-interval extraction without decoding the whole video.
+
+    mode "seek" runs one accurate input-side seek per sample time, so decode
+    work scales with the number of samples rather than the video length.
+    mode "keyframes" decodes only keyframes, split into time segments
+    decoded by parallel ffmpeg processes, and gives each sample the latest
+    keyframe at or before it; encoders place keyframes at scene cuts, so for
+    slides this is usually exact. Either way frames are written as
+    frame%04d.png in sample order, matching the regular fps filter output.
+    """
+    duration = get_video_duration(video_file)
+    if not duration:
+        raise Exception("Could not read the video duration needed for fast seeking.")
+    timestamps = interval_timestamps(duration, interval)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(timestamps)))
+
+    if mode == "seek":
+        _grab_frames(video_file, timestamps, output_dir, workers, progress)
+        return timestamps
+
+    # Decode only keyframes, in parallel time segments, noting each one's
+    # timestamp; every sample then takes the latest keyframe at or before it
+    segment = duration / workers
+    reporters = _split_progress(progress, duration, workers)
+    keyframe_dir = tempfile.mkdtemp(prefix='keyframes_', dir=output_dir)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            segments = executor.map(
+                lambda n: _extract_keyframes(video_file, n * segment, segment, keyframe_dir, f'seg{n:03d}',
+                                             reporters[n]),
+                range(workers)
+            )
+            keyframes = sorted({t: path for found in segments for t, path in found}.items())
+        if not keyframes:
+            return timestamps
+        keyframe_times = [t for t, _ in keyframes]
+        for index, timestamp in enumerate(timestamps):
+            nearest = max(0, bisect.bisect_right(keyframe_times, timestamp + 1e-6) - 1)
+            output = os.path.join(output_dir, f'frame{index + 1:04d}.png')
+            try:
+                os.link(keyframes[nearest][1], output)
+            except OSError:
+                shutil.copyfile(keyframes[nearest][1], output)
+    finally:
+        shutil.rmtree(keyframe_dir, ignore_errors=True)
+    return timestamps
+
+def _extract_timed(input_args, video_filter, output_dir, prefix, progress=None, length=None):
+    """Run ffmpeg writing {prefix}_%06d.png with absolute source timestamps.
+
+    Returns [(timestamp, path)] for every frame written, read from showinfo.
+    length is how many seconds of input are decoded, for progress.
+    """
+    cmd = [
+        'ffmpeg',
+        *input_args,
+        '-copyts',  # keep absolute timestamps in showinfo
+        '-vf', f'{video_filter},showinfo' if video_filter else 'showinfo',
+        '-vsync', 'vfr',
+        os.path.join(output_dir, f'{prefix}_%06d.png')
+    ]
+    stderr = _run_ffmpeg(cmd, progress, length)
+    times = [float(t) for t in re.findall(r"pts_time:\s*(-?[\d.]+)", stderr)]
+    frames = []
+    for number, timestamp in enumerate(times, start=1):
+        path = os.path.join(output_dir, f'{prefix}_{number:06d}.png')
+        if os.path.exists(path):
+            frames.append((timestamp, path))
+    return frames
+
+def _extract_keyframes(video_file, start, length, output_dir, prefix, progress=None):
+    """Write the keyframes in [start, start + length) as PNGs; returns [(timestamp, path)]"""
+    input_args = ['-skip_frame', 'nokey', '-ss', f'{start:.3f}', '-t', f'{length:.3f}', '-i', video_file]
+    return _extract_timed(input_args, None, output_dir, prefix, progress, length)
+
+def _extract_scene_segment(video_file, threshold, start, end, overlap, output_dir, prefix,
+                           progress=None, duration=None):
+    """Scene-change frames owned by [start, end); returns [(timestamp, path)]
+
+    Decoding starts overlap seconds early so the scene filter has the frames
+    before start to compare against; frames from that lead-in belong to the
+    previous segment and are discarded.
+    """
+    lead_in = min(overlap, start)
+    input_args = ['-ss', f'{start - lead_in:.3f}']
+    if end is not None:
+        input_args += ['-t', f'{end - start + lead_in:.3f}']
+    input_args += ['-i', video_file]
+    length = (end if end is not None else duration) - start + lead_in if (end or duration) else None
+    owned = []
+    found = _extract_timed(input_args, f"select='gt(scene,{threshold})'", output_dir, prefix, progress, length)
+    for timestamp, path in found:
+        if timestamp >= start - 1e-6 and (end is None or timestamp < end - 1e-6):
+            owned.append((timestamp, path))
+        else:
+            os.remove(path)
+    return owned
+
+def extract_scenes_parallel(video_file, threshold, output_dir, segments=None, overlap=1.0, progress=None):
+    """Scene-change extraction (method "2") split across parallel ffmpeg processes.
+
+    The video is cut into segments equal time ranges (default: core count),
+    each scanned by its own ffmpeg with a short overlap into the previous
+    range; results are merged in time order and written as frame%04d.png.
+    Returns the source timestamps of the frames.
+    """
+    duration = get_video_duration(video_file)
+    if not duration:
+        raise Exception("Could not read the video duration needed to split scene detection.")
+    # Segments much shorter than the overlap would spend most of their time on lead-in
+    segments = max(1, min(segments or os.cpu_count() or 1, int(duration / (overlap * 10)) or 1))
+    length = duration / segments
+    # Lead-ins are decoded twice, so they count towards the total too
+    reporters = _split_progress(progress, duration + overlap * (segments - 1), segments)
+
+    scene_dir = tempfile.mkdtemp(prefix='scenes_', dir=output_dir)
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            found = executor.map(
+                lambda n: _extract_scene_segment(
+                    video_file, threshold, n * length,
+                    (n + 1) * length if n < segments - 1 else None,
+                    overlap, scene_dir, f'seg{n:03d}', reporters[n], duration
+                ),
+                range(segments)
+            )
+            frames = sorted(frame for segment in found for frame in segment)
+        for index, (_, path) in enumerate(frames):
+            os.replace(path, os.path.join(output_dir, f'frame{index + 1:04d}.png'))
+    finally:
+        shutil.rmtree(scene_dir, ignore_errors=True)
+    return [timestamp for timestamp, _ in frames]
+
+def scene_scores(video_file, cache=None, progress=None):
+    """Per-frame scene-change scores from scene_detect.
+
+    With a FrameCache the scores are stored per video, so any threshold can
+    be tried afterwards without decoding the video again.
+    """
+    from scene_detect import SceneScores, score_video, SETTINGS as SCENE_SETTINGS
+    path = cache.scores_path(video_file, SCENE_SETTINGS) if cache is not None else None
+    if path and os.path.exists(path):
+        return SceneScores.load(path)
+    print("Scoring scene changes...")
+    duration = get_video_duration(video_file) if progress is not None else None
+    scores = score_video(
+        video_file,
+        progress=(lambda seconds: progress(min(seconds, duration), duration, "seconds")) if duration else None
+    )
+    if path:
+        scores.save(path)
+    return scores
+
+def extract_frames(video_file, method, param, output_dir, fast_seek=None, extract_workers=None,
+                   scene_segments=None, scene_detector=None, cache=None, progress=None):
+    """Extract frames from video_file into output_dir as frame%04d.png.
+
+    fast_seek ("seek" or "keyframes") switches method "1" to
+    extract_frames_fast; scene_segments > 1 splits method "2" across that
+    many parallel ffmpeg processes with extract_scenes_parallel.
+    scene_detector "numpy" makes method "2" cut where scene_scores() is above
+    param and grab those frames by seeking; cache is where the scores are kept.
+    Method "3" finds slide changes with adaptive_timestamps (param is its
+    coarse step in seconds) and grabs a frame after each by seeking.
+
+    progress(done, total, unit) is called as extraction advances, in seconds
+    of video decoded or, for seek-based extraction, frames grabbed.
+
+    The video timestamp of every frame is saved alongside them (see
+    load_frame_times) and returned.
+    """
+    print("Extracting frames...")
+    if method == "3":
+        timestamps = adaptive_timestamps(video_file, param, extract_workers, progress)
+        _grab_frames(video_file, timestamps, output_dir, extract_workers)
+    elif method == "1" and fast_seek:
+        timestamps = extract_frames_fast(video_file, param, output_dir, mode=fast_seek, workers=extract_workers,
+                                         progress=progress)
+    elif method != "1" and scene_detector == "numpy":
+        timestamps = [timestamp for timestamp, _ in scene_scores(video_file, cache, progress).cuts(param)]
+        _grab_frames(video_file, timestamps, output_dir, extract_workers, progress)
+    elif method != "1" and scene_segments and scene_segments > 1:
+        timestamps = extract_scenes_parallel(video_file, param, output_dir, segments=scene_segments,
+                                             progress=progress)
+    else:
+        ffmpeg_cmd = build_ffmpeg_cmd(video_file, method, param, [os.path.join(output_dir, 'frame%04d.png')])
+        stderr = _run_ffmpeg(ffmpeg_cmd, progress, get_video_duration(video_file) if progress is not None else None)
+        if method == "1":
+            timestamps = [k * param for k in range(len(list_frames(output_dir)))]
+        else:
+            timestamps = [float(t) for t in re.findall(r"pts_time:\s*(-?[\d.]+)", stderr)]
+    frames = list_frames(output_dir)
+    if not frames:
+        raise Exception("No frames were extracted. Try adjusting the parameters.")
+    save_frame_times(output_dir, timestamps)
+    return timestamps
 
 def get_resource_path():
     # Get absolute path to resource, works for dev and for PyInstaller
@@ -57,29 +1304,115 @@ def create_working_dir():
     print(f"Output will be saved to: {working_dir}")
     return working_dir
 
-def compile_pdf(output_dir, pdf_file):
+def _pdf_error(stderr):
+    print(f"Error creating PDF: {stderr}")
+    print("\nTroubleshooting tips:")
+    print("1. Check if ImageMagick is installed: brew install imagemagick")
+    print("2. You may need to edit ImageMagick policy:")
+    print("   sudo nano /opt/homebrew/etc/ImageMagick-7/policy.xml")
+    print("   Change: <policy domain=\"coder\" rights=\"none\" pattern=\"PDF\" />")
+    print("   To: <policy domain=\"coder\" rights=\"read|write\" pattern=\"PDF\" />")
+    sys.exit(1)
+
+def pdf_writer_options(pdf_options, frames=None):
+    """PdfWriter arguments for pdf_options: page images are encoded on one
+    thread per core unless "workers" says otherwise, and a "target_bytes"
+    budget is turned into encoding settings with fit_options(), which needs
+    frames as a list (so the budget is ignored when streaming)"""
+    options = dict(pdf_options or {})
+    options.setdefault('workers', os.cpu_count() or 1)
+    target_bytes = options.pop('target_bytes', None)
+    if target_bytes and not hasattr(frames, '__len__'):
+        print("Ignoring the PDF size target: it needs every frame up front")
+    elif target_bytes:
+        options, estimate = fit_options(frames, target_bytes, options)
+        settings = ', '.join(f"{key}={options[key]}" for key in ('compression', 'quality', 'color', 'max_size')
+                             if options.get(key) is not None)
+        print(f"PDF settings for a {target_bytes / 1e6:.1f} MB target: {settings} "
+              f"(about {estimate / 1e6:.1f} MB)")
+    return options
+
+def compile_pdf(output_dir, pdf_file, engine="native", pdf_options=None, frames=None, progress=None,
+                index=None):
+    """Build pdf_file from the frames in output_dir (or the frames list, if given).
+
+    engine "native" writes pages one at a time with PdfWriter (pdf_options are
+    passed through: page_size, dpi, compression, quality); "imagemagick" uses
+    the original `convert` subprocess, which loads every frame at once.
+    Each frame's page (and, natively, its byte offset) is recorded in index.
+    """
     print("Compiling images into PDF...")
+    frames = frames if frames is not None else list_frames(output_dir)
+    if engine == "native":
+        with PdfWriter(pdf_file, **pdf_writer_options(pdf_options, frames)) as writer:
+            for page, (img_path, encoded) in enumerate(writer.encode_all(frames), start=1):
+                writer.add_page(encoded)
+                if index is not None:
+                    index.set_page(_frame_id(img_path), page, writer.image_offset(page - 1))
+                if progress is not None:
+                    progress(page, len(frames), "frames")
+        return
     try:
-        convert_cmd = [
-            'convert',
-            '-density', '300',
-            os.path.join(output_dir, 'frame*.png'),
-            pdf_file
-        ]
-        result = subprocess.run(convert_cmd, capture_output=True, text=True)
+        # The frame list goes in a file: no argument length limit, and frame
+        # order doesn't depend on how convert sorts a wildcard
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+            list_file.write('\n'.join(frames) + '\n')
+        try:
+            convert_cmd = [
+                'convert',
+                '-density', '300',
+                f'@{list_file.name}',
+                pdf_file
+            ]
+            result = subprocess.run(convert_cmd, capture_output=True, text=True)
+        finally:
+            os.remove(list_file.name)
         if result.returncode != 0:
-            print(f"Error creating PDF: {result.stderr}")
-            print("\nTroubleshooting tips:")
-            print("1. Check if ImageMagick is installed: brew install imagemagick")
-            print("2. You may need to edit ImageMagick policy:")
-            print("   sudo nano /opt/homebrew/etc/ImageMagick-7/policy.xml")
-            print("   Change: <policy domain=\"coder\" rights=\"none\" pattern=\"PDF\" />")
-            print("   To: <policy domain=\"coder\" rights=\"read|write\" pattern=\"PDF\" />")
-            sys.exit(1)
+            _pdf_error(result.stderr)
+        if index is not None:
+            for page, img_path in enumerate(frames, start=1):
+                index.set_page(_frame_id(img_path), page)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
 
+def compile_pdf_stream(frames, pdf_file, engine="native", pdf_options=None, index=None):
+    """Add frames to the PDF as they arrive, passing each one on to later stages"""
+    print("Compiling images into PDF...")
+    if engine == "native":
+        with PdfWriter(pdf_file, **pdf_writer_options(pdf_options)) as writer:
+            for frame, encoded in writer.encode_all(frames):
+                page = writer.add_page(encoded)
+                if index is not None:
+                    index.set_page(_frame_id(frame), page + 1, writer.image_offset(page))
+                yield frame
+        return
+
+    convert_cmd = [
+        'convert',
+        '-density', '300',
+        'ppm:-',
+        pdf_file
+    ]
+    proc = subprocess.Popen(convert_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
+    try:
+        for page, frame in enumerate(frames, start=1):
+            try:
+                frame.save(proc.stdin, 'PPM')
+            except BrokenPipeError:
+                break  # convert died; its stderr is reported below
+            if index is not None:
+                index.set_page(_frame_id(frame), page)
+            yield frame
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        _pdf_error(stderr.decode(errors='replace'))
+
 def open_folder(path):
     """Open the folder in Finder"""
     try:
@@ -98,47 +1431,1114 @@ def get_working_dir():
         os.makedirs(working_dir)
     return working_dir
 
-def process_video(video_file, method="1", param=0.5, extract_text=True):
-    """Process video file with given parameters"""
-    if not os.path.isfile(video_file):
-        raise ValueError("File does not exist")
+def ocr_settings(preprocess, incremental=False, frames=None):
+    """Anything that changes OCR output; cached OCR text is keyed by these. Every
+    OCR engine runs the same Tesseract recognizer with the same settings, so
+    they share cached text.
 
-    working_dir = get_working_dir()
-    output_dir = os.path.join(working_dir, "frames_output")
-    
-    if os.path.exists(output_dir):
+    Incremental text depends on the frame before each frame, so it is also
+    keyed by the names of the frames it ran over (those dedup kept).
+    """
+    if incremental:
+        preprocess = "regions"
+    settings = {"engine": "tesseract", "preprocess": preprocess}
+    if preprocess != "grayscale":
+        import ocr_preprocess
+        settings["preprocess_version"] = ocr_preprocess.VERSION
+    if incremental:
+        settings["incremental"] = True
+        settings["frames"] = settings_key([os.path.basename(frame) for frame in frames or []])
+    return settings
+
+def get_cache_dir():
+    return os.path.join(get_working_dir(), ".cache")
+
+def get_search_index_file():
+    return os.path.join(get_working_dir(), SEARCH_INDEX_FILE)
+
+def _cpu_time():
+    """CPU seconds used by this process and its reaped children (ffmpeg, tesseract, OCR pool)"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime + children.ru_utime + children.ru_stime
+
+def _peak_rss(who=resource.RUSAGE_SELF):
+    """Peak resident set size in bytes (ru_maxrss is bytes on macOS, KiB on Linux)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(img_path) for img_path in list_frames(path))
+
+_event_hooks = []
+
+def add_event_hook(hook):
+    """Call hook(event) for every instrumentation event of every process_video run"""
+    _event_hooks.append(hook)
+
+def remove_event_hook(hook):
+    _event_hooks.remove(hook)
+
+# Minimum seconds between two "progress" events of the same stage
+PROGRESS_INTERVAL = 0.25
+
+class StageMetrics:
+    """Per-stage instrumentation for one process_video run.
+
+    Each event is a flat dict handed to the add_event_hook() hooks and to
+    on_event, and appended as one JSON line to metrics_file if given. Events
+    are "run_start", "stage_start", "stage_end" and "run_end"; stage_end
+    carries wall_seconds, cpu_seconds (including ffmpeg/tesseract children),
+    frames, bytes_written, peak_rss_bytes and children_peak_rss_bytes.
+
+    "progress" events (stage, done, total, unit) are throttled to one per
+    PROGRESS_INTERVAL per stage and only go to the hooks, not metrics_file.
+    total is None when it is not known up front.
+    """
+
+    def __init__(self, video_file, on_event=None, metrics_file=None):
+        self.video_file = video_file
+        self.run_id = uuid.uuid4().hex[:12]
+        self.on_event = on_event
+        self.metrics_file = metrics_file
+        self.stages = []
+        self._progress_times = {}
+
+    def emit(self, event, **fields):
+        record = {"event": event, "run_id": self.run_id, "video": self.video_file,
+                  "time": round(time.time(), 3), **fields}
+        for hook in [*_event_hooks, self.on_event]:
+            if hook is None:
+                continue
+            try:
+                hook(record)
+            except Exception as e:
+                print(f"Event hook failed: {e}")
+        if self.metrics_file and event != "progress":
+            with open(self.metrics_file, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def progress(self, stage, done, total=None, unit="frames"):
+        now = time.perf_counter()
+        if (total is None or done < total) and now - self._progress_times.get(stage, 0.0) < PROGRESS_INTERVAL:
+            return
+        self._progress_times[stage] = now
+        self.emit("progress", stage=stage, done=round(done, 3), total=total, unit=unit)
+
+    def reporter(self, stage):
+        """progress(done, total, unit) callback for the functions doing stage's work"""
+        return lambda done, total=None, unit="frames": self.progress(stage, done, total, unit)
+
+    def end_stage(self, name, wall_seconds, cpu_seconds, **fields):
+        record = self.emit(
+            "stage_end", stage=name,
+            wall_seconds=round(wall_seconds, 4),
+            cpu_seconds=round(cpu_seconds, 4),
+            peak_rss_bytes=_peak_rss(),
+            children_peak_rss_bytes=_peak_rss(resource.RUSAGE_CHILDREN),
+            **fields
+        )
+        self.stages.append(record)
+        return record
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage name; the caller fills in the yielded stats dict"""
+        stats = {"frames": None, "bytes_written": 0}
+        self.emit("stage_start", stage=name)
+        wall, cpu = time.perf_counter(), _cpu_time()
+        error = None
+        try:
+            yield stats
+        except BaseException as e:
+            error = str(e) or repr(e)
+            raise
+        finally:
+            self.end_stage(name, time.perf_counter() - wall, _cpu_time() - cpu, error=error, **stats)
+
+def _measured(frames, totals):
+    """Pass frames through, adding the wall/CPU time spent producing each one to totals"""
+    frames = iter(frames)
+    while True:
+        wall, cpu = time.perf_counter(), _cpu_time()
+        try:
+            frame = next(frames)
+        except StopIteration:
+            return
+        finally:
+            totals["wall"] += time.perf_counter() - wall
+            totals["cpu"] += _cpu_time() - cpu
+        totals["frames"] += 1
+        yield frame
+
+def _process_video_streaming(job):
+    """In-memory pipeline: frames flow from the ffmpeg pipe through every stage one at a time"""
+    # The stages are chained generators, so each one's time is measured as
+    # the time spent pulling frames out of it minus what its upstream took.
+    totals = {}
+
+    def measured(name, frames):
+        totals[name] = {"wall": 0.0, "cpu": 0.0, "frames": 0}
+        return _measured(frames, totals[name])
+
+    # A searchable PDF is built by the OCR stage, as the text layer needs the OCR results
+    stages = ["extract", "dedup", "ocr"] if job.searchable_pdf else ["extract", "dedup", "pdf", "ocr"]
+    for name in stages:
+        if (name != "dedup" or job.dedup_distance is not None) and (name != "ocr" or job.extract_text):
+            job.metrics.emit("stage_start", stage=name, streaming=True)
+    wall, cpu = time.perf_counter(), _cpu_time()
+    error = None
+    try:
+        frames = measured("extract", _index_stream(iter_video_frames(job.video_file, job.method, job.param,
+                                                                     fast_seek=job.fast_seek,
+                                                                     extract_workers=job.extract_workers,
+                                                                     scene_detector=job.scene_detector,
+                                                                     progress=job.metrics.reporter("extract")),
+                                                   job.index))
+        hashes = {}
+        if job.dedup_distance is not None:
+            frames = measured("dedup", iter_unique_frames(frames, max_distance=job.dedup_distance, hashes=hashes))
+        if job.searchable_pdf:
+            with MarkdownWriter(job.md_file, on_section=job.index.set_text) as writer:
+                compile_searchable_pdf(frames, job.pdf_file, writer, pdf_options=job.pdf_options, index=job.index,
+                                       ocr_workers=job.ocr_workers, progress=job.metrics.reporter("ocr"),
+                                       engine=job.ocr_engine, preprocess=job.ocr_preprocess,
+                                       incremental=job.incremental_ocr)
+            frames = ()
+        else:
+            frames = measured("pdf", compile_pdf_stream(frames, job.pdf_file, engine=job.pdf_engine,
+                                                        pdf_options=job.pdf_options, index=job.index))
+        if job.extract_text and not job.searchable_pdf:
+            print("Extracting text from images using OCR...")
+            with MarkdownWriter(job.md_file, on_section=job.index.set_text) as writer:
+                extract_text_from_frames(frames, ocr_workers=job.ocr_workers,
+                                         progress=job.metrics.reporter("ocr"),
+                                         engine=job.ocr_engine, preprocess=job.ocr_preprocess,
+                                         incremental=job.incremental_ocr, writer=writer)
+        else:
+            for _ in frames:
+                pass
+        for frame, frame_hash in hashes.items():
+            job.index.set_hash(frame, frame_hash)
+    except BaseException as e:
+        error = str(e) or repr(e)
+        raise
+    finally:
+        upstream = {"wall": 0.0, "cpu": 0.0, "frames": 0}
+        for name in ["extract", "dedup", "pdf"]:
+            if name not in totals:
+                continue
+            stage = totals[name]
+            bytes_written = os.path.getsize(job.pdf_file) if name == "pdf" and os.path.exists(job.pdf_file) else 0
+            per_page = {"bytes_per_page": round(bytes_written / max(1, stage["frames"]))} if name == "pdf" else {}
+            job.metrics.end_stage(name, stage["wall"] - upstream["wall"], stage["cpu"] - upstream["cpu"],
+                              frames=stage["frames"], bytes_written=bytes_written, streaming=True, error=error,
+                              **per_page)
+            upstream = stage
+        if job.extract_text and ("pdf" in totals or job.searchable_pdf):
+            bytes_written = os.path.getsize(job.md_file) if os.path.exists(job.md_file) else 0
+            if job.searchable_pdf and os.path.exists(job.pdf_file):
+                bytes_written += os.path.getsize(job.pdf_file)
+            job.metrics.end_stage(
+                "ocr",
+                time.perf_counter() - wall - upstream["wall"],
+                _cpu_time() - cpu - upstream["cpu"],
+                frames=upstream["frames"],
+                bytes_written=bytes_written,
+                streaming=True, error=error
+            )
+
+def _process_video_cached(job):
+    """Disk pipeline backed by FrameCache: each stage reuses whatever a previous run left valid"""
+    cache = FrameCache(get_cache_dir(), job.cache_max_bytes or DEFAULT_MAX_BYTES)
+    # The entry stays locked until the run is over (see CacheEntry.lock)
+    entry = None
+    try:
+        with job.metrics.stage("extract") as stats:
+            fast_seek = job.fast_seek if job.method == "1" else None
+            scene_segments = job.scene_segments if job.method == "2" and (job.scene_segments or 0) > 1 else None
+            scene_detector = job.scene_detector if job.method == "2" and job.scene_detector != "ffmpeg" else None
+            entry = cache.entry(job.video_file, job.method, job.param, fast_seek=fast_seek,
+                                scene_segments=scene_segments, scene_detector=scene_detector)
+            stats["cached"] = entry.frames_complete()
+            if stats["cached"]:
+                print("Reusing cached frames")
+            else:
+                entry.reset_frames()
+                extract_frames(job.video_file, job.method, job.param, entry.frames_dir,
+                               fast_seek=job.fast_seek, extract_workers=job.extract_workers,
+                               scene_segments=job.scene_segments, scene_detector=job.scene_detector,
+                               cache=cache, progress=job.metrics.reporter("extract"))
+                entry.mark_frames_complete()
+                stats["bytes_written"] = _dir_bytes(entry.frames_dir)
+            frames = list_frames(entry.frames_dir)
+            stats["frames"] = len(frames)
+            index_frames(job.index, entry.frames_dir)
+
+        if job.dedup_distance is not None:
+            with job.metrics.stage("dedup") as stats:
+                print("Removing near-duplicate frames...")
+                hashes = entry.load_hashes()
+                known = len(hashes)
+                frames = select_unique_frames(frames, max_distance=job.dedup_distance, hashes=hashes,
+                                              progress=job.metrics.reporter("dedup"))
+                if len(hashes) != known:
+                    entry.save_hashes(hashes)
+                for name, frame_hash in hashes.items():
+                    job.index.set_hash(frame_number(name), frame_hash)
+                stats["frames"] = len(frames)
+
+        if not job.searchable_pdf:
+            with job.metrics.stage("pdf") as stats:
+                compile_pdf(entry.frames_dir, job.pdf_file, engine=job.pdf_engine, pdf_options=job.pdf_options,
+                            frames=frames, progress=job.metrics.reporter("pdf"), index=job.index)
+                stats["frames"] = len(frames)
+                stats["bytes_written"] = os.path.getsize(job.pdf_file)
+                stats["bytes_per_page"] = round(stats["bytes_written"] / max(1, len(frames)))
+
+        if job.extract_text:
+            with job.metrics.stage("ocr") as stats:
+                print("Extracting text from images using OCR...")
+                settings = ocr_settings(job.ocr_preprocess, job.incremental_ocr, frames)
+                # A searchable PDF is built here, from cached or fresh word boxes
+                words = {} if job.searchable_pdf else None
+                texts = entry.load_ocr(settings, words)
+                todo = [img_path for img_path in frames if os.path.basename(img_path) not in texts
+                        or (words is not None and os.path.basename(img_path) not in words)]
+                if todo and job.incremental_ocr:
+                    # Each frame's text depends on the frame before it, so redo the whole run
+                    todo = frames
+                if len(todo) < len(frames):
+                    print(f"Reusing cached OCR text for {len(frames) - len(todo)} frames")
+                results = iter(())
+                if todo:
+                    ocr_workers = min(int(job.ocr_workers or os.cpu_count() or 1), len(todo))
+                    if job.incremental_ocr:
+                        results = ocr_frames_incremental(todo, ocr_workers, progress=job.metrics.reporter("ocr"),
+                                                         engine=job.ocr_engine, words=job.searchable_pdf)
+                    else:
+                        results = ocr_frames(todo, ocr_workers, progress=job.metrics.reporter("ocr"),
+                                             engine=job.ocr_engine, preprocess=job.ocr_preprocess,
+                                             words=job.searchable_pdf)
+                # Cached and fresh text are merged in frame order as the fresh text comes in
+                todo = set(todo)
+                times = load_frame_times(entry.frames_dir)
+                pdf = nullcontext()
+                if job.searchable_pdf:
+                    pdf = PdfWriter(job.pdf_file, **pdf_writer_options(job.pdf_options, frames))
+                with entry.open_ocr_log(settings) as log, pdf, \
+                        MarkdownWriter(job.md_file, on_section=job.index.set_text) as writer:
+                    for page, img_path in enumerate(frames, start=1):
+                        name = os.path.basename(img_path)
+                        if img_path in todo:
+                            text, error, *found = next(results)
+                            if error is not None:
+                                print(f"Error processing {img_path}: {error}")
+                            else:
+                                print(f"Processed {img_path}")
+                                texts[name] = text
+                                if words is not None:
+                                    words[name] = found[0]
+                                entry.add_ocr(log, name, text, found[0] if words is not None else None)
+                        if words is not None:
+                            pdf.add_page(img_path, words=words.get(name))
+                            job.index.set_page(frame_number(name), page, pdf.image_offset(page - 1))
+                        if name in texts:
+                            writer.add_frame(page, texts[name], times.get(name))
+                stats["frames"] = len(todo)
+                stats["bytes_written"] = os.path.getsize(job.md_file)
+                if job.searchable_pdf:
+                    stats["bytes_written"] += os.path.getsize(job.pdf_file)
+
+        cache.evict(keep=entry)
+    finally:
+        if entry is not None:
+            entry.close()
+
+def _process_video_disk(job):
+    """Original pipeline: frames round-trip through PNG files in frames_output"""
+    output_dir = os.path.join(job.working_dir, "frames_output")
+
+    with job.metrics.stage("extract") as stats:
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.makedirs(output_dir)
+
+        extract_frames(job.video_file, job.method, job.param, output_dir,
+                       fast_seek=job.fast_seek, extract_workers=job.extract_workers,
+                       scene_segments=job.scene_segments, scene_detector=job.scene_detector,
+                       progress=job.metrics.reporter("extract"))
+        stats["frames"] = len(list_frames(output_dir))
+        stats["bytes_written"] = _dir_bytes(output_dir)
+        index_frames(job.index, output_dir)
+
+    if job.dedup_distance is not None:
+        with job.metrics.stage("dedup") as stats:
+            hashes = {}
+            dedup_frames(output_dir, max_distance=job.dedup_distance, progress=job.metrics.reporter("dedup"),
+                         hashes=hashes)
+            for name, frame_hash in hashes.items():
+                job.index.set_hash(frame_number(name), frame_hash)
+            stats["frames"] = len(list_frames(output_dir))
+
+    if job.searchable_pdf:
+        with job.metrics.stage("ocr") as stats:
+            frames = list_frames(output_dir)
+            with MarkdownWriter(job.md_file, on_section=job.index.set_text) as writer:
+                compile_searchable_pdf(frames, job.pdf_file, writer, pdf_options=job.pdf_options, index=job.index,
+                                       timestamps=load_frame_times(output_dir),
+                                       ocr_workers=min(int(job.ocr_workers or os.cpu_count() or 1), len(frames) or 1),
+                                       progress=job.metrics.reporter("ocr"), engine=job.ocr_engine,
+                                       preprocess=job.ocr_preprocess, incremental=job.incremental_ocr)
+            stats["frames"] = len(frames)
+            stats["bytes_written"] = os.path.getsize(job.md_file) + os.path.getsize(job.pdf_file)
         shutil.rmtree(output_dir)
-    os.makedirs(output_dir)
+        return
 
-    if method == "1":
-        ffmpeg_cmd = [
-            'ffmpeg',
-            '-i', video_file,
-            '-vf', f'fps=1/{param}',
-            os.path.join(output_dir, 'frame%04d.png')
-        ]
-    else:
-        ffmpeg_cmd = [
-            'ffmpeg',
-            '-i', video_file,
-            '-vf', f"select='gt(scene,{param})'",
-            '-vsync', 'vfr',
-            os.path.join(output_dir, 'frame%04d.png')
-        ]
+    with job.metrics.stage("pdf") as stats:
+        compile_pdf(output_dir, job.pdf_file, engine=job.pdf_engine, pdf_options=job.pdf_options,
+                    progress=job.metrics.reporter("pdf"), index=job.index)
+        stats["frames"] = len(list_frames(output_dir))
+        stats["bytes_written"] = os.path.getsize(job.pdf_file)
+        stats["bytes_per_page"] = round(stats["bytes_written"] / max(1, stats["frames"]))
 
-    subprocess.run(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    if job.extract_text:
+        with job.metrics.stage("ocr") as stats:
+            with MarkdownWriter(job.md_file, on_section=job.index.set_text) as writer:
+                extract_text_from_images(output_dir, ocr_workers=job.ocr_workers,
+                                         progress=job.metrics.reporter("ocr"),
+                                         engine=job.ocr_engine, preprocess=job.ocr_preprocess,
+                                         incremental=job.incremental_ocr, writer=writer)
+            stats["frames"] = len(list_frames(output_dir))
+            stats["bytes_written"] = os.path.getsize(job.md_file)
 
-    if not os.listdir(output_dir):
-        raise Exception("No frames were extracted. Try adjusting the parameters.")
+    shutil.rmtree(output_dir)
+
+# Heading of a page's transcript, after its OCR text in output.md
+AUDIO_HEADING = "### Audio"
+
+def merge_transcript(md_file, index, segments):
+    """Rewrite md_file with the transcript segments, (start, end, text) in
+    video seconds, merged in: each segment goes under the page on screen
+    when it starts, after that page's OCR text, as a "[M:SS.s] text" line.
+    Speech before the first page goes to the first page; without page
+    timestamps the whole transcript is appended at the end. The index gets
+    the new byte range of every section. Returns the number of segments.
+    """
+    pages = index.frames(pages_only=True)
+    texts = {}
+    if os.path.exists(md_file):
+        with open(md_file, 'rb') as f:
+            for row in pages:
+                if row['text_offset'] is not None:
+                    f.seek(row['text_offset'])
+                    _, _, text = f.read(row['text_length']).decode('utf-8').partition('\n\n')
+                    texts[row['page']] = text.strip()
+    timed = [row for row in pages if row['timestamp'] is not None]
+    starts = [row['timestamp'] for row in timed]
+    speech = {}
+    count = 0
+    for start, end, text in segments:
+        page = timed[max(0, bisect.bisect_right(starts, start) - 1)]['page'] if timed else None
+        speech.setdefault(page, []).append(f"[{format_timestamp(start)}] {text}")
+        count += 1
+
+    temp_file = md_file + '.tmp'
+    with MarkdownWriter(temp_file, on_section=index.set_text) as writer:
+        for row in pages:
+            parts = [texts.get(row['page'])]
+            if row['page'] in speech:
+                parts.append(AUDIO_HEADING + "\n\n" + "\n".join(speech[row['page']]))
+            writer.add_frame(row['page'], "\n\n".join(part for part in parts if part), row['timestamp'])
+    if None in speech:
+        with open(temp_file, 'a', encoding='utf-8') as f:
+            f.write("## Audio transcript\n\n" + "\n".join(speech[None]) + "\n\n")
+    os.replace(temp_file, md_file)
+    return count
+
+def _transcribe_audio(job):
+    """Audio stage: transcribe the soundtrack and merge it into output.md"""
+    import audio_transcribe
+    with job.metrics.stage("audio") as stats:
+        if not audio_transcribe.has_audio(job.video_file):
+            print("No audio track to transcribe")
+            stats["frames"] = 0
+            return
+        print("Transcribing audio...")
+        duration = get_video_duration(job.video_file)
+        progress = job.metrics.reporter("audio")
+        segments = audio_transcribe.transcribe_video(
+            job.video_file, workers=job.audio_workers, engine=job.audio_engine,
+            progress=lambda seconds: progress(min(seconds, duration or seconds), duration, "seconds")
+        )
+        stats["frames"] = merge_transcript(job.md_file, job.index, segments)  # transcript segments
+        stats["bytes_written"] = os.path.getsize(job.md_file)
+        print(f"Transcribed {stats['frames']} audio segments")
+
+def process_video(video_file, method="1", param=0.5, extract_text=True, ocr_workers=None,
+                  dedup_distance=None, streaming=False, pdf_engine="native", pdf_options=None,
+                  use_cache=False, cache_max_bytes=None, working_dir=None,
+                  on_event=None, metrics_file=None, fast_seek=None, extract_workers=None,
+                  scene_segments=None, scene_detector="ffmpeg", ocr_engine="auto",
+                  ocr_preprocess="regions", incremental_ocr=False, search_index=False, searchable_pdf=False,
+                  transcribe_audio=False, audio_engine="auto", audio_workers=None):
+    """Process video file with given parameters
+
+    Results go to output.pdf/output.md in working_dir (default: the shared
+    output folder from get_working_dir()).
+
+    dedup_distance enables near-duplicate frame removal: frames whose
+    perceptual hash is within that many bits (0-64) of the previous kept
+    frame, and whose downscaled pixels match it too, are dropped before the
+    PDF and OCR stages.
+
+    streaming pipes frames from ffmpeg straight through dedup, PDF assembly
+    and OCR in memory instead of round-tripping them through PNG files in
+    frames_output.
 
+    pdf_engine picks the PDF builder ("native" or "imagemagick") and
+    pdf_options tunes the native one, e.g. {"page_size": "A4", "dpi": 150,
+    "compression": "jpeg", "quality": 80}; see PdfWriter. "color" ("gray"
+    or "bilevel") and "max_size" (longest side in pixels) shrink page
+    images, "workers" sets the encoding threads (default: core count) and
+    "target_bytes" picks the encoding settings that fit the PDF in that many
+    bytes (see pdf_writer.fit_options; not when streaming).
+
+    use_cache keeps extracted frames, frame hashes and OCR text in a
+    content-addressed cache under the output folder, so a rerun (after a
+    crash, or with different dedup/OCR/PDF settings) only redoes the stages
+    whose inputs changed. cache_max_bytes caps its size (default 5 GB); least
+    recently used videos are evicted first. Ignored when streaming.
+
+    fast_seek speeds up fixed-interval extraction (method "1"): "seek" jumps
+    straight to each sample time, "keyframes" decodes keyframes only across
+    parallel time segments (see extract_frames_fast). extract_workers sets
+    how many ffmpeg processes run at once (default: core count).
+
+    scene_segments splits scene detection (method "2") into that many time
+    segments scanned in parallel; ignored when streaming.
+
+    scene_detector picks how method "2" finds scene changes: "ffmpeg" (its
+    scene filter) or "numpy" (scene_detect scores, with param as the
+    threshold on the combined score; reused between runs when use_cache is set).
+
+    method "3" samples adaptively: a frame every param seconds (default 3)
+    is compared with the one before, and wherever neighbours differ the time
+    between them is bisected down to the slide change (see
+    adaptive_timestamps), so static lectures cost a few seeks per slide
+    instead of decoding the whole video.
+
+    ocr_engine picks the OCR backend (see ocr_engine.ENGINES): "auto" uses
+    tesserocr when installed, else batched tesseract runs; "pytesseract" is
+    the original one-process-per-frame path.
+
+    ocr_preprocess is "regions" (OCR only detected text regions, resized to
+    a fixed text height and binarized) or "grayscale" (the whole frame).
+    incremental_ocr compares each frame with the previous one tile by tile,
+    re-OCRs only the text regions that changed and writes only new text to
+    the Markdown, with a horizontal rule before each new slide.
+
+    searchable_pdf lays each frame's OCR words over its PDF page as invisible
+    text, so the PDF can be searched and its text selected. The OCR then
+    runs before the pages are written, in the same pass over the frames.
+    Needs the native pdf_engine; ignored without extract_text.
+
+    transcribe_audio also transcribes the audio track (see audio_transcribe):
+    it is split at pauses while ffmpeg decodes it, the chunks are transcribed
+    by audio_workers processes (default: core count) with audio_engine
+    ("auto", "whisper-cpp", "vosk" or "stub"), and the timestamped
+    transcript is merged into output.md under the page shown at the time.
+
+    search_index adds every page's OCR text, with its video timestamp, to a
+    full-text index shared between videos: True uses search.db in the shared
+    output folder, a string names another index file. See search_videos().
+
+    Every run also writes frames.db (see frame_index.FrameIndex) next to the
+    outputs: one row per extracted frame with its video timestamp, dHash,
+    PDF page and byte offset and Markdown byte range, for lookup_frame().
+
+    on_event is called with every instrumentation event (see StageMetrics)
+    and metrics_file, if given, gets them appended as JSON lines.
+    """
+    if not os.path.isfile(video_file):
+        raise ValueError("File does not exist")
+    searchable_pdf = searchable_pdf and extract_text
+    if searchable_pdf and pdf_engine != "native":
+        raise ValueError("A searchable PDF needs the native PDF engine")
+    if transcribe_audio:
+        # A missing speech engine fails the run now, not after the frames, PDF and OCR are done
+        import audio_transcribe
+        audio_engine = audio_transcribe.resolve_engine(audio_engine)
+
+    if working_dir is None:
+        working_dir = get_working_dir()
+    else:
+        os.makedirs(working_dir, exist_ok=True)
     pdf_file = os.path.join(working_dir, 'output.pdf')
-    compile_pdf(output_dir, pdf_file)
+    md_file = os.path.join(working_dir, 'output.md')
+    index_file = os.path.join(working_dir, INDEX_FILE)
+
+    metrics = StageMetrics(video_file, on_event=on_event, metrics_file=metrics_file)
+    metrics.emit("run_start", method=method, param=param, extract_text=extract_text,
+                 dedup_distance=dedup_distance, streaming=streaming, use_cache=use_cache,
+                 pdf_engine=pdf_engine, fast_seek=fast_seek, scene_segments=scene_segments,
+                 scene_detector=scene_detector, ocr_engine=resolve_engine(ocr_engine) if extract_text else None,
+                 ocr_preprocess=ocr_preprocess if extract_text else None,
+                 incremental_ocr=incremental_ocr if extract_text else None,
+                 search_index=bool(search_index) if extract_text else None, searchable_pdf=searchable_pdf,
+                 transcribe_audio=transcribe_audio, audio_engine=audio_engine if transcribe_audio else None)
+    wall, cpu = time.perf_counter(), _cpu_time()
+    job = SimpleNamespace(
+        video_file=video_file, method=method, param=param, extract_text=extract_text,
+        ocr_workers=ocr_workers, dedup_distance=dedup_distance, pdf_engine=pdf_engine,
+        pdf_options=pdf_options, cache_max_bytes=cache_max_bytes, working_dir=working_dir,
+        pdf_file=pdf_file, md_file=md_file, metrics=metrics,
+        fast_seek=fast_seek, extract_workers=extract_workers, scene_segments=scene_segments,
+        scene_detector=scene_detector, ocr_engine=ocr_engine, ocr_preprocess=ocr_preprocess,
+        incremental_ocr=incremental_ocr, searchable_pdf=searchable_pdf, index=FrameIndex(index_file, reset=True),
+        audio_engine=audio_engine, audio_workers=audio_workers
+    )
+    try:
+        with job.index:
+            if streaming:
+                _process_video_streaming(job)
+            elif use_cache:
+                _process_video_cached(job)
+            else:
+                _process_video_disk(job)
+            if transcribe_audio:
+                _transcribe_audio(job)
+            if search_index and (extract_text or transcribe_audio):
+                index_file = get_search_index_file() if search_index is True else search_index
+                with SearchIndex(index_file) as index:
+                    pages = index.add_run(video_file, working_dir, job.index)
+                print(f"Added {pages} pages to the search index")
+            pdf_pages = job.index.page_count()
+        pdf_bytes = os.path.getsize(pdf_file)
+        print(f"PDF: {pdf_pages} pages, {pdf_bytes / 1e6:.1f} MB "
+              f"({pdf_bytes / max(1, pdf_pages) / 1e3:.0f} KB per page)")
+    except BaseException as e:
+        metrics.emit("run_end", status="failed", error=str(e) or repr(e),
+                     wall_seconds=round(time.perf_counter() - wall, 4))
+        raise
+    metrics.emit("run_end", status="ok",
+                 wall_seconds=round(time.perf_counter() - wall, 4),
+                 cpu_seconds=round(_cpu_time() - cpu, 4),
+                 peak_rss_bytes=_peak_rss(),
+                 pdf_pages=pdf_pages, pdf_bytes=pdf_bytes,
+                 bytes_per_page=round(pdf_bytes / max(1, pdf_pages)))
+    return working_dir
 
-    if extract_text:
-        text_content = extract_text_from_images(output_dir)
-        md_file = os.path.join(working_dir, 'output.md')
-        with open(md_file, 'w') as f:
-            f.write(text_content)
+# Share of a job's run time each stage usually takes, for overall progress and ETA
+JOB_STAGE_WEIGHTS = {"extract": 0.3, "dedup": 0.05, "pdf": 0.15, "ocr": 0.5, "audio": 0.3}
 
-    shutil.rmtree(output_dir)
-    return working_dir
\ No newline at end of file
+# Seconds between checks for new events from job processes
+JOB_POLL_INTERVAL = 0.1
+
+# Seconds cancel() waits after SIGTERM before killing a job's processes outright
+JOB_KILL_TIMEOUT = 3.0
+
+# Output folders of running jobs, so concurrent jobs never share one
+_job_dirs = set()
+
+class JobCancelled(Exception):
+    """Raised by VideoJob.wait() when the job was cancelled"""
+
+def _run_job(events, video_file, options):
+    """Body of a job process: run process_video, sending its events and the outcome to events"""
+    if hasattr(os, 'setsid'):
+        # Own process group, so cancelling reaches ffmpeg, tesseract and the OCR pool too
+        os.setsid()
+    try:
+        working_dir = process_video(video_file, on_event=events.put, **options)
+        events.put({"event": "job_end", "status": "done", "working_dir": working_dir})
+    except BaseException as e:  # compile_pdf reports ImageMagick failures via sys.exit
+        events.put({"event": "job_end", "status": "failed", "error": str(e) or repr(e)})
+
+def _job_working_dir(video_file):
+    """Folder named after the video in the output folder, unique among running jobs"""
+    stem = os.path.splitext(os.path.basename(video_file))[0]
+    name = stem
+    suffix = 2
+    while os.path.join(get_working_dir(), name) in _job_dirs:
+        name = f"{stem}-{suffix}"
+        suffix += 1
+    return os.path.join(get_working_dir(), name)
+
+class VideoJob:
+    """Handle for a process_video run started with start_job().
+
+    The run happens in its own process (and process group), so jobs run side
+    by side and cancel() also stops the ffmpeg, tesseract and OCR worker
+    processes working for it. status is "running", "done", "failed" or
+    "cancelled"; progress maps each stage to its latest (done, total, unit),
+    and fraction/eta combine them into overall progress. Attributes are only
+    updated on the event loop that started the job.
+    """
+
+    def __init__(self, video_file, working_dir, process, events, on_update=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.video_file = video_file
+        self.working_dir = working_dir
+        self.status = "running"
+        self.error = None
+        self.stage = None
+        self.stages = []
+        self.streaming = False
+        self.progress = {}
+        self.finished_stages = set()
+        self.started = time.monotonic()
+        self.ended = None
+        self._process = process
+        self._events = events
+        self._on_update = on_update
+        self._cancelling = False
+        import asyncio
+        self._done = asyncio.Event()
+        self._task = None
+
+    @property
+    def fraction(self):
+        """Overall progress from 0 to 1, weighting stages by JOB_STAGE_WEIGHTS"""
+        if self.status == "done":
+            return 1.0
+        # Streaming stages run together, so extraction tracks them all (audio runs after)
+        stages = [stage for stage in self.stages if stage in ("extract", "audio")] if self.streaming else self.stages
+        total = sum(JOB_STAGE_WEIGHTS[stage] for stage in stages)
+        if not total:
+            return 0.0
+        done = 0.0
+        for stage in stages:
+            if stage in self.finished_stages:
+                done += JOB_STAGE_WEIGHTS[stage]
+            elif stage in self.progress:
+                stage_done, stage_total, _ = self.progress[stage]
+                if stage_total:
+                    done += JOB_STAGE_WEIGHTS[stage] * min(stage_done / stage_total, 1.0)
+        return done / total
+
+    @property
+    def elapsed(self):
+        return (self.ended or time.monotonic()) - self.started
+
+    @property
+    def eta(self):
+        """Estimated seconds left, or None until there is enough progress to tell"""
+        fraction = self.fraction
+        if self.status != "running" or fraction < 0.01:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+    @property
+    def done(self):
+        return self.status != "running"
+
+    def cancel(self):
+        """Stop the job and every process working for it"""
+        if self.done or self._cancelling:
+            return
+        self._cancelling = True
+        self._signal(signal.SIGTERM)
+        import asyncio
+        asyncio.get_running_loop().call_later(JOB_KILL_TIMEOUT, self._kill_if_running)
+
+    def _kill_if_running(self):
+        if self._process.exitcode is None:
+            self._signal(signal.SIGKILL)
+
+    def _signal(self, signum):
+        try:
+            if hasattr(os, 'killpg'):
+                # Also reaches children that outlive the job process
+                os.killpg(self._process.pid, signum)
+            else:
+                self._process.terminate()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def wait(self):
+        """Wait for the job; returns its working_dir, raises JobCancelled or
+        Exception(error) when it was cancelled or failed"""
+        await self._done.wait()
+        if self.status == "cancelled":
+            raise JobCancelled(f"Cancelled: {self.video_file}")
+        if self.status == "failed":
+            raise Exception(self.error)
+        return self.working_dir
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    def _handle(self, event):
+        kind = event["event"]
+        if kind == "run_start":
+            self.streaming = bool(event.get("streaming"))
+            self.stages = ["extract"]
+            if event.get("dedup_distance") is not None:
+                self.stages.append("dedup")
+            self.stages.append("pdf")
+            if event.get("extract_text"):
+                self.stages.append("ocr")
+            if event.get("transcribe_audio"):
+                self.stages.append("audio")
+        elif kind == "stage_start":
+            self.stage = "streaming" if self.streaming and event["stage"] != "audio" else event["stage"]
+        elif kind == "stage_end":
+            self.finished_stages.add(event["stage"])
+        elif kind == "progress":
+            self.progress[event["stage"]] = (event["done"], event["total"], event["unit"])
+            if not self.streaming or event["stage"] == "audio":
+                self.stage = event["stage"]
+        elif kind == "job_end":
+            self._finish(event["status"], event.get("error"))
+
+    def _drain(self):
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+            self._handle(event)
+            if self._on_update is not None:
+                try:
+                    self._on_update(self)
+                except Exception as e:
+                    print(f"Job update callback failed: {e}")
+
+    def _finish(self, status, error=None):
+        if self.done:
+            return
+        self.status = "cancelled" if self._cancelling and status != "done" else status
+        self.error = error
+        self.ended = time.monotonic()
+
+    async def _pump(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            while not self.done:
+                self._drain()
+                if not self._process.is_alive():
+                    await loop.run_in_executor(None, self._process.join)
+                    self._drain()
+                    self._finish("failed", f"Job process exited with code {self._process.exitcode}")
+                    break
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+            await loop.run_in_executor(None, self._process.join)
+            if self._cancelling:
+                self._signal(signal.SIGKILL)  # anything left in the job's process group
+        finally:
+            _job_dirs.discard(self.working_dir)
+            self._events.close()
+            self._done.set()
+            if self._on_update is not None:
+                try:
+                    self._on_update(self)
+                except Exception as e:
+                    print(f"Job update callback failed: {e}")
+
+async def start_job(video_file, working_dir=None, on_update=None, **options):
+    """Start processing video_file in a new process and return its VideoJob.
+
+    options are process_video keyword arguments (except on_event; use
+    on_update(job), called on the event loop whenever the job's progress or
+    status changes). Several jobs can run at once; working_dir defaults to a
+    folder named after the video in the output folder, kept unique among
+    running jobs so they never overwrite each other's files.
+    """
+    import asyncio
+    if not os.path.isfile(video_file):
+        raise ValueError("File does not exist")
+    if working_dir is None:
+        working_dir = _job_working_dir(video_file)
+    _job_dirs.add(working_dir)
+    # spawn rather than fork: the caller may have threads (a GUI, the event loop)
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    process = context.Process(target=_run_job, args=(events, video_file, dict(options, working_dir=working_dir)),
+                              name=f"video-job-{os.path.basename(video_file)}")
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, process.start)
+    except BaseException:
+        _job_dirs.discard(working_dir)
+        raise
+    job = VideoJob(video_file, working_dir, process, events, on_update)
+    job._task = asyncio.get_running_loop().create_task(job._pump())
+    return job
+
+def _add_processing_args(parser):
+    parser.add_argument('--method', choices=['1', '2', '3'], default='1',
+                        help='1: fixed intervals, 2: scene change detection, '
+                             '3: adaptive sampling that bisects to each slide change (default: 1)')
+    parser.add_argument('--param', type=float,
+                        help='interval in seconds for method 1 (default 0.5), scene threshold for method 2 '
+                             '(default 0.3), coarse step in seconds for method 3 (default 3)')
+    parser.add_argument('--fast-seek', choices=['seek', 'keyframes'],
+                        help='method 1 only: seek to each sample time, or decode keyframes only in parallel segments')
+    parser.add_argument('--extract-workers', type=int, help='parallel ffmpeg processes for --fast-seek (default: core count)')
+    parser.add_argument('--scene-segments', type=int, metavar='N',
+                        help='method 2 only: split scene detection into N segments scanned in parallel')
+    parser.add_argument('--scene-detector', choices=['ffmpeg', 'numpy'], default='ffmpeg',
+                        help="method 2 only: ffmpeg's scene filter or the NumPy scorer (see the scenes command)")
+    parser.add_argument('--no-ocr', action='store_true', help='skip text extraction')
+    parser.add_argument('--ocr-workers', type=int, help='parallel OCR processes (default: core count)')
+    parser.add_argument('--ocr-engine', choices=OCR_ENGINES, default='auto',
+                        help='OCR backend (default: tesserocr if installed, else batched tesseract runs)')
+    parser.add_argument('--ocr-preprocess', choices=['regions', 'grayscale'], default='regions',
+                        help='OCR only detected text regions (default) or the whole grayscale frame')
+    parser.add_argument('--incremental-ocr', action='store_true',
+                        help='only re-OCR text regions that changed since the previous frame and '
+                             'write only the new text')
+    parser.add_argument('--transcribe-audio', action='store_true',
+                        help="transcribe the audio track into output.md, under each slide's text")
+    parser.add_argument('--audio-engine', choices=['auto', 'whisper-cpp', 'vosk', 'stub'], default='auto',
+                        help='speech recognizer (default: whisper.cpp if pywhispercpp is installed, else vosk)')
+    parser.add_argument('--audio-workers', type=int, help='parallel transcription processes (default: core count)')
+    parser.add_argument('--index', action='store_true',
+                        help='add the OCR text to the search index (see the search command)')
+    parser.add_argument('--dedup', type=int, metavar='DISTANCE',
+                        help='drop frames within DISTANCE bits (0-64) of the previous kept frame')
+    parser.add_argument('--stream', action='store_true', help='pipe frames through memory instead of temp files')
+    parser.add_argument('--cache', action='store_true', help='reuse cached frames and OCR text between runs')
+    parser.add_argument('--pdf-engine', choices=['native', 'imagemagick'], default='native')
+    parser.add_argument('--searchable-pdf', action='store_true',
+                        help='add an invisible OCR text layer to the PDF (native engine only)')
+    parser.add_argument('--page-size', help='A4, A3, letter or legal (default: page fits the frame)')
+    parser.add_argument('--dpi', type=int, help='resolution used to size pages (default: 300)')
+    parser.add_argument('--pdf-compression', choices=['flate', 'jpeg'], help='page image encoding (default: flate)')
+    parser.add_argument('--jpeg-quality', type=int, help='JPEG quality for --pdf-compression jpeg (default: 85)')
+    parser.add_argument('--pdf-color', choices=['color', 'gray', 'bilevel'],
+                        help='page image colors; bilevel is black and white, for text slides (default: color)')
+    parser.add_argument('--max-size', type=int, metavar='PIXELS', help='downscale page images to this longest side')
+    parser.add_argument('--target-size', type=float, metavar='MB',
+                        help='pick PDF encoding settings that keep the PDF under this size (not with --stream)')
+    parser.add_argument('--pdf-workers', type=int, help='threads encoding page images (default: core count)')
+    parser.add_argument('--metrics-file', help='append per-stage timing/resource events here as JSON lines')
+
+# --param when it is not given, by method
+DEFAULT_PARAMS = {'1': 0.5, '2': 0.3, '3': 3.0}
+
+def _processing_options(args):
+    pdf_options = {}
+    if args.page_size:
+        pdf_options['page_size'] = args.page_size
+    if args.dpi:
+        pdf_options['dpi'] = args.dpi
+    if args.pdf_compression:
+        pdf_options['compression'] = args.pdf_compression
+    if args.jpeg_quality:
+        pdf_options['quality'] = args.jpeg_quality
+    if args.pdf_color:
+        pdf_options['color'] = args.pdf_color
+    if args.max_size:
+        pdf_options['max_size'] = args.max_size
+    if args.target_size:
+        pdf_options['target_bytes'] = int(args.target_size * 1e6)
+    if args.pdf_workers:
+        pdf_options['workers'] = args.pdf_workers
+    return {
+        'method': args.method,
+        'param': args.param if args.param is not None else DEFAULT_PARAMS[args.method],
+        'extract_text': not args.no_ocr,
+        'fast_seek': args.fast_seek,
+        'extract_workers': args.extract_workers,
+        'scene_segments': args.scene_segments,
+        'scene_detector': args.scene_detector,
+        'ocr_workers': args.ocr_workers,
+        'ocr_engine': args.ocr_engine,
+        'ocr_preprocess': args.ocr_preprocess,
+        'incremental_ocr': args.incremental_ocr,
+        'search_index': args.index,
+        'transcribe_audio': args.transcribe_audio,
+        'audio_engine': args.audio_engine,
+        'audio_workers': args.audio_workers,
+        'dedup_distance': args.dedup,
+        'streaming': args.stream,
+        'use_cache': args.cache,
+        'pdf_engine': args.pdf_engine,
+        'pdf_options': pdf_options,
+        'searchable_pdf': args.searchable_pdf,
+        'metrics_file': args.metrics_file,
+    }
+
+def parse_time(value):
+    """Seconds from "SS", "M:SS" or "H:MM:SS" (fractions allowed)"""
+    seconds = 0.0
+    for part in value.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def lookup_frame(working_dir, at=None, page=None, offset=None):
+    """Index row for the frame shown at video time at (seconds), on PDF page
+    page, or whose output.md section contains byte offset; None if no frame matches"""
+    path = os.path.join(working_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"No frame index in {working_dir}")
+    with FrameIndex(path) as index:
+        if at is not None:
+            return index.frame_at(at)
+        if page is not None:
+            return index.page_frame(page)
+        return index.frame_at_text_offset(offset)
+
+def read_section(working_dir, row):
+    """The output.md section recorded for an index row ("" if it has none)"""
+    if row.get('text_offset') is None:
+        return ""
+    with open(os.path.join(working_dir, 'output.md'), 'rb') as f:
+        f.seek(row['text_offset'])
+        return f.read(row['text_length']).decode('utf-8')
+
+def search_videos(query, limit=20, index_file=None):
+    """Ranked hits for query in the search index (see SearchIndex.search)"""
+    index_file = index_file or get_search_index_file()
+    if not os.path.exists(index_file):
+        raise ValueError(f"No search index at {index_file}; process videos with search_index=True first")
+    with SearchIndex(index_file) as index:
+        return index.search(query, limit)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert videos to a PDF of frames plus OCR text.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    process_parser = subparsers.add_parser('process', help='process a single video')
+    process_parser.add_argument('video')
+    process_parser.add_argument('--output', help='output directory (default: the shared output folder)')
+    _add_processing_args(process_parser)
+
+    batch_parser = subparsers.add_parser('batch', help='process many videos concurrently')
+    batch_parser.add_argument('inputs', nargs='+', help='video files, directories or glob patterns')
+    batch_parser.add_argument('--output', help='root folder for per-video outputs (default: <output folder>/batch)')
+    batch_parser.add_argument('--jobs', type=int, help='videos processed at once (default: core count)')
+    _add_processing_args(batch_parser)
+
+    scenes_parser = subparsers.add_parser(
+        'scenes', help='score scene changes once (cached) and preview the cuts for each threshold')
+    scenes_parser.add_argument('video')
+    scenes_parser.add_argument('--threshold', type=float, action='append',
+                               help='threshold to preview (repeatable; default: 0.1 to 0.6)')
+    scenes_parser.add_argument('--min-gap', type=float, default=0.0, help='drop cuts closer than this many seconds')
+    scenes_parser.add_argument('--list', action='store_true', help='print every cut with its timestamp and score')
+
+    lookup_parser = subparsers.add_parser(
+        'lookup', help="find a frame in a run's index by video time, PDF page or output.md offset")
+    lookup_parser.add_argument('--output', help='output directory of the run (default: the shared output folder)')
+    lookup_by = lookup_parser.add_mutually_exclusive_group(required=True)
+    lookup_by.add_argument('--at', type=parse_time, help='video time, as seconds or [H:]MM:SS')
+    lookup_by.add_argument('--page', type=int, help='PDF page number')
+    lookup_by.add_argument('--offset', type=int, help='byte offset in output.md')
+    lookup_parser.add_argument('--text', action='store_true', help="also print the frame's OCR text")
+
+    search_parser = subparsers.add_parser('search', help='search the OCR text of every indexed video')
+    search_parser.add_argument('query', help='words, "a phrase", prefix* or AND/OR/NOT')
+    search_parser.add_argument('--limit', type=int, default=20, help='most hits shown (default: 20)')
+    search_parser.add_argument('--index-file', help='search index (default: search.db in the shared output folder)')
+
+    serve_parser = subparsers.add_parser(
+        'serve', help='run a local HTTP job server with a persistent queue (see job_server.py)')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: 8765)')
+    serve_parser.add_argument('--workers', type=int, default=1, help='jobs run at once (default: 1)')
+    serve_parser.add_argument('--root', help='folder for the queue and job outputs (default: <output folder>/server)')
+
+    enqueue_parser = subparsers.add_parser(
+        'enqueue', help='queue videos for worker nodes on a shared folder (see work_queue.py)')
+    enqueue_parser.add_argument('videos', nargs='+', help='video files, at paths every worker can read')
+    enqueue_parser.add_argument('--queue', required=True, help='queue folder, shared by every worker node')
+    enqueue_parser.add_argument('--output', help='root folder for per-video outputs (default: <queue>/output)')
+    enqueue_parser.add_argument('--segments', type=int, metavar='N',
+                                help='split each video into N time segments processed by different workers, '
+                                     'then merged')
+    _add_processing_args(enqueue_parser)
+
+    worker_parser = subparsers.add_parser('worker', help='run tasks from a shared queue folder until stopped')
+    worker_parser.add_argument('--queue', required=True, help='queue folder, shared by every worker node')
+    worker_parser.add_argument('--id', help='worker name (default: <host>-<pid>)')
+    worker_parser.add_argument('--once', action='store_true', help='exit once the queue is empty')
+    worker_parser.add_argument('--lease', type=float, default=60.0,
+                               help='seconds without renewal before a lease counts as lost (default: 60)')
+
+    queue_parser = subparsers.add_parser('queue-status', help='show the tasks and workers of a shared queue folder')
+    queue_parser.add_argument('--queue', required=True, help='queue folder')
+
+    args = parser.parse_args(argv)
+    if args.command == 'worker':
+        from work_queue import Worker
+        Worker(args.queue, worker_id=args.id, lease_seconds=args.lease,
+               heartbeat_seconds=min(10.0, args.lease / 4)).run(once=args.once)
+        return
+    if args.command == 'queue-status':
+        from work_queue import queue_status
+        status = queue_status(args.queue)
+        print("  ".join(f"{state}: {count}" for state, count in status['counts'].items()))
+        for task in status['leased']:
+            print(f"leased {task['id']} ({task['kind']}) by {task['worker']}, attempt {task['attempts']}, "
+                  f"renewed {task['lease_age']} s ago")
+        for task in status['failed']:
+            print(f"failed {task['id']}: {task['error']}")
+        for worker in status['workers']:
+            doing = worker.get('task') or 'idle'
+            if worker.get('stage'):
+                doing += f" {worker['stage']} {worker['done']}/{worker['total'] or '?'} {worker['unit']}"
+            print(f"worker {worker['worker']}: {doing} ({time.time() - worker['time']:.0f} s ago)")
+        return
+    if args.command == 'serve':
+        from job_server import JobServer
+        JobServer(args.root, workers=args.workers).serve(args.host, args.port)
+        return
+    if args.command == 'search':
+        start = time.perf_counter()
+        hits = search_videos(args.query, limit=args.limit, index_file=args.index_file)
+        elapsed = time.perf_counter() - start
+        for hit in hits:
+            when = format_timestamp(hit['timestamp']) if hit['timestamp'] is not None else "?"
+            print(f"{os.path.basename(hit['video'])}  {when}  page {hit['page']}  (score {hit['score']})")
+            print(f"    {' '.join(hit['snippet'].split())}")
+            print(f"    {hit['video_link']}")
+            print(f"    {hit['pdf_link']}")
+        print(f"{len(hits)} hits in {elapsed * 1000:.1f} ms")
+        return
+    if args.command == 'lookup':
+        working_dir = args.output or get_working_dir()
+        row = lookup_frame(working_dir, at=args.at, page=args.page, offset=args.offset)
+        if row is None:
+            print("No matching frame")
+            sys.exit(1)
+        for key, value in row.items():
+            if key == 'timestamp' and value is not None:
+                value = f"{value} ({format_timestamp(value)})"
+            print(f"{key}: {value}")
+        if args.text:
+            print()
+            print(read_section(working_dir, row).strip())
+        return
+    if args.command == 'scenes':
+        scores = scene_scores(args.video, FrameCache(get_cache_dir()))
+        for threshold in args.threshold or [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]:
+            cuts = scores.cuts(threshold, min_gap=args.min_gap)
+            print(f"threshold {threshold:.2f}: {len(cuts)} cuts")
+            if args.list:
+                for timestamp, score in cuts:
+                    print(f"  {timestamp:10.3f}s  {score:.4f}")
+        return
+    options = _processing_options(args)
+    if args.command == 'enqueue':
+        from work_queue import WorkQueue
+        work_queue = WorkQueue(args.queue)
+        for video in args.videos:
+            task_ids = work_queue.submit(video, options, args.output or os.path.join(args.queue, 'output'),
+                                         segments=args.segments)
+            print(f"Queued {video}: {', '.join(task_ids)}")
+        return
+    if args.command == 'process':
+        working_dir = process_video(args.video, working_dir=args.output, **options)
+        print(f"Output saved to {working_dir}")
+    else:
+        from batch import process_batch
+        report = process_batch(args.inputs, output_root=args.output, jobs=args.jobs, **options)
+        if report['failed']:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
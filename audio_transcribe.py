@@ -0,0 +1,243 @@
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import numpy as np
+
+# Speech engines want 16 kHz mono 16-bit PCM
+SAMPLE_RATE = 16000
+
+# "auto" picks whisper-cpp when pywhispercpp is installed, else vosk; "stub"
+# recognizes nothing and only labels each chunk, for tests and benchmarks
+ENGINES = ("auto", "whisper-cpp", "vosk", "stub")
+
+# Voice activity detection works on FRAME_SECONDS frames. A frame is speech
+# when its energy is above SILENCE_DBFS and at least VOICE_MARGIN_DB over the
+# noise floor (a low percentile of the last NOISE_SECONDS of frames)
+FRAME_SECONDS = 0.03
+SILENCE_DBFS = -50.0
+VOICE_MARGIN_DB = 10.0
+NOISE_PERCENTILE = 10
+NOISE_SECONDS = 60.0
+
+# Chunks are cut in the middle of the first pause of MIN_SILENCE seconds once
+# they are MIN_CHUNK seconds long, and at the quietest frame if they reach
+# MAX_CHUNK without a pause (whisper's window is 30 s)
+MIN_SILENCE = 0.5
+MIN_CHUNK = 5.0
+MAX_CHUNK = 28.0
+
+# Audio is read from ffmpeg this many seconds at a time
+BLOCK_SECONDS = 1.0
+
+FRAME_SAMPLES = int(SAMPLE_RATE * FRAME_SECONDS)
+
+def has_audio(video_file):
+    """Whether ffmpeg's input summary of video_file lists an audio stream"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-i', video_file],
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return re.search(r"Stream #.*: Audio:", result.stderr) is not None
+
+def read_audio(video_file, block_seconds=BLOCK_SECONDS):
+    """Decode the audio of video_file as 16 kHz mono int16 arrays of block_seconds"""
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-i', video_file, '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE),
+           '-f', 's16le', '-acodec', 'pcm_s16le', '-']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = int(SAMPLE_RATE * block_seconds) // FRAME_SAMPLES * FRAME_SAMPLES * 2
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+        proc.wait()
+        if proc.returncode != 0:
+            raise Exception(f"Audio extraction failed: {proc.stderr.read().decode(errors='replace').strip()}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+def frame_energies(samples):
+    """Energy in dBFS of every FRAME_SAMPLES frame of int16 samples (the last one zero-padded)"""
+    count = -(-len(samples) // FRAME_SAMPLES)
+    frames = np.zeros(count * FRAME_SAMPLES, dtype=np.float32)
+    frames[:len(samples)] = samples
+    power = (frames.reshape(count, FRAME_SAMPLES) / 32768.0) ** 2
+    return 10 * np.log10(power.mean(axis=1) + 1e-10)
+
+def _silences(quiet, min_frames):
+    """[start, end) frame ranges of at least min_frames quiet frames"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], quiet.astype(np.int8), [0]])))
+    return [(start, end) for start, end in zip(edges[::2], edges[1::2]) if end - start >= min_frames]
+
+def split_chunks(blocks, min_silence=MIN_SILENCE, min_chunk=MIN_CHUNK, max_chunk=MAX_CHUNK):
+    """Cut a stream of int16 sample blocks at pauses in speech.
+
+    Yields (start_seconds, samples) per chunk as soon as it is cut, so
+    transcription can start while the audio is still being decoded. Chunks
+    without any speech frame are dropped.
+    """
+    min_frames = int(min_chunk / FRAME_SECONDS)
+    max_frames = int(max_chunk / FRAME_SECONDS)
+    silence_frames = max(1, int(min_silence / FRAME_SECONDS))
+    noise = deque(maxlen=int(NOISE_SECONDS / FRAME_SECONDS))
+    buffer = np.zeros(0, dtype=np.int16)
+    energies = np.zeros(0, dtype=np.float32)
+    start = 0  # samples before the buffer
+    for block in blocks:
+        block_energies = frame_energies(block)
+        noise.extend(block_energies.tolist())
+        buffer = np.concatenate([buffer, block])
+        energies = np.concatenate([energies, block_energies])
+        threshold = max(SILENCE_DBFS, float(np.percentile(noise, NOISE_PERCENTILE)) + VOICE_MARGIN_DB)
+        while len(energies) >= min_frames:
+            quiet = energies < threshold
+            cut = None
+            for begin, end in _silences(quiet, silence_frames):
+                # Cut mid-pause, or just into a pause that is still going on
+                middle = (begin + end) // 2 if end < len(energies) else begin + silence_frames // 2
+                if middle >= min_frames:
+                    cut = int(middle)
+                    break
+            if cut is None and len(energies) >= max_frames:
+                cut = min_frames + int(np.argmin(energies[min_frames:max_frames]))
+            if cut is None:
+                break
+            if not quiet[:cut].all():
+                yield start / SAMPLE_RATE, buffer[:cut * FRAME_SAMPLES]
+            buffer = buffer[cut * FRAME_SAMPLES:]
+            energies = energies[cut:]
+            start += cut * FRAME_SAMPLES
+    if len(energies) and (energies >= threshold).any():
+        yield start / SAMPLE_RATE, buffer
+
+class StubEngine:
+    """Recognizes nothing: one segment per chunk naming its length, for tests"""
+
+    name = "stub"
+
+    def transcribe(self, samples):
+        duration = len(samples) / SAMPLE_RATE
+        return [(0.0, duration, f"[speech, {duration:.1f} s]")]
+
+class WhisperCppEngine:
+    """whisper.cpp through pywhispercpp: the model stays loaded in-process.
+
+    The model is a ggml model file, or a model name pywhispercpp downloads,
+    from $WHISPER_CPP_MODEL (default: base.en).
+    """
+
+    name = "whisper-cpp"
+
+    def __init__(self, threads=1):
+        from pywhispercpp.model import Model
+        self._model = Model(os.environ.get('WHISPER_CPP_MODEL', 'base.en'), n_threads=threads,
+                            print_progress=False, print_realtime=False)
+
+    def transcribe(self, samples):
+        segments = self._model.transcribe(samples.astype(np.float32) / 32768.0)
+        # Segment times are in centiseconds
+        return [(segment.t0 / 100, segment.t1 / 100, segment.text.strip()) for segment in segments
+                if segment.text.strip()]
+
+class VoskEngine:
+    """Kaldi models through vosk; the model from $VOSK_MODEL (a model folder),
+    else vosk's small English model"""
+
+    name = "vosk"
+
+    def __init__(self, threads=1):
+        import vosk
+        vosk.SetLogLevel(-1)
+        path = os.environ.get('VOSK_MODEL')
+        self._vosk = vosk
+        self._model = vosk.Model(model_path=path) if path else vosk.Model(lang='en-us')
+
+    def transcribe(self, samples):
+        recognizer = self._vosk.KaldiRecognizer(self._model, SAMPLE_RATE)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(samples.tobytes())
+        result = json.loads(recognizer.FinalResult())
+        words = result.get('result') or []
+        if not words:
+            return [(0.0, len(samples) / SAMPLE_RATE, result['text'])] if result.get('text') else []
+        return [(words[0]['start'], words[-1]['end'], result['text'])]
+
+def _installed(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+def resolve_engine(name=None):
+    """Concrete engine name for name (None or "auto" picks an installed one)"""
+    name = name or "auto"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown speech engine: {name}")
+    if name == "auto":
+        if _installed('pywhispercpp'):
+            return "whisper-cpp"
+        if _installed('vosk'):
+            return "vosk"
+        raise ValueError("No speech engine installed; install pywhispercpp or vosk")
+    return name
+
+def create_engine(name=None, threads=1):
+    """A ready-to-use engine; keep it around, creating one loads the model"""
+    name = resolve_engine(name)
+    if name == "stub":
+        return StubEngine()
+    return {"whisper-cpp": WhisperCppEngine, "vosk": VoskEngine}[name](threads)
+
+# Engine of each worker process, by name
+_engines = {}
+
+def _init_worker(engine, threads):
+    _engines[engine] = create_engine(engine, threads)
+
+def _transcribe_chunk(engine, start, samples):
+    """Segments of one chunk with video timestamps"""
+    return [(start + begin, start + end, text) for begin, end, text in _engines[engine].transcribe(samples)]
+
+def transcribe_video(video_file, workers=None, engine=None, progress=None):
+    """Transcribe the audio track of video_file, yielding (start, end, text)
+    segments in order, with start and end in seconds into the video.
+
+    The audio is split at pauses (split_chunks) while ffmpeg decodes it and
+    the chunks are transcribed by a pool of worker processes, each with its
+    own copy of the model; at most two chunks per worker are in flight.
+    progress(seconds) is called with the audio time transcribed so far.
+    """
+    engine = resolve_engine(engine)
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    chunks = split_chunks(read_audio(video_file))
+    if workers == 1:
+        if engine not in _engines:  # loading a model is slow; keep it for the next video
+            _engines[engine] = create_engine(engine)
+        for start, samples in chunks:
+            yield from _transcribe_chunk(engine, start, samples)
+            if progress is not None:
+                progress(start + len(samples) / SAMPLE_RATE)
+        return
+    # Split the cores between the workers rather than oversubscribing them
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine, threads)) as executor:
+        pending = deque()
+        for start, samples in chunks:
+            pending.append((start + len(samples) / SAMPLE_RATE,
+                            executor.submit(_transcribe_chunk, engine, start, samples)))
+            while len(pending) >= workers * 2 or (pending and pending[0][1].done()):
+                end, future = pending.popleft()
+                yield from future.result()
+                if progress is not None:
+                    progress(end)
+        for end, future in pending:
+            yield from future.result()
+            if progress is not None:
+                progress(end)
@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app import process_video, get_working_dir, _cpu_time
+
+# Same file types the GUI's file picker offers
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+def collect_videos(inputs):
+    """Expand directories, glob patterns and file paths into an ordered list of video files"""
+    videos = []
+    seen = set()
+    for item in inputs:
+        item = os.path.expanduser(item)
+        if os.path.isdir(item):
+            candidates = sorted(
+                os.path.join(item, name)
+                for name in os.listdir(item)
+                if name.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        elif glob.has_magic(item):
+            candidates = sorted(
+                path for path in glob.glob(item, recursive=True)
+                if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        else:
+            candidates = [item]
+        for path in candidates:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                videos.append(path)
+    return videos
+
+def _output_dirs(videos, output_root):
+    """One output directory per video, named after the file, made unique on clashes"""
+    used = set()
+    dirs = []
+    for video_file in videos:
+        stem = os.path.splitext(os.path.basename(video_file))[0]
+        name = stem
+        suffix = 2
+        while name in used:
+            name = f"{stem}-{suffix}"
+            suffix += 1
+        used.add(name)
+        dirs.append(os.path.join(output_root, name))
+    return dirs
+
+def _run_one(video_file, working_dir, options):
+    start = time.perf_counter()
+    cpu_start = _cpu_time()
+    stages = {}
+    pdf = {}
+
+    def on_event(event):
+        if event["event"] == "stage_end":
+            stages[event["stage"]] = event["wall_seconds"]
+        elif event["event"] == "run_end" and "pdf_bytes" in event:
+            pdf.update(pdf_pages=event["pdf_pages"], pdf_bytes=event["pdf_bytes"],
+                       bytes_per_page=event["bytes_per_page"])
+
+    try:
+        process_video(video_file, working_dir=working_dir, on_event=on_event, **options)
+        status, error = "ok", None
+    except BaseException as e:  # compile_pdf reports ImageMagick failures via sys.exit
+        status, error = "failed", str(e) or repr(e)
+    return {
+        "video": video_file,
+        "output_dir": working_dir,
+        "status": status,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 3),
+        "cpu_seconds": round(_cpu_time() - cpu_start, 3),
+        "stage_seconds": stages,
+        **pdf,
+    }
+
+def process_batch(inputs, output_root=None, jobs=None, **options):
+    """Process many videos concurrently, each into its own output directory.
+
+    inputs is a list of video files, directories and/or glob patterns. At most
+    jobs videos (default: the core count) are processed at once; unless
+    ocr_workers is given, each video's OCR pool gets an equal share of the
+    cores so the total stays near the core count. Remaining keyword options
+    are passed to process_video. With use_cache, videos with the same contents
+    share one cache entry; its lock makes the later job wait for the first
+    one's frames and reuse them instead of extracting them again.
+
+    Writes batch_report.json with per-video timings and errors to output_root
+    (default: a "batch" folder in the output folder) and returns the report.
+    """
+    videos = collect_videos(inputs)
+    if not videos:
+        raise ValueError("No video files found")
+    if output_root is None:
+        output_root = os.path.join(get_working_dir(), "batch")
+    os.makedirs(output_root, exist_ok=True)
+
+    cores = os.cpu_count() or 1
+    jobs = max(1, min(int(jobs or cores), len(videos)))
+    options.setdefault('ocr_workers', max(1, cores // jobs))
+    print(f"Processing {len(videos)} videos with {jobs} concurrent jobs")
+
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(_run_one, video_file, working_dir, options): (video_file, working_dir)
+            for video_file, working_dir in zip(videos, _output_dirs(videos, output_root))
+        }
+        for future in as_completed(futures):
+            video_file, working_dir = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process itself died
+                result = {"video": video_file, "output_dir": working_dir, "status": "failed",
+                          "error": str(e) or repr(e), "seconds": None, "cpu_seconds": None,
+                          "stage_seconds": {}}
+            results[video_file] = result
+            print(f"[{len(results)}/{len(videos)}] {result['status']}: {video_file}"
+                  + (f" ({result['seconds']}s)" if result['seconds'] is not None else "")
+                  + (f", {result['bytes_per_page'] / 1e3:.0f} KB/page" if 'bytes_per_page' in result else "")
+                  + (f" - {result['error']}" if result['error'] else ""))
+
+    entries = [results[video_file] for video_file in videos]
+    failed = [entry for entry in entries if entry["status"] != "ok"]
+    report = {
+        "videos": entries,
+        "total": len(entries),
+        "succeeded": len(entries) - len(failed),
+        "failed": len(failed),
+        "jobs": jobs,
+        "wall_seconds": round(time.perf_counter() - start, 3),
+    }
+    report_file = os.path.join(output_root, "batch_report.json")
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{report['succeeded']} of {report['total']} videos succeeded in {report['wall_seconds']}s")
+    for entry in failed:
+        print(f"  FAILED {entry['video']}: {entry['error']}")
+    print(f"Report saved to {report_file}")
+    return report
@@ -0,0 +1,425 @@
+"""Reproducible end-to-end and per-stage benchmarks on synthetic slide videos.
+
+    python benchmark.py                      # run the default scenarios, save results
+    python benchmark.py --quick              # smallest scenario only
+    python benchmark.py --compare bench_results/baseline.json
+    python benchmark.py --ocr-only           # OCR engines only, frames/s each
+    python benchmark.py --imports-only       # import time of the entry points only
+    python benchmark.py --pdf-only           # PDF engines only, on 1000 frames
+
+Videos are generated locally with ffmpeg (cached between runs), every run goes
+through process_video, and per-stage numbers come from its instrumentation
+events. Results are saved as JSON so two runs can be compared for regressions.
+"""
+import argparse
+import contextlib
+import difflib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from app import process_video, extract_frames, list_frames, ocr_frames
+from ocr_engine import has_tesserocr
+
+# Slide-style synthetic videos: content changes every slide_seconds
+SCENARIOS = [
+    {"name": "short-720p", "duration": 30, "size": "1280x720", "slide_seconds": 5},
+    {"name": "fast-720p", "duration": 60, "size": "1280x720", "slide_seconds": 1},
+    {"name": "long-720p", "duration": 300, "size": "1280x720", "slide_seconds": 20},
+    {"name": "slides-1080p", "duration": 60, "size": "1920x1080", "slide_seconds": 10},
+]
+
+# Extraction method and parameter pairs, matching the GUI defaults
+METHODS = [("1", 0.5), ("2", 0.3), ("3", 3.0)]
+
+# Pipeline variants, as process_video keyword arguments
+VARIANTS = {
+    "disk": {},
+    "stream": {"streaming": True},
+    "dedup": {"dedup_distance": 5},
+    "seek": {"fast_seek": "seek"},
+    "keyframes": {"fast_seek": "keyframes"},
+    "segments": {"scene_segments": os.cpu_count() or 1},
+    "numpy": {"scene_detector": "numpy"},
+}
+
+# Variants that only change fixed-interval extraction
+METHOD1_ONLY = {"seek", "keyframes"}
+
+# Variants that only change scene detection
+METHOD2_ONLY = {"segments", "numpy"}
+
+# OCR backends compared on the same frames (tesserocr only when installed)
+OCR_ENGINES = ["pytesseract", "tesseract-batch", "tesserocr"]
+
+# Entry points whose import time is tracked (python -X importtime), and the
+# heavy dependencies that should only load once a command needs them
+IMPORT_MODULES = ["app", "batch", "gui"]
+HEAVY_MODULES = ["pytesseract", "PIL.Image", "numpy", "pyperclip", "asyncio", "tesserocr"]
+
+# PDF engines compared on the same PDF_FRAMES frames, extracted every
+# PDF_INTERVAL seconds from the PDF_SCENARIO video (imagemagick only when
+# its convert command is installed)
+PDF_ENGINES = ["native", "imagemagick"]
+PDF_SCENARIO = "long-720p"
+PDF_INTERVAL = 0.3
+PDF_FRAMES = 1000
+
+# Runs compile_pdf in a fresh interpreter, so each engine's peak RSS is its own;
+# convert's shows up as the children's peak
+PDF_CHILD = """
+import contextlib, io, json, os, resource, sys, time
+from app import compile_pdf, list_frames, _peak_rss
+engine, frames_dir, pdf_file, count = sys.argv[1:]
+frames = list_frames(frames_dir)[:int(count)]
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    compile_pdf(frames_dir, pdf_file, engine=engine, frames=frames)
+print(json.dumps({"wall_seconds": time.perf_counter() - start, "frames": len(frames),
+                  "peak_rss_bytes": _peak_rss(), "children_peak_rss_bytes": _peak_rss(resource.RUSAGE_CHILDREN),
+                  "pdf_bytes": os.path.getsize(pdf_file)}))
+"""
+
+FPS = 25
+
+def _has_filter(name):
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-filters'], capture_output=True, text=True)
+    return any(line.split()[1:2] == [name] for line in result.stdout.splitlines() if line.strip())
+
+def generate_video(path, duration, size, slide_seconds):
+    """Render a synthetic slide video that changes every slide_seconds.
+
+    Each slide is white with a black block that jumps between two positions
+    on the right half (a clear scene change for method "2"), plus numbered
+    bullet text on the left half when this ffmpeg build has drawtext.
+    """
+    width, height = (int(v) for v in size.split('x'))
+    slide = f"trunc(t/{slide_seconds})"
+    graph = (
+        f"color=c=white:s={size}:r={FPS}:d={duration}[bg];"
+        f"color=c=black:s={width // 4}x{height}:r={FPS}[box];"
+        f"[bg][box]overlay=x='W/2+mod({slide}\\,2)*W/4':y=0:eval=frame:shortest=1"
+    )
+    if _has_filter('drawtext'):
+        number = f"%{{eif\\:{slide}+1\\:d}}"
+        graph += "".join(
+            f",drawtext=text='{text}':fontsize={font}:x=w/20:y={y}"
+            for text, font, y in [
+                (f"Slide {number}", height // 12, "h/10"),
+                (f"- First point on slide {number}", height // 24, "h/3"),
+                (f"- Second point on slide {number}", height // 24, "h/2"),
+            ]
+        )
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', graph,
+        '-t', str(duration),
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-g', str(FPS * 10),
+        path
+    ]
+    subprocess.run(cmd, check=True)
+
+def ensure_video(video_dir, scenario):
+    path = os.path.join(video_dir, f"{scenario['name']}.mp4")
+    if not os.path.exists(path):
+        print(f"Generating {path}...")
+        generate_video(path, scenario["duration"], scenario["size"], scenario["slide_seconds"])
+    return path
+
+def run_once(video_file, method, param, extract_text, options):
+    """Run process_video quietly into a scratch folder; returns (wall seconds, events)"""
+    events = []
+    working_dir = tempfile.mkdtemp(prefix="video_to_pdf_bench_")
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_video(video_file, method=method, param=param, extract_text=extract_text,
+                          working_dir=working_dir, on_event=events.append, **options)
+        return time.perf_counter() - start, events
+    finally:
+        shutil.rmtree(working_dir, ignore_errors=True)
+
+def benchmark(scenario, video_file, method, param, variant, extract_text, repeat):
+    runs = [run_once(video_file, method, param, extract_text, VARIANTS[variant]) for _ in range(repeat)]
+    walls = [wall for wall, _ in runs]
+    # Report the run with the median wall time so stage numbers stay consistent
+    wall, events = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    stages = {}
+    for event in events:
+        if event["event"] != "stage_end":
+            continue
+        frames = event.get("frames") or 0
+        seconds = event["wall_seconds"]
+        stages[event["stage"]] = {
+            "wall_seconds": seconds,
+            "cpu_seconds": event["cpu_seconds"],
+            "frames": frames,
+            "frames_per_second": round(frames / seconds, 2) if seconds else None,
+            "bytes_written": event.get("bytes_written"),
+        }
+        if "bytes_per_page" in event:
+            stages[event["stage"]]["bytes_per_page"] = event["bytes_per_page"]
+    frames = stages.get("extract", {}).get("frames", 0)
+    return {
+        "key": f"{scenario['name']}/method{method}/{variant}" + ("" if extract_text else "/no-ocr"),
+        "scenario": scenario,
+        "method": method,
+        "param": param,
+        "variant": variant,
+        "extract_text": extract_text,
+        "wall_seconds": round(wall, 4),
+        "wall_seconds_all": [round(w, 4) for w in walls],
+        "wall_seconds_stdev": round(statistics.stdev(walls), 4) if len(walls) > 1 else 0.0,
+        "frames": frames,
+        "frames_per_second": round(frames / wall, 2) if wall else None,
+        "video_seconds_per_second": round(scenario["duration"] / wall, 2) if wall else None,
+        "peak_rss_bytes": max((e.get("peak_rss_bytes") or 0) for e in events),
+        "stages": stages,
+    }
+
+def benchmark_ocr(scenario, video_file, engine, workers, repeat, preprocess):
+    """Time ocr_frames alone on the frames method "1" extracts from video_file"""
+    frames_dir = tempfile.mkdtemp(prefix="video_to_pdf_bench_ocr_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract_frames(video_file, "1", METHODS[0][1], frames_dir)
+        frames = list_frames(frames_dir)
+        walls = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = list(ocr_frames(frames, workers, engine=engine, preprocess=preprocess))
+            walls.append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(frames_dir, ignore_errors=True)
+    wall = statistics.median(walls)
+    return {
+        "key": f"{scenario['name']}/ocr/{engine}/{preprocess}/workers{workers}",
+        "scenario": scenario,
+        "engine": engine,
+        "preprocess": preprocess,
+        "workers": workers,
+        "wall_seconds": round(wall, 4),
+        "wall_seconds_all": [round(w, 4) for w in walls],
+        "frames": len(frames),
+        "frames_per_second": round(len(frames) / wall, 2) if wall else None,
+        "errors": sum(1 for _, error in results if error),
+        "text": "\n\n".join(text for text, _ in results),
+        "stages": {},
+    }
+
+def extract_pdf_frames(video_file, frames_dir):
+    """Extract the frames the PDF engines are compared on; returns how many there are"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_frames(video_file, "1", PDF_INTERVAL, frames_dir)
+    return min(PDF_FRAMES, len(list_frames(frames_dir)))
+
+def benchmark_pdf(scenario, frames_dir, count, engine, repeat):
+    """Time compile_pdf alone with engine on count frames; None if the engine failed"""
+    runs = []
+    for _ in range(repeat):
+        pdf_file = os.path.join(frames_dir, f'{engine}.pdf')
+        result = subprocess.run([sys.executable, '-c', PDF_CHILD, engine, frames_dir, pdf_file, str(count)],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if os.path.exists(pdf_file):
+            os.remove(pdf_file)
+        if result.returncode != 0:
+            print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"{engine} failed")
+            return None
+        runs.append(json.loads(result.stdout.splitlines()[-1]))
+    walls = [run["wall_seconds"] for run in runs]
+    wall = statistics.median(walls)
+    return {
+        "key": f"{scenario['name']}/pdf/{engine}/frames{count}",
+        "scenario": scenario,
+        "engine": engine,
+        "wall_seconds": round(wall, 4),
+        "wall_seconds_all": [round(w, 4) for w in walls],
+        "frames": count,
+        "frames_per_second": round(count / wall, 2) if wall else None,
+        # The larger of the interpreter and convert, whichever did the work
+        "peak_rss_bytes": max(max(run["peak_rss_bytes"], run["children_peak_rss_bytes"]) for run in runs),
+        "pdf_bytes": runs[-1]["pdf_bytes"],
+        "stages": {},
+    }
+
+def benchmark_import(module, repeat):
+    """Time a cold import of module in a fresh interpreter with -X importtime"""
+    walls = []
+    loaded = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            return None  # e.g. gui without tkinter
+        # "import time: self [us] | cumulative | imported package", one line per module
+        times = {}
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1])
+        walls.append(times.get(module, 0) / 1e6)
+        loaded = [name for name in HEAVY_MODULES if name in times]
+    wall = statistics.median(walls)
+    return {
+        "key": f"imports/{module}",
+        "module": module,
+        "wall_seconds": round(wall, 4),
+        "wall_seconds_all": [round(w, 4) for w in walls],
+        "heavy_modules": loaded,
+        "stages": {},
+    }
+
+def environment():
+    ffmpeg = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.splitlines()
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg[0] if ffmpeg else None,
+        "tesseract": shutil.which('tesseract') is not None,
+        "tesserocr": has_tesserocr(),
+        "commit": commit,
+    }
+
+def compare(baseline, current, threshold):
+    """Print wall-time changes against a baseline; returns the keys that regressed"""
+    before = {row["key"]: row for row in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for row in current["results"]:
+        old = before.get(row["key"])
+        if old is None or not old["wall_seconds"]:
+            print(f"{row['key']:<45} {'-':>10} {row['wall_seconds']:>10.3f}")
+            continue
+        change = row["wall_seconds"] / old["wall_seconds"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(row["key"])
+        print(f"{row['key']:<45} {old['wall_seconds']:>10.3f} {row['wall_seconds']:>10.3f} {change:>+8.1%}{flag}")
+        for stage, stats in row["stages"].items():
+            old_stage = old["stages"].get(stage)
+            if old_stage and old_stage["wall_seconds"]:
+                stage_change = stats["wall_seconds"] / old_stage["wall_seconds"] - 1
+                print(f"  {stage:<43} {old_stage['wall_seconds']:>10.3f} {stats['wall_seconds']:>10.3f} {stage_change:>+8.1%}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process_video on synthetic slide videos.")
+    parser.add_argument('--quick', action='store_true', help='only the smallest scenario')
+    parser.add_argument('--scenario', action='append', choices=[s["name"] for s in SCENARIOS],
+                        help='scenario to run (repeatable; default: all)')
+    parser.add_argument('--method', action='append', choices=['1', '2', '3'], help='extraction method (default: all)')
+    parser.add_argument('--variant', action='append', choices=list(VARIANTS), help='pipeline variant (default: all)')
+    parser.add_argument('--no-ocr', action='store_true', help='skip OCR (default when tesseract is missing)')
+    parser.add_argument('--ocr-engine', action='append', choices=OCR_ENGINES,
+                        help='OCR engine to time on its own (repeatable; default: all installed)')
+    parser.add_argument('--ocr-only', action='store_true', help='only time the OCR engines')
+    parser.add_argument('--imports-only', action='store_true', help='only time importing the entry points')
+    parser.add_argument('--pdf-only', action='store_true',
+                        help=f'only compare the PDF engines on {PDF_FRAMES} frames (time and peak RSS)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark; the median is reported')
+    parser.add_argument('--video-dir', default=os.path.join(tempfile.gettempdir(), 'video_to_pdf_bench_videos'),
+                        help='where generated videos are cached')
+    parser.add_argument('--output', help='results file (default: bench_results/<timestamp>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against an earlier results file')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative wall-time slowdown counted as a regression (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in SCENARIOS if s["name"] in (args.scenario or [s["name"] for s in SCENARIOS])]
+    if args.quick:
+        scenarios = scenarios[:1]
+    methods = [(m, p) for m, p in METHODS if m in (args.method or ['1', '2', '3'])]
+    variants = args.variant or list(VARIANTS)
+    extract_text = not args.no_ocr and shutil.which('tesseract') is not None
+    ocr_engines = [e for e in (args.ocr_engine or OCR_ENGINES) if e != "tesserocr" or has_tesserocr()]
+    if args.ocr_only and not extract_text:
+        parser.error("--ocr-only needs tesseract")
+
+    os.makedirs(args.video_dir, exist_ok=True)
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "results": []}
+    # Startup cost of --help, batch workers and the GUI window
+    for module in IMPORT_MODULES:
+        row = benchmark_import(module, args.repeat)
+        if row is None:
+            continue
+        results["results"].append(row)
+        heavy = ", ".join(row["heavy_modules"]) or "none"
+        print(f"{row['key']:<45} {row['wall_seconds']:>8.3f}s  heavy modules loaded: {heavy}")
+    if args.imports_only or args.pdf_only:
+        scenarios = []
+    if args.pdf_only:
+        scenario = next(s for s in SCENARIOS if s["name"] == PDF_SCENARIO)
+        frames_dir = tempfile.mkdtemp(prefix="video_to_pdf_bench_pdf_")
+        try:
+            count = extract_pdf_frames(ensure_video(args.video_dir, scenario), frames_dir)
+            for engine in PDF_ENGINES:
+                if engine == "imagemagick" and shutil.which('convert') is None:
+                    print(f"{scenario['name']}/pdf/{engine}: not measured, ImageMagick (convert) unavailable")
+                    continue
+                row = benchmark_pdf(scenario, frames_dir, count, engine, args.repeat)
+                if row is None:
+                    continue
+                results["results"].append(row)
+                print(f"{row['key']:<45} {row['wall_seconds']:>8.3f}s  {row['frames']:>5} frames  "
+                      f"peak RSS {row['peak_rss_bytes'] / 2 ** 20:.0f} MiB  PDF {row['pdf_bytes'] / 2 ** 20:.1f} MiB")
+        finally:
+            shutil.rmtree(frames_dir, ignore_errors=True)
+    for scenario in scenarios:
+        video_file = ensure_video(args.video_dir, scenario)
+        if extract_text:
+            # Serial and pooled, so both the per-frame cost and the scaling show
+            for engine in ocr_engines:
+                for workers in sorted({1, os.cpu_count() or 1}):
+                    full_frame = None
+                    for preprocess in ("grayscale", "regions"):
+                        row = benchmark_ocr(scenario, video_file, engine, workers, args.repeat, preprocess)
+                        # Preprocessing must not cost accuracy: compare with whole-frame OCR
+                        if full_frame is None:
+                            full_frame = row["text"]
+                        row["text_similarity"] = round(
+                            difflib.SequenceMatcher(None, full_frame.split(), row.pop("text").split()).ratio(), 4)
+                        results["results"].append(row)
+                        print(f"{row['key']:<45} {row['wall_seconds']:>8.3f}s  {row['frames']:>5} frames  "
+                              f"{row['frames_per_second']} frames/s  {row['text_similarity']:.1%} same words")
+        if args.ocr_only:
+            continue
+        for method, param in methods:
+            for variant in variants:
+                if (method != "1" and variant in METHOD1_ONLY) or (method != "2" and variant in METHOD2_ONLY):
+                    continue
+                row = benchmark(scenario, video_file, method, param, variant, extract_text, args.repeat)
+                results["results"].append(row)
+                print(f"{row['key']:<45} {row['wall_seconds']:>8.3f}s  {row['frames']:>5} frames  "
+                      f"{row['frames_per_second']} frames/s  {row['video_seconds_per_second']}x realtime")
+
+    output = args.output or os.path.join('bench_results', time.strftime("%Y%m%d-%H%M%S") + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+# Lock file inside each entry; whoever uses the entry holds an flock on it
+LOCK_FILE = 'lock'
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Hex digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def settings_key(settings):
+    """Stable short key for a dict of settings"""
+    encoded = json.dumps(settings, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _lock_file(entry_path, wait=True):
+    """Open entry_path's lock file and flock it exclusively.
+
+    Returns the open file, which holds the lock until it is closed, or None
+    if the entry was deleted or (without wait) another process holds it.
+    """
+    lock_path = os.path.join(entry_path, LOCK_FILE)
+    try:
+        f = open(lock_path, 'a')
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # An entry evicted while we waited leaves us locking a deleted file
+        if os.path.samestat(os.fstat(f.fileno()), os.stat(lock_path)):
+            return f
+    except (BlockingIOError, FileNotFoundError):
+        pass
+    f.close()
+    return None
+
+class CacheEntry:
+    """Cached work for one video + extraction settings.
+
+    Layout:
+        frames/            extracted frame PNGs
+        frames.complete    marker written once ffmpeg finished successfully
+        hashes.json        perceptual hash per frame name
+        ocr-<key>.jsonl    OCR text (and word boxes, for searchable PDFs) per frame name, one JSON line per frame,
+                           appended as frames finish so an interrupted run resumes
+        last_used          touched on every use; its mtime drives LRU eviction
+        lock               flock'ed by the job using the entry (see lock())
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.frames_dir = os.path.join(path, 'frames')
+        self._lock = None
+        os.makedirs(path, exist_ok=True)
+
+    def lock(self, wait=True):
+        """Take the entry's exclusive lock, held until close().
+
+        Jobs sharing the cache (batch workers, servers) each hold the lock of
+        the entry they use, so they never extract into the same entry at
+        once and evict() never deletes an entry in use. Returns False if wait
+        is off and another process holds the lock.
+        """
+        while self._lock is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._lock = _lock_file(self.path, wait)
+            if self._lock is None and not wait:
+                return False
+        return True
+
+    def close(self):
+        """Release the lock"""
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def touch(self):
+        marker = os.path.join(self.path, 'last_used')
+        with open(marker, 'a'):
+            pass
+        os.utime(marker)
+
+    def frames_complete(self):
+        return os.path.exists(os.path.join(self.path, 'frames.complete'))
+
+    def reset_frames(self):
+        """Throw away partial frames (and everything derived from them)"""
+        for name in os.listdir(self.path):
+            if name in ('last_used', LOCK_FILE):
+                continue
+            target = os.path.join(self.path, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            else:
+                os.remove(target)
+        os.makedirs(self.frames_dir)
+
+    def mark_frames_complete(self):
+        with open(os.path.join(self.path, 'frames.complete'), 'w'):
+            pass
+
+    def load_hashes(self):
+        try:
+            with open(os.path.join(self.path, 'hashes.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_hashes(self, hashes):
+        path = os.path.join(self.path, 'hashes.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(hashes, f)
+        os.replace(path + '.tmp', path)
+
+    def _ocr_path(self, settings):
+        return os.path.join(self.path, f"ocr-{settings_key(settings)}.jsonl")
+
+    def load_ocr(self, settings, words=None):
+        """Cached OCR text by frame name for the given OCR settings.
+
+        words, if given, is filled with the cached word boxes of the frames
+        that have them (those OCRed for a searchable PDF).
+        """
+        texts = {}
+        try:
+            with open(self._ocr_path(settings)) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn last line from an interrupted run
+                    texts[record['frame']] = record['text']
+                    if words is not None and 'words' in record:
+                        words[record['frame']] = [tuple(word) for word in record['words']]
+        except OSError:
+            pass
+        return texts
+
+    def open_ocr_log(self, settings):
+        """Append-mode handle for add_ocr(); the caller closes it"""
+        return open(self._ocr_path(settings), 'a')
+
+    @staticmethod
+    def add_ocr(log, frame_name, text, words=None):
+        record = {'frame': frame_name, 'text': text}
+        if words is not None:
+            record['words'] = words
+        log.write(json.dumps(record) + '\n')
+        log.flush()
+
+class FrameCache:
+    """Content-addressed cache of extracted frames, frame hashes, OCR text and scene scores.
+
+    Entries are keyed by a digest of the video contents plus the extraction
+    settings, so renaming or moving a video still hits the cache while
+    re-encoding it does not. The total size is capped at max_bytes by evicting
+    the least recently used entries.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'videos'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'scores'), exist_ok=True)
+
+    def video_hash(self, video_file):
+        """Digest of the video contents, memoised by path, size and mtime"""
+        stat = os.stat(video_file)
+        memo_key = settings_key([os.path.abspath(video_file), stat.st_size, stat.st_mtime_ns])
+        memo = os.path.join(self.root, 'videos', memo_key)
+        try:
+            with open(memo) as f:
+                return f.read().strip()
+        except OSError:
+            pass
+        print(f"Hashing {video_file}...")
+        digest = file_digest(video_file)
+        with open(memo, 'w') as f:
+            f.write(digest)
+        return digest
+
+    def entry(self, video_file, method, param, **extraction):
+        """Locked entry for video_file extracted with method/param; extra extraction
+        settings that change the frames (None values are ignored) go in the key too.
+
+        Waits while another job holds the entry; close it (or use it in a with
+        block) when done.
+        """
+        settings = {
+            'video': self.video_hash(video_file),
+            'method': str(method),
+            'param': float(param),
+        }
+        settings.update({name: value for name, value in extraction.items() if value is not None})
+        key = settings_key(settings)
+        entry = CacheEntry(os.path.join(self.root, 'entries', key))
+        if not entry.lock(wait=False):
+            print("Waiting for another job using the same cached frames...")
+            entry.lock()
+        entry.touch()
+        return entry
+
+    def scores_path(self, video_file, settings):
+        """File for per-frame scene scores of video_file computed with settings.
+
+        Scores do not depend on the extraction threshold, so they live outside
+        the entries (and are small enough to be left out of eviction).
+        """
+        key = settings_key({'video': self.video_hash(video_file), **settings})
+        return os.path.join(self.root, 'scores', f"{key}.npz")
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in max_bytes.
+
+        Entries locked by a running job (keep included) are left alone.
+        """
+        entries_dir = os.path.join(self.root, 'entries')
+        entries = []
+        for name in os.listdir(entries_dir):
+            path = os.path.join(entries_dir, name)
+            try:
+                last_used = os.path.getmtime(os.path.join(path, 'last_used'))
+            except OSError:
+                last_used = 0
+            entries.append((last_used, path, _dir_size(path)))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep.path):
+                continue
+            lock = _lock_file(path, wait=False)
+            if lock is None:
+                continue  # in use
+            try:
+                print(f"Evicting cache entry {os.path.basename(path)} ({size / 1024 ** 2:.1f} MB)")
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                lock.close()
+            total -= size
+        return total
@@ -0,0 +1,133 @@
+import os
+import re
+import sqlite3
+
+# Rows are committed in batches of this many changes (and on close), so an
+# interrupted run keeps most of its index without a transaction per frame
+COMMIT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    frame INTEGER PRIMARY KEY,  -- frame number, in extraction order
+    name TEXT,                  -- frame file name (NULL for streamed frames)
+    timestamp REAL,             -- seconds into the video
+    phash INTEGER,              -- 64-bit dHash, stored signed (NULL unless deduplicated)
+    page INTEGER,               -- 1-based page in output.pdf (NULL if dropped)
+    pdf_offset INTEGER,         -- byte offset of the page image in output.pdf
+    text_offset INTEGER,        -- byte offset of the page's section in output.md
+    text_length INTEGER         -- byte length of that section
+);
+CREATE INDEX IF NOT EXISTS frames_timestamp ON frames (timestamp);
+CREATE INDEX IF NOT EXISTS frames_page ON frames (page);
+CREATE INDEX IF NOT EXISTS frames_text_offset ON frames (text_offset);
+"""
+
+COLUMNS = ("frame", "name", "timestamp", "phash", "page", "pdf_offset", "text_offset", "text_length")
+
+def frame_number(name):
+    """Frame number from a file name such as frame0012.png (None if it has no digits)"""
+    match = re.search(r"(\d+)\D*$", os.path.basename(name))
+    return int(match.group(1)) if match else None
+
+def _to_signed(value):
+    return value - (1 << 64) if value is not None and value >= 1 << 63 else value
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value is not None and value < 0 else value
+
+def _record(row):
+    record = dict(zip(COLUMNS, row))
+    record["phash"] = _to_unsigned(record["phash"])
+    return record
+
+class FrameIndex:
+    """Per-run SQLite table with one row per extracted frame.
+
+    Rows are keyed by frame number and filled in stage by stage: timestamp at
+    extraction, perceptual hash at dedup, PDF page and byte offset when the
+    page is written, Markdown offset when the page's text is. Lookups by
+    time, page or Markdown offset go through B-tree indexes, so they take
+    O(log n) however many frames the run has.
+    """
+
+    def __init__(self, path, reset=False):
+        if reset and os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._changes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def _changed(self, count=1):
+        self._changes += count
+        if self._changes >= COMMIT_EVERY:
+            self.commit()
+
+    def add(self, frame, name=None, timestamp=None):
+        self._db.execute("INSERT OR REPLACE INTO frames (frame, name, timestamp) VALUES (?, ?, ?)",
+                         (frame, name, timestamp))
+        self._changed()
+
+    def set_hash(self, frame, phash):
+        self._db.execute("UPDATE frames SET phash = ? WHERE frame = ?", (_to_signed(phash), frame))
+        self._changed()
+
+    def set_page(self, frame, page, pdf_offset=None):
+        self._db.execute("UPDATE frames SET page = ?, pdf_offset = ? WHERE frame = ?", (page, pdf_offset, frame))
+        self._changed()
+
+    def set_text(self, page, offset, length):
+        """Record where the Markdown section for page starts and how long it is"""
+        self._db.execute("UPDATE frames SET text_offset = ?, text_length = ? WHERE page = ?",
+                         (offset, length, page))
+        self._changed()
+
+    def commit(self):
+        self._db.commit()
+        self._changes = 0
+
+    def close(self):
+        if self._db is None:
+            return
+        self.commit()
+        self._db.close()
+        self._db = None
+
+    def _row(self, query, args):
+        row = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM frames {query}", args).fetchone()
+        return _record(row) if row is not None else None
+
+    def frame(self, frame):
+        return self._row("WHERE frame = ?", (frame,))
+
+    def frame_at(self, seconds):
+        """The frame showing the video at seconds: the last one taken at or
+        before it that has a page (dedup drops the rest from the PDF)"""
+        return (self._row("WHERE timestamp <= ? AND page IS NOT NULL ORDER BY timestamp DESC LIMIT 1", (seconds,))
+                or self._row("WHERE timestamp IS NOT NULL AND page IS NOT NULL ORDER BY timestamp LIMIT 1", ())
+                or self._row("WHERE timestamp IS NOT NULL ORDER BY timestamp LIMIT 1", ()))
+
+    def page_frame(self, page):
+        return self._row("WHERE page = ?", (page,))
+
+    def frame_at_text_offset(self, offset):
+        """The frame whose Markdown section contains byte offset of output.md"""
+        return self._row("WHERE text_offset <= ? ORDER BY text_offset DESC LIMIT 1", (offset,))
+
+    def page_count(self):
+        return self._db.execute("SELECT COUNT(*) FROM frames WHERE page IS NOT NULL").fetchone()[0]
+
+    def frames(self, pages_only=False):
+        """Every row in frame order (only frames that made it into the PDF with pages_only)"""
+        where = "WHERE page IS NOT NULL " if pages_only else ""
+        rows = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM frames {where}ORDER BY frame").fetchall()
+        return [_record(row) for row in rows]
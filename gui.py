@@ -1,9 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import asyncio
+import multiprocessing
 import os
-from app import process_video, get_working_dir
+from app import start_job, get_working_dir
+from ocr_engine import ENGINES as OCR_ENGINES
 import threading
 
+# Milliseconds between refreshes of the jobs list
+REFRESH_MS = 200
+
 print("Starting GUI application...")  # Debug print
 
 class App(tk.Tk):
@@ -12,7 +18,7 @@ class App(tk.Tk):
         super().__init__()
 
         self.title("Video to PDF Converter")
-        self.geometry("600x400")
+        self.geometry("600x940")
         
         # Configure main window
         self.columnconfigure(0, weight=1)
@@ -46,6 +52,9 @@ class App(tk.Tk):
             if self.method_var.get() == "1":
                 self.param_label.config(text="Interval (seconds):")
                 self.param_var.set("0.5")
+            elif self.method_var.get() == "3":
+                self.param_label.config(text="Coarse step (seconds):")
+                self.param_var.set("3")
             else:
                 self.param_label.config(text="Scene threshold:")
                 self.param_var.set("0.3")
@@ -55,6 +64,7 @@ class App(tk.Tk):
         # Create radio buttons
         ttk.Radiobutton(options_frame, text="Fixed intervals", variable=self.method_var, value="1").grid(row=0, column=1, padx=5, pady=5)
         ttk.Radiobutton(options_frame, text="Scene detection", variable=self.method_var, value="2").grid(row=0, column=2, padx=5, pady=5)
+        ttk.Radiobutton(options_frame, text="Adaptive sampling", variable=self.method_var, value="3").grid(row=0, column=3, padx=5, pady=5)
 
         # Interval/threshold
         self.param_label = ttk.Label(options_frame, text="Interval (seconds):")
@@ -67,6 +77,64 @@ class App(tk.Tk):
         self.ocr_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(options_frame, text="Extract text (OCR)", variable=self.ocr_var).grid(row=2, column=0, columnspan=2, padx=5, pady=5)
 
+        # OCR worker processes
+        ttk.Label(options_frame, text="OCR workers:").grid(row=3, column=0, padx=5, pady=5)
+        self.ocr_workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        ttk.Spinbox(options_frame, from_=1, to=64, textvariable=self.ocr_workers_var, width=8).grid(row=3, column=1, padx=5, pady=5)
+
+        # Near-duplicate frame removal
+        self.dedup_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Remove duplicate frames", variable=self.dedup_var).grid(row=4, column=0, padx=5, pady=5)
+        ttk.Label(options_frame, text="Max distance:").grid(row=4, column=1, padx=5, pady=5)
+        self.dedup_distance_var = tk.StringVar(value="5")
+        ttk.Entry(options_frame, textvariable=self.dedup_distance_var, width=10).grid(row=4, column=2, padx=5, pady=5)
+
+        # Streaming pipeline
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Stream frames (no temporary files)", variable=self.streaming_var).grid(row=5, column=0, columnspan=2, padx=5, pady=5)
+
+        # Fast seeking for fixed intervals
+        ttk.Label(options_frame, text="Fast seek:").grid(row=7, column=0, padx=5, pady=5)
+        self.fast_seek_var = tk.StringVar(value="off")
+        ttk.Combobox(options_frame, textvariable=self.fast_seek_var, values=["off", "seek", "keyframes"],
+                     state="readonly", width=10).grid(row=7, column=1, padx=5, pady=5)
+
+        # Parallel scene detection
+        ttk.Label(options_frame, text="Scene detection segments:").grid(row=8, column=0, padx=5, pady=5)
+        self.scene_segments_var = tk.StringVar(value="1")
+        ttk.Spinbox(options_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.scene_segments_var,
+                    width=8).grid(row=8, column=1, padx=5, pady=5)
+
+        # Scene change detector
+        ttk.Label(options_frame, text="Scene detector:").grid(row=9, column=0, padx=5, pady=5)
+        self.scene_detector_var = tk.StringVar(value="ffmpeg")
+        ttk.Combobox(options_frame, textvariable=self.scene_detector_var, values=["ffmpeg", "numpy"],
+                     state="readonly", width=10).grid(row=9, column=1, padx=5, pady=5)
+
+        # OCR backend
+        ttk.Label(options_frame, text="OCR engine:").grid(row=10, column=0, padx=5, pady=5)
+        self.ocr_engine_var = tk.StringVar(value="auto")
+        ttk.Combobox(options_frame, textvariable=self.ocr_engine_var, values=list(OCR_ENGINES),
+                     state="readonly", width=14).grid(row=10, column=1, padx=5, pady=5)
+        self.ocr_regions_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Text regions only", variable=self.ocr_regions_var).grid(row=10, column=2, padx=5, pady=5)
+        self.incremental_ocr_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Only OCR text that changed", variable=self.incremental_ocr_var).grid(row=11, column=0, columnspan=2, padx=5, pady=5)
+        self.search_index_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Add text to search index", variable=self.search_index_var).grid(row=11, column=2, padx=5, pady=5)
+
+        # Speech transcript
+        self.audio_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Transcribe audio", variable=self.audio_var).grid(row=12, column=0, columnspan=2, padx=5, pady=5)
+
+        # Work cache
+        self.cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Reuse cached work between runs", variable=self.cache_var).grid(row=6, column=0, columnspan=2, padx=5, pady=5)
+
+        # OCR text layer in the PDF
+        self.searchable_pdf_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Searchable PDF", variable=self.searchable_pdf_var).grid(row=6, column=2, padx=5, pady=5)
+
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.grid(row=2, column=0, pady=20)
@@ -80,19 +148,45 @@ class App(tk.Tk):
         )
         self.start_button.pack(side=tk.LEFT, padx=5)
 
+        self.cancel_button = ttk.Button(buttons_frame, text="Cancel Job", command=self.cancel_selected_jobs)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
         ttk.Button(buttons_frame, text="Open Output Folder", command=self.open_output_folder).pack(side=tk.LEFT, padx=5)
         
         # Progress frame
         progress_frame = ttk.Frame(main_frame)
         progress_frame.grid(row=3, column=0, sticky="ew", pady=10)
         
-        # Progress bar and label
-        self.progress = ttk.Progressbar(progress_frame, mode='indeterminate')
+        # Progress of the selected (or latest) job, and label
+        self.progress = ttk.Progressbar(progress_frame, mode='determinate', maximum=100)
         self.progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
         self.status_label = ttk.Label(progress_frame, text="")
         self.status_label.pack(side=tk.LEFT, padx=5)
 
+        # Jobs list
+        jobs_frame = ttk.LabelFrame(main_frame, text="Jobs")
+        jobs_frame.grid(row=4, column=0, sticky="nsew", pady=10)
+        jobs_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(4, weight=1)
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=("stage", "progress", "eta", "status"), height=6)
+        self.jobs_tree.heading("#0", text="Video")
+        self.jobs_tree.column("#0", width=200)
+        for column, title, width in [("stage", "Stage", 80), ("progress", "Progress", 70),
+                                     ("eta", "ETA", 70), ("status", "Status", 90)]:
+            self.jobs_tree.heading(column, text=title)
+            self.jobs_tree.column(column, width=width, anchor=tk.CENTER)
+        self.jobs_tree.grid(row=0, column=0, sticky="nsew")
+
+        # Jobs run on an asyncio loop in a background thread; the UI polls them
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.jobs = {}  # tree item -> VideoJob
+        self.starting = []  # (file path, future of start_job)
+        self.reported = set()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(REFRESH_MS, self.refresh_jobs)
+
         # Store selected file path
         self.selected_file = None
 
@@ -101,6 +195,9 @@ class App(tk.Tk):
         if self.method_var.get() == "1":
             self.param_label.config(text="Interval (seconds):")
             self.param_var.set("0.5")
+        elif self.method_var.get() == "3":
+            self.param_label.config(text="Coarse step (seconds):")
+            self.param_var.set("3")
         else:
             self.param_label.config(text="Scene threshold:")
             self.param_var.set("0.3")
@@ -119,49 +216,105 @@ class App(tk.Tk):
     def start_processing(self):
         if self.selected_file:
             self.process_video_file(self.selected_file)
-            self.start_button.config(state='disabled')  # Disable during processing
-
-    def update_ui(self, status, is_error=False):
-        """Thread-safe UI updates"""
-        self.after(0, self._do_update_ui, status, is_error)
-
-    def _do_update_ui(self, status, is_error):
-        """Perform UI updates on the main thread"""
-        self.status_label.config(text=status)
-        if status == "Complete!":
-            self.progress.stop()
-            self.start_button.config(state='normal')
-            messagebox.showinfo("Success", "Processing completed successfully!")
-        elif is_error:
-            self.progress.stop()
-            self.start_button.config(state='normal')
-            messagebox.showerror("Error", status)
 
     def process_video_file(self, file_path):
-        def process():
+        """Start a job for file_path; several can run at once"""
+        try:
+            options = dict(
+                method=self.method_var.get(),
+                param=float(self.param_var.get()),
+                extract_text=self.ocr_var.get(),
+                ocr_workers=int(self.ocr_workers_var.get()),
+                dedup_distance=int(self.dedup_distance_var.get()) if self.dedup_var.get() else None,
+                streaming=self.streaming_var.get(),
+                use_cache=self.cache_var.get(),
+                fast_seek=None if self.fast_seek_var.get() == "off" else self.fast_seek_var.get(),
+                scene_segments=int(self.scene_segments_var.get()),
+                scene_detector=self.scene_detector_var.get(),
+                ocr_engine=self.ocr_engine_var.get(),
+                ocr_preprocess="regions" if self.ocr_regions_var.get() else "grayscale",
+                incremental_ocr=self.incremental_ocr_var.get(),
+                search_index=self.search_index_var.get(),
+                searchable_pdf=self.searchable_pdf_var.get(),
+                transcribe_audio=self.audio_var.get()
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid option: {e}")
+            return
+        future = asyncio.run_coroutine_threadsafe(start_job(file_path, **options), self.loop)
+        self.starting.append((file_path, future))
+        self.status_label.config(text=f"Starting {os.path.basename(file_path)}...")
+
+    def refresh_jobs(self):
+        """Poll the jobs and update the list, progress bar and status line"""
+        for file_path, future in list(self.starting):
+            if not future.done():
+                continue
+            self.starting.remove((file_path, future))
+            try:
+                job = future.result()
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+                continue
+            item = self.jobs_tree.insert("", tk.END, text=os.path.basename(file_path))
+            self.jobs[item] = job
+            self.jobs_tree.selection_set(item)
+
+        for item, job in self.jobs.items():
+            eta = f"{int(job.eta) // 60}:{int(job.eta) % 60:02d}" if job.eta is not None else ""
+            self.jobs_tree.item(item, values=(job.stage or "", f"{job.fraction:.0%}", eta, job.status))
+            if job.done and item not in self.reported:
+                self.reported.add(item)
+                if job.status == "done":
+                    messagebox.showinfo("Success", f"Processing completed successfully!\n{job.working_dir}")
+                elif job.status == "failed":
+                    messagebox.showerror("Error", job.error or "Processing failed")
+
+        item = self.current_item()
+        if item is not None:
+            job = self.jobs[item]
+            self.progress["value"] = job.fraction * 100
+            running = sum(not job.done for job in self.jobs.values())
+            self.status_label.config(text=f"{os.path.basename(job.video_file)}: {job.status}"
+                                          + (f" ({running} running)" if running else ""))
+        self.after(REFRESH_MS, self.refresh_jobs)
+
+    def current_item(self):
+        """Tree item of the selected job, else of the latest one (None without jobs)"""
+        selected = self.jobs_tree.selection()
+        return selected[0] if selected else (list(self.jobs)[-1] if self.jobs else None)
+
+    def cancel_selected_jobs(self):
+        for item in self.jobs_tree.selection():
+            self.loop.call_soon_threadsafe(self.jobs[item].cancel)
+
+    def on_close(self):
+        running = [job for job in self.jobs.values() if not job.done]
+        if running:
+            if not messagebox.askyesno("Quit", f"{len(running)} job(s) still running. Cancel them and quit?"):
+                return
+            for job in running:
+                self.loop.call_soon_threadsafe(job.cancel)
+            waiting = asyncio.run_coroutine_threadsafe(self._wait_for_jobs(running), self.loop)
             try:
-                self.progress.start(10)
-                self.update_ui("Processing...")
-                
-                process_video(
-                    file_path,
-                    method=self.method_var.get(),
-                    param=float(self.param_var.get()),
-                    extract_text=self.ocr_var.get()
-                )
-                
-                self.update_ui("Complete!")
+                waiting.result(timeout=10)
             except Exception as e:
-                self.update_ui(str(e), is_error=True)
+                print(f"Jobs did not stop cleanly: {e}")
+        self.destroy()
 
-        thread = threading.Thread(target=process)
-        thread.start()
+    async def _wait_for_jobs(self, jobs):
+        await asyncio.gather(*(job.wait() for job in jobs), return_exceptions=True)
 
     def open_output_folder(self):
-        working_dir = get_working_dir()
+        """Open the selected (or latest) job's output folder, or the shared one without jobs"""
+        item = self.current_item()
+        working_dir = self.jobs[item].working_dir if item is not None else None
+        if working_dir is None or not os.path.isdir(working_dir):
+            working_dir = get_working_dir()
         os.system(f'open "{working_dir}"')
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # jobs run in spawned processes, also from the py2app bundle
     try:
         print("Creating App instance...")  # Debug print
         app = App()
@@ -0,0 +1,425 @@
+import asyncio
+import inspect
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from app import process_video, start_job, get_working_dir, JobCancelled
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Queue database, in the server's root folder next to the per-job output folders
+QUEUE_FILE = 'jobs.db'
+
+# Idle workers look for new jobs at least this often (a submit wakes them at once)
+POLL_INTERVAL = 1.0
+
+# A running job's progress is written to the queue at most this often
+PROGRESS_INTERVAL = 1.0
+
+# Throughput metrics cover jobs that finished within this many seconds
+THROUGHPUT_WINDOW = 3600
+
+# Files a finished job serves under /jobs/<id>/<name>
+OUTPUT_FILES = {'output.pdf': 'application/pdf', 'output.md': 'text/markdown; charset=utf-8'}
+
+# process_video arguments a client may not set: the server picks the output
+# folder, and a client must not make it write files anywhere else
+RESERVED_OPTIONS = {'video_file', 'working_dir', 'on_event', 'metrics_file'}
+
+# A job that was running this many times when a server stopped (most likely
+# because it crashed the server) fails instead of being requeued again
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    video TEXT,
+    options TEXT,              -- process_video keyword arguments, as JSON
+    status TEXT,               -- queued, running, done, failed or cancelled
+    working_dir TEXT,
+    submitted REAL,
+    started REAL,
+    finished REAL,
+    stage TEXT,
+    progress REAL,             -- 0 to 1
+    eta REAL,                  -- seconds left
+    error TEXT,
+    attempts INTEGER DEFAULT 0 -- times a server started the job
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted);
+"""
+
+COLUMNS = ("id", "video", "options", "status", "working_dir", "submitted", "started", "finished",
+           "stage", "progress", "eta", "error", "attempts")
+
+class JobQueue:
+    """Persistent FIFO of process_video jobs in SQLite.
+
+    Every state change is committed straight away, so a server that stops
+    or crashes loses nothing: jobs it was running are put back at the front
+    of the queue by requeue_interrupted() when the next one starts. One
+    connection is shared by the event loop and the HTTP threads, behind a lock.
+    A job that keeps taking the server down with it fails after MAX_ATTEMPTS
+    starts instead of being requeued forever.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _record(self, row):
+        if row is None:
+            return None
+        record = dict(zip(COLUMNS, row))
+        record["options"] = json.loads(record["options"])
+        return record
+
+    def submit(self, video, options, working_dir):
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._db.execute("INSERT INTO jobs (id, video, options, status, working_dir, submitted) "
+                             "VALUES (?, ?, ?, 'queued', ?, ?)",
+                             (job_id, video, json.dumps(options), os.path.join(working_dir, job_id), time.time()))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._record(row)
+
+    def jobs(self, status=None, limit=100):
+        """Most recently submitted jobs first"""
+        where = "WHERE status = ? " if status else ""
+        args = (status, limit) if status else (limit,)
+        with self._lock:
+            rows = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs {where}"
+                                    f"ORDER BY submitted DESC LIMIT ?", args).fetchall()
+        return [self._record(row) for row in rows]
+
+    def position(self, job_id):
+        """1-based place of a queued job in the queue"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND submitted <= "
+                                    "(SELECT submitted FROM jobs WHERE id = ?)", (job_id,)).fetchone()[0]
+
+    def claim(self):
+        """Mark the oldest queued job running and return it, or None"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE status = 'queued' "
+                                       f"ORDER BY submitted LIMIT 1").fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1, "
+                                     "stage = NULL, progress = 0, eta = NULL, error = NULL WHERE id = ?",
+                                     (time.time(), row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self._record(row)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                             (*fields.values(), job_id))
+
+    def cancel(self, job_id):
+        """Cancel a queued job outright; returns the status the job had (None if unknown)"""
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None and row[0] == 'queued':
+                self._db.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?",
+                                 (time.time(), job_id))
+        return row[0] if row is not None else None
+
+    def requeue_interrupted(self, max_attempts=MAX_ATTEMPTS):
+        """Put jobs left running by a server that stopped back in the queue, or
+        mark them failed once they were started max_attempts times; returns
+        (requeued, failed) counts"""
+        with self._lock:
+            failed = self._db.execute("UPDATE jobs SET status = 'failed', finished = ?, eta = NULL, "
+                                      "error = 'Interrupted ' || attempts || ' times' "
+                                      "WHERE status = 'running' AND attempts >= ?",
+                                      (time.time(), max_attempts)).rowcount
+            requeued = self._db.execute("UPDATE jobs SET status = 'queued', stage = NULL, progress = NULL, "
+                                        "eta = NULL WHERE status = 'running'").rowcount
+        return requeued, failed
+
+    def metrics(self, window=THROUGHPUT_WINDOW):
+        """Queue depth, jobs per status and throughput over the last window seconds"""
+        since = time.time() - window
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            finished, wait, run = self._db.execute(
+                "SELECT COUNT(*), AVG(started - submitted), AVG(finished - started) FROM jobs "
+                "WHERE status = 'done' AND finished >= ?", (since,)
+            ).fetchone()
+            oldest = self._db.execute("SELECT MIN(submitted) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "queue_depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "jobs": counts,
+            "done_in_window": finished,
+            "jobs_per_hour": round(finished * 3600 / window, 2),
+            "mean_wait_seconds": round(wait, 2) if wait is not None else None,
+            "mean_run_seconds": round(run, 2) if run is not None else None,
+            "oldest_queued_seconds": round(time.time() - oldest, 2) if oldest is not None else None,
+            "window_seconds": window,
+        }
+
+def check_options(options):
+    """Raise ValueError unless options are process_video keyword arguments a client may set"""
+    if not isinstance(options, dict):
+        raise ValueError("options must be an object")
+    allowed = set(inspect.signature(process_video).parameters) - RESERVED_OPTIONS
+    unknown = sorted(set(options) - allowed)
+    if unknown:
+        raise ValueError(f"Unknown options: {', '.join(unknown)}")
+    # process_video also takes an index file path here; clients only get the shared index
+    if not isinstance(options.get('search_index', False), bool):
+        raise ValueError("search_index must be true or false")
+
+class JobServer:
+    """Local HTTP service running queued process_video jobs.
+
+    workers jobs run at once, each in its own process through start_job(),
+    so they can be cancelled with everything they started. The queue lives
+    in root/jobs.db and each job's outputs in root/<job id>.
+
+        POST   /jobs                      {"video": path, "options": {...}} -> {"id": ...}
+        GET    /jobs[?status=queued]      recent jobs
+        GET    /jobs/<id>                 status, stage, progress, eta, error
+        GET    /jobs/<id>/output.pdf      (and output.md) once the job is done
+        DELETE /jobs/<id>                 cancel it, queued or running
+        GET    /metrics                   queue depth and throughput
+    """
+
+    def __init__(self, root=None, workers=1):
+        self.root = root or os.path.join(get_working_dir(), 'server')
+        os.makedirs(self.root, exist_ok=True)
+        self.workers = max(1, int(workers))
+        self.queue = JobQueue(os.path.join(self.root, QUEUE_FILE))
+        self.started = time.time()
+        self._running = {}  # job id -> VideoJob
+        self._cancel_requested = set()  # running job ids cancelled before their VideoJob existed
+        self._loop = None
+        self._wakeup = None
+
+    def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Run until interrupted (Ctrl-C or SIGTERM); jobs still running then
+        are stopped, and requeued on the next start"""
+        try:
+            asyncio.run(self._serve(host, port))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("Stopped")
+        finally:
+            self.queue.close()
+
+    async def _serve(self, host, port):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        if hasattr(signal, 'SIGTERM'):
+            self._loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        requeued, failed = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"Requeued {requeued} interrupted jobs")
+        if failed:
+            print(f"Failed {failed} jobs interrupted {MAX_ATTEMPTS} times")
+        httpd = ThreadingHTTPServer((host, port), _handler(self))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        print(f"Serving on http://{host}:{httpd.server_port}/ with {self.workers} workers, queue in {self.queue.path}")
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+            for job in self._running.values():
+                job.cancel()
+            await asyncio.gather(*(job.wait() for job in self._running.values()), return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming, so a submit in between still wakes us
+            self._wakeup.clear()
+            record = self.queue.claim()
+            if record is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(record)
+
+    async def _run(self, record):
+        job_id = record["id"]
+        print(f"Starting job {job_id}: {record['video']}")
+        last_write = [0.0]
+
+        def on_update(job):
+            now = time.monotonic()
+            if job.done or now - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            self.queue.update(job_id, stage=job.stage, progress=round(job.fraction, 4),
+                              eta=round(job.eta, 1) if job.eta is not None else None)
+
+        # If the server stops meanwhile, this task is cancelled and the job
+        # is left "running" in the queue, to be requeued on the next start
+        status, error = "done", None
+        try:
+            job = await start_job(record["video"], working_dir=record["working_dir"], on_update=on_update,
+                                  **record["options"])
+        except Exception as e:
+            job = None
+            status, error = "failed", str(e) or repr(e)
+        if job is not None:
+            self._running[job_id] = job
+            if job_id in self._cancel_requested:
+                job.cancel()  # cancelled while start_job was still setting up
+            try:
+                await job.wait()
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                status, error = "failed", str(e) or repr(e)
+            del self._running[job_id]
+        self._cancel_requested.discard(job_id)
+        fields = {"stage": None, "progress": 1.0} if status == "done" else {}
+        self.queue.update(job_id, status=status, error=error, finished=time.time(), eta=None, **fields)
+        print(f"Job {job_id} {status}" + (f": {error}" if error else ""))
+
+    def submit(self, video, options):
+        """Queue a job (from any thread); returns its id"""
+        if not os.path.isfile(video):
+            raise ValueError(f"No such video: {video}")
+        check_options(options)
+        job_id = self.queue.submit(os.path.abspath(video), options, self.root)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a job (from any thread); returns the status it had, None if unknown"""
+        status = self.queue.cancel(job_id)
+        if status == "running":
+            self._loop.call_soon_threadsafe(self._cancel_running, job_id)
+        return status
+
+    def _cancel_running(self, job_id):
+        job = self._running.get(job_id)
+        if job is not None:
+            job.cancel()
+        elif (self.queue.get(job_id) or {}).get("status") == "running":
+            self._cancel_requested.add(job_id)  # _run cancels it once start_job returns
+
+    def describe(self, record):
+        """A job as the API returns it"""
+        record = dict(record)
+        if record["status"] == "queued":
+            record["queue_position"] = self.queue.position(record["id"])
+        if record["status"] == "done":
+            record["files"] = {name: f"/jobs/{record['id']}/{name}" for name in OUTPUT_FILES
+                               if os.path.exists(os.path.join(record["working_dir"], name))}
+        return record
+
+    def metrics(self):
+        metrics = self.queue.metrics()
+        metrics["workers"] = self.workers
+        metrics["uptime_seconds"] = round(time.time() - self.started, 1)
+        return metrics
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # polling clients would flood the console
+
+        def _send(self, status, body):
+            data = json.dumps(body, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_file(self, path, content_type):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(path)}"')
+            self.end_headers()
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+
+        def _parts(self):
+            url = urlparse(self.path)
+            return [part for part in url.path.split('/') if part], parse_qs(url.query)
+
+        def do_GET(self):
+            parts, query = self._parts()
+            if parts == ['metrics']:
+                return self._send(200, server.metrics())
+            if parts == ['jobs']:
+                status = query.get('status', [None])[0]
+                return self._send(200, [server.describe(job) for job in server.queue.jobs(status)])
+            if len(parts) in (2, 3) and parts[0] == 'jobs':
+                record = server.queue.get(parts[1])
+                if record is None:
+                    return self._send(404, {"error": "No such job"})
+                if len(parts) == 2:
+                    return self._send(200, server.describe(record))
+                if parts[2] not in OUTPUT_FILES:
+                    return self._send(404, {"error": "No such file"})
+                if record["status"] != "done":
+                    return self._send(409, {"error": f"Job is {record['status']}"})
+                path = os.path.join(record["working_dir"], parts[2])
+                if not os.path.exists(path):
+                    return self._send(404, {"error": "No such file"})
+                return self._send_file(path, OUTPUT_FILES[parts[2]])
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            parts, _ = self._parts()
+            if parts != ['jobs']:
+                return self._send(404, {"error": "Not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                if not isinstance(body, dict) or not body.get('video'):
+                    raise ValueError("video is required")
+                job_id = server.submit(body['video'], body.get('options') or {})
+            except ValueError as e:  # json.JSONDecodeError included
+                return self._send(400, {"error": str(e)})
+            self._send(201, server.describe(server.queue.get(job_id)))
+
+        def do_DELETE(self):
+            parts, _ = self._parts()
+            if len(parts) != 2 or parts[0] != 'jobs':
+                return self._send(404, {"error": "Not found"})
+            status = server.cancel(parts[1])
+            if status is None:
+                return self._send(404, {"error": "No such job"})
+            if status not in ('queued', 'running'):
+                return self._send(409, {"error": f"Job is {status}"})
+            self._send(202, server.describe(server.queue.get(parts[1])))
+
+    return Handler
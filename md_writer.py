@@ -0,0 +1,84 @@
+import time
+
+# Flush to the file at least this often, so a crash loses little of the transcript
+FLUSH_FRAMES = 10
+FLUSH_SECONDS = 2.0
+
+def format_timestamp(seconds):
+    """Video time as H:MM:SS.s (or M:SS.s under an hour)"""
+    minutes, seconds = divmod(max(0.0, seconds), 60)
+    hours, minutes = divmod(int(minutes), 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:04.1f}"
+    return f"{minutes}:{seconds:04.1f}"
+
+class MarkdownWriter:
+    """Streaming writer for the OCR transcript.
+
+    Each add_frame() call writes one section, headed by the PDF page number
+    and the frame's video timestamp, straight to the file; nothing is kept in
+    memory. Output is flushed every flush_frames sections or flush_seconds,
+    whichever comes first, and on close(), so an interrupted run leaves the
+    transcript up to the last flush on disk.
+
+    target is a path or an open text file (which close() leaves open).
+    on_section(page, offset, length) is called with the byte range of every
+    section written.
+    """
+
+    def __init__(self, target, flush_frames=FLUSH_FRAMES, flush_seconds=FLUSH_SECONDS, on_section=None):
+        if isinstance(target, str):
+            self._file = open(target, 'w', encoding='utf-8', newline='')  # keeps byte offsets exact
+            self._owned = True
+        else:
+            self._file = target
+            self._owned = False
+        self.flush_frames = flush_frames
+        self.flush_seconds = flush_seconds
+        self.on_section = on_section
+        self.frame_count = 0
+        self.offset = 0  # bytes written so far
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_frame(self, page, text, timestamp=None):
+        """Write the text of PDF page number page; empty text writes nothing.
+
+        Returns the section's (byte offset, byte length), or None.
+        """
+        text = text.strip()
+        if not text:
+            return None
+        heading = f"## Page {page}"
+        if timestamp is not None:
+            heading += f" ({format_timestamp(timestamp)})"
+        section = f"{heading}\n\n{text}\n\n"
+        self._file.write(section)
+        offset, length = self.offset, len(section.encode('utf-8'))
+        self.offset += length
+        if self.on_section is not None:
+            self.on_section(page, offset, length)
+        self.frame_count += 1
+        self._unflushed += 1
+        if (self._unflushed >= self.flush_frames
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+        return offset, length
+
+    def flush(self):
+        self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        if self._owned:
+            self._file.close()
@@ -0,0 +1,176 @@
+import os
+import subprocess
+import tempfile
+
+# "auto" picks tesserocr when it is installed, else tesseract-batch; "stub"
+# recognizes nothing and only labels each frame, for tests and benchmarks
+ENGINES = ("auto", "tesserocr", "tesseract-batch", "pytesseract", "stub")
+
+# Tesseract ends every page of a multi-page run with this separator
+PAGE_SEPARATOR = "\f"
+
+def parse_tsv(tsv):
+    """Words of Tesseract TSV output as [(text, left, top, width, height)] in
+    image pixels, by page number (from 1)"""
+    pages = {}
+    for line in tsv.splitlines():
+        fields = line.split('\t')
+        if len(fields) < 12 or not fields[0].isdigit():
+            continue  # header, or a short row
+        page = int(fields[1])
+        pages.setdefault(page, [])
+        text = fields[11].strip()
+        if fields[0] == '5' and text:
+            left, top, width, height = (int(value) for value in fields[6:10])
+            pages[page].append((text, left, top, width, height))
+    return pages
+
+def _load(img):
+    """Frame (file path or PIL image) as the grayscale image that gets recognized"""
+    if isinstance(img, str):
+        from PIL import Image
+        with Image.open(img) as opened:
+            return opened.convert('L')
+    return img.convert('L')
+
+class PytesseractEngine:
+    """The original path: one tesseract process (and model load) per frame"""
+
+    name = "pytesseract"
+    batch_size = 1
+
+    def recognize(self, img):
+        import pytesseract
+        return pytesseract.image_to_string(_load(img)).rstrip(PAGE_SEPARATOR)
+
+    def recognize_words(self, img):
+        """(text, words) for img in one recognition pass; see parse_tsv for words"""
+        import pytesseract
+        text, tsv = pytesseract.run_and_get_multiple_output(_load(img), extensions=['txt', 'tsv'])
+        return text.rstrip(PAGE_SEPARATOR), parse_tsv(tsv).get(1, [])
+
+    def recognize_batch(self, images, words=False):
+        """[(text, error)] for images, or [(text, error, words)] with words set"""
+        results = []
+        for img in images:
+            try:
+                if words:
+                    text, boxes = self.recognize_words(img)
+                    results.append((text, None, boxes))
+                else:
+                    results.append((self.recognize(img), None))
+            except Exception as e:
+                results.append(("", str(e), []) if words else ("", str(e)))
+        return results
+
+class TesseractBatchEngine(PytesseractEngine):
+    """One tesseract process per batch of frames.
+
+    The frames are handed over as a file list, so the language model is
+    loaded once per batch instead of once per frame; the output is split
+    back into frames on the page separator. A batch whose output does not
+    split cleanly (a frame tesseract could not read) is redone frame by frame.
+    """
+
+    name = "tesseract-batch"
+    batch_size = 8
+
+    def recognize_batch(self, images, words=False):
+        if len(images) == 1:
+            return super().recognize_batch(images, words)
+        with tempfile.TemporaryDirectory(prefix='ocr_batch_') as tmp:
+            try:
+                paths = []
+                for index, img in enumerate(images):
+                    path = os.path.join(tmp, f'{index:04d}.pgm')  # no compression to pay for
+                    _load(img).save(path)
+                    paths.append(path)
+            except Exception:
+                return super().recognize_batch(images, words)
+            list_file = os.path.join(tmp, 'frames.txt')
+            with open(list_file, 'w') as f:
+                f.write('\n'.join(paths) + '\n')
+            # With words, one run writes both the text and the TSV word boxes
+            output = os.path.join(tmp, 'out')
+            import pytesseract
+            cmd = [pytesseract.pytesseract.tesseract_cmd, list_file]
+            cmd += [output, 'txt', 'tsv'] if words else ['stdout']
+            try:
+                result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True)
+                if words and result.returncode == 0:
+                    with open(output + '.txt', encoding='utf-8', errors='replace') as f:
+                        text = f.read()
+                    with open(output + '.tsv', encoding='utf-8', errors='replace') as f:
+                        boxes = parse_tsv(f.read())
+                else:
+                    text = result.stdout.decode('utf-8', errors='replace')
+            except OSError:
+                return super().recognize_batch(images, words)  # reports the error per frame
+        pages = text.split(PAGE_SEPARATOR)
+        if result.returncode != 0 or len(pages) != len(images) + 1:
+            return super().recognize_batch(images, words)
+        if words:
+            return [(page, None, boxes.get(number, [])) for number, page in enumerate(pages[:-1], start=1)]
+        return [(page, None) for page in pages[:-1]]
+
+class TesserocrEngine(PytesseractEngine):
+    """Tesseract's C API through tesserocr: the model stays loaded in-process"""
+
+    name = "tesserocr"
+    batch_size = 4  # only to cut down on pickling round trips
+
+    def __init__(self):
+        import tesserocr
+        self._api = tesserocr.PyTessBaseAPI()
+
+    def recognize(self, img):
+        self._api.SetImage(_load(img))
+        return self._api.GetUTF8Text()
+
+    def recognize_words(self, img):
+        self._api.SetImage(_load(img))
+        text = self._api.GetUTF8Text()  # recognizes; the TSV reuses the result
+        return text, parse_tsv(self._api.GetTSVText(0)).get(1, [])
+
+class StubEngine(PytesseractEngine):
+    """Recognizes nothing: one word per frame naming its size, for tests"""
+
+    name = "stub"
+    batch_size = 2
+
+    def recognize(self, img):
+        return self.recognize_words(img)[0]
+
+    def recognize_words(self, img):
+        width, height = _load(img).size
+        text = f"[frame {width}x{height}]"
+        return text, [(text, 0, 0, width, height)]
+
+def has_tesserocr():
+    """Whether tesserocr is installed and can find the English model"""
+    try:
+        import tesserocr
+    except ImportError:
+        return False
+    return 'eng' in tesserocr.get_languages()[1]
+
+def resolve_engine(name=None):
+    """Concrete engine name for name (None or "auto" picks the fastest available)"""
+    name = name or "auto"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    if name == "auto":
+        return "tesserocr" if has_tesserocr() else "tesseract-batch"
+    return name
+
+def engine_class(name=None):
+    return {
+        "tesserocr": TesserocrEngine,
+        "tesseract-batch": TesseractBatchEngine,
+        "pytesseract": PytesseractEngine,
+        "stub": StubEngine,
+    }[resolve_engine(name)]
+
+def create_engine(name=None):
+    """A ready-to-use engine; keep it around, creating one may load the model"""
+    return engine_class(name)()
@@ -0,0 +1,222 @@
+import math
+import numpy as np
+from PIL import Image
+
+# "regions" crops to detected text and normalises its size; "grayscale" OCRs the whole frame
+MODES = ("regions", "grayscale")
+
+# Part of the OCR cache key; bump when a change here alters OCR output
+VERSION = 1
+
+# Tesseract reads best at x-heights of roughly 20-30 px; frames are scaled to this
+TARGET_X_HEIGHT = 22
+MIN_SCALE = 0.25
+MAX_SCALE = 2.0
+# Typical x-height as a share of a text line's full height (ascenders to descenders)
+X_HEIGHT_RATIO = 0.5
+
+# Text regions are found on a copy at most this wide
+ANALYSIS_WIDTH = 960
+# Adaptive threshold: a pixel is ink when it differs from the mean of the
+# WINDOW x WINDOW pixels around it by more than OFFSET gray levels
+WINDOW = 31
+OFFSET = 12
+
+# Region detection works on CELL x CELL blocks of the analysis copy
+CELL = 8
+# Ink share of a block that can be text; denser blocks are photos, video or solid fills
+MIN_CELL_INK = 0.02
+MAX_CELL_INK = 0.45
+# Regions this dense overall are texture (a webcam overlay), not text
+MAX_REGION_INK = 0.3
+# Text lines make the ink share swing from row to row (gaps between lines,
+# x-height against ascenders); texture spreads it evenly. Regions whose row
+# profile varies less than this (std / mean) are dropped.
+MIN_ROW_VARIATION = 0.4
+# Blocks this many cells apart on a line still belong to the same region
+WORD_GAP = 4
+# Regions need at least this many text blocks, and to be this many blocks wide
+# (narrower ones are the edges of pictures and overlays, or lone characters)
+MIN_REGION_CELLS = 3
+MIN_REGION_WIDTH = 3
+# Pixels kept around each crop (in frame pixels) and between stacked crops
+MARGIN = 12
+
+# Incremental OCR compares consecutive frames in TILE x TILE blocks of the
+# analysis copy; a block changed when its mean absolute difference is above
+# TILE_CHANGE gray levels (well above video compression noise)
+TILE = 32
+TILE_CHANGE = 4
+
+def _local_mean(gray, window):
+    """Mean of the window x window neighbourhood of every pixel, via an integral image"""
+    pad = window // 2
+    padded = np.pad(gray, pad, mode='edge').astype(np.int64)
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.int64)
+    integral[1:, 1:] = padded.cumsum(axis=0).cumsum(axis=1)
+    height, width = gray.shape
+    total = (integral[window:window + height, window:window + width]
+             - integral[:height, window:window + width]
+             - integral[window:window + height, :width]
+             + integral[:height, :width])
+    return total / (window * window)
+
+def ink_mask(gray, window=WINDOW, offset=OFFSET):
+    """Text pixels: darker than their surroundings, or lighter on a mostly dark frame"""
+    mean = _local_mean(gray, window)
+    if np.median(gray) < 128:
+        return gray > mean + offset  # light text on a dark background
+    return gray < mean - offset
+
+def binarize(gray, window=WINDOW, offset=OFFSET):
+    """Black text on white, whichever way round the text was drawn"""
+    return np.where(ink_mask(gray, window, offset), 0, 255).astype(np.uint8)
+
+def _runs(mask, max_gap=0):
+    """[start, end) index ranges of True values in a 1-D mask, bridging gaps of up to max_gap"""
+    indices = np.flatnonzero(mask)
+    if not len(indices):
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > max_gap + 1)
+    starts = np.concatenate([[indices[0]], indices[breaks + 1]])
+    ends = np.concatenate([indices[breaks], [indices[-1]]]) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def text_regions(ink):
+    """Text boxes (top, bottom, left, right) in reading order, from a boolean ink mask.
+
+    Ink is summed over CELL x CELL blocks; blocks with a text-like ink share
+    are grouped into horizontal bands by row projection, then split into
+    regions where the band's column projection has a gap of WORD_GAP blocks.
+    Regions that are too dense or too even row to row are dropped as texture.
+    """
+    rows, cols = ink.shape[0] // CELL, ink.shape[1] // CELL
+    if not rows or not cols:
+        return []
+    density = ink[:rows * CELL, :cols * CELL].reshape(rows, CELL, cols, CELL).mean(axis=(1, 3))
+    text = (density > MIN_CELL_INK) & (density < MAX_CELL_INK)
+    regions = []
+    for top, bottom in _runs(text.any(axis=1)):
+        band = text[top:bottom]
+        for left, right in _runs(band.any(axis=0), max_gap=WORD_GAP - 1):
+            if right - left < MIN_REGION_WIDTH or band[:, left:right].sum() < MIN_REGION_CELLS:
+                continue
+            if density[top:bottom, left:right].mean() > MAX_REGION_INK:
+                continue
+            profile = ink[top * CELL:bottom * CELL, left * CELL:right * CELL].mean(axis=1)
+            if profile.std() < MIN_ROW_VARIATION * profile.mean():
+                continue
+            regions.append((top * CELL, bottom * CELL, left * CELL, right * CELL))
+    return regions
+
+def line_height(ink, regions):
+    """Median height in pixels of the text lines inside regions (None without any)"""
+    heights = []
+    for top, bottom, left, right in regions:
+        profile = ink[top:bottom, left:right].mean(axis=1)
+        heights.extend(end - start for start, end in _runs(profile > 0.01) if end - start >= 3)
+    return float(np.median(heights)) if heights else None
+
+def find_text(gray):
+    """Locate text in a grayscale PIL frame.
+
+    Returns (small, factor, regions, scale): the analysis copy as a uint8
+    array, its size relative to the frame, the text regions in analysis
+    pixels and the scale that brings the text to TARGET_X_HEIGHT.
+    """
+    factor = min(1.0, ANALYSIS_WIDTH / gray.width)
+    small = gray
+    if factor < 1.0:
+        small = gray.resize((round(gray.width * factor), round(gray.height * factor)), Image.BOX)
+    small = np.asarray(small)
+    ink = ink_mask(small.astype(np.int16))
+    regions = text_regions(ink)
+    height = line_height(ink, regions)
+    scale = 1.0
+    if height:
+        scale = TARGET_X_HEIGHT / (height * X_HEIGHT_RATIO / factor)
+        scale = min(MAX_SCALE, max(MIN_SCALE, scale))
+    return small, factor, regions, scale
+
+def render(gray, regions, factor, scale, layout=None):
+    """Crop regions (analysis pixels) out of the frame, resize and binarize them,
+    and stack them top to bottom on one white page.
+
+    layout, if given, gets a (top, bottom, box, x_scale, y_scale) entry per
+    crop: its rows on the page, its box in the frame and its resize factors,
+    which is what map_words() needs to put OCR word boxes back on the frame.
+    """
+    crops = []
+    boxes = []
+    for top, bottom, left, right in regions:
+        box = (max(0, int(left / factor) - MARGIN), max(0, int(top / factor) - MARGIN),
+               min(gray.width, int(right / factor) + MARGIN), min(gray.height, int(bottom / factor) + MARGIN))
+        crop = gray.crop(box)
+        boxes.append(box)
+        size = (max(1, round(crop.width * scale)), max(1, round(crop.height * scale)))
+        if size != crop.size:
+            crop = crop.resize(size, Image.BOX if scale < 1 else Image.BICUBIC)
+        crops.append(binarize(np.asarray(crop, dtype=np.int16)))
+
+    canvas = np.full((sum(c.shape[0] for c in crops) + MARGIN * (len(crops) + 1),
+                      max(c.shape[1] for c in crops) + 2 * MARGIN), 255, dtype=np.uint8)
+    y = MARGIN
+    for crop, box in zip(crops, boxes):
+        canvas[y:y + crop.shape[0], MARGIN:MARGIN + crop.shape[1]] = crop
+        if layout is not None:
+            layout.append((y, y + crop.shape[0], box,
+                           crop.shape[1] / (box[2] - box[0]), crop.shape[0] / (box[3] - box[1])))
+        y += crop.shape[0] + MARGIN
+    return Image.fromarray(canvas)
+
+def prepare(img, mode="regions", layout=None):
+    """Frame as the grayscale PIL image Tesseract should see, or None when it has no text.
+
+    In "regions" mode the frame is scaled so its text has an x-height of about
+    TARGET_X_HEIGHT, binarized with a local threshold, and only the detected
+    text regions are kept, stacked top to bottom in reading order (layout is
+    filled in as in render()).
+    """
+    gray = img.convert('L')
+    if mode == "grayscale":
+        return gray
+    if mode not in MODES:
+        raise ValueError(f"Unknown OCR preprocessing mode: {mode}")
+    _, factor, regions, scale = find_text(gray)
+    if not regions:
+        return None
+    return render(gray, regions, factor, scale, layout)
+
+def map_words(words, layout):
+    """OCR word boxes (text, left, top, width, height) on a prepared image,
+    moved back to frame pixels with its layout (an empty layout means the
+    whole frame was OCRed as is). Words outside every crop are dropped."""
+    if not layout:
+        return list(words)
+    mapped = []
+    for text, left, top, width, height in words:
+        middle = top + height / 2
+        for crop_top, crop_bottom, box, x_scale, y_scale in layout:
+            if crop_top <= middle < crop_bottom:
+                mapped.append((text,
+                               round(box[0] + (left - MARGIN) / x_scale),
+                               round(box[1] + (top - crop_top) / y_scale),
+                               max(1, round(width / x_scale)),
+                               max(1, round(height / y_scale))))
+                break
+    return mapped
+
+def changed_tiles(before, after, tile=TILE, threshold=TILE_CHANGE):
+    """Boolean grid of the tile x tile blocks whose mean absolute difference
+    between two analysis copies exceeds threshold (None if their sizes differ)"""
+    if before is None or before.shape != after.shape:
+        return None
+    rows, cols = math.ceil(after.shape[0] / tile), math.ceil(after.shape[1] / tile)
+    diff = np.zeros((rows * tile, cols * tile), dtype=np.float32)
+    diff[:after.shape[0], :after.shape[1]] = np.abs(after.astype(np.int16) - before.astype(np.int16))
+    return diff.reshape(rows, tile, cols, tile).mean(axis=(1, 3)) > threshold
+
+def region_changed(changed, region, tile=TILE):
+    """Whether any changed tile overlaps region (analysis pixels)"""
+    top, bottom, left, right = region
+    return bool(changed[top // tile:math.ceil(bottom / tile), left // tile:math.ceil(right / tile)].any())
@@ -0,0 +1,452 @@
+import io
+import mmap
+import re
+import struct
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Page sizes in PDF points (1/72 inch), portrait
+PAGE_SIZES = {
+    'A4': (595.28, 841.89),
+    'A3': (841.89, 1190.55),
+    'letter': (612.0, 792.0),
+    'legal': (612.0, 1008.0),
+}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+COMPRESSIONS = ('flate', 'jpeg')
+# "bilevel" keeps 1 bit per pixel (black text on white, from an adaptive
+# threshold), for text slides; it is always stored losslessly
+COLORS = ('color', 'gray', 'bilevel')
+
+# An image encoded for a page: pixel size, image dictionary entries and
+# stream data, plus the size of the source image, which sets the page layout
+EncodedImage = namedtuple('EncodedImage', 'width height entries data source_size')
+
+# Invisible text layer font: not embedded and never drawn (text render mode
+# 3), every glyph half an em wide, with character codes equal to UTF-16 code
+# units so copied and searched text maps straight back to Unicode
+TEXT_FONT = "GlyphLessFont"
+GLYPH_WIDTH = 0.5
+
+def _to_unicode_cmap():
+    """ToUnicode CMap mapping every 2-byte code to the same UTF-16 code unit"""
+    lines = [
+        "/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+        "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange",
+    ]
+    # A bfrange may only vary in its last byte, and a block holds at most 100
+    for start in range(0, 256, 100):
+        highs = range(start, min(start + 100, 256))
+        lines.append(f"{len(highs)} beginbfrange")
+        lines.extend(f"<{high:02X}00> <{high:02X}FF> <{high:02X}00>" for high in highs)
+        lines.append("endbfrange")
+    lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    return '\n'.join(lines).encode()
+
+def _utf16_hex(text):
+    """text as a hex string of 2-byte codes (characters outside the BMP become U+FFFD)"""
+    return ''.join(f"{ord(char) if ord(char) < 0x10000 else 0xFFFD:04X}" for char in text)
+
+def _encode_png(data, source_size=None):
+    """PNG bytes as an EncodedImage without decoding them, or None if PDF can't take them as is"""
+    parts = _png_parts(data)
+    if parts is None:
+        return None
+    width, height, color_type, bit_depth, interlace, idat = parts
+    if bit_depth != 8 or interlace or color_type not in (0, 2):
+        return None
+    colors = 3 if color_type == 2 else 1
+    color_space = '/DeviceRGB' if colors == 3 else '/DeviceGray'
+    entries = (f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /FlateDecode "
+               f"/DecodeParms << /Predictor 15 /Colors {colors} /BitsPerComponent 8 /Columns {width} >>")
+    return EncodedImage(width, height, entries, idat, source_size or (width, height))
+
+def encode_image(img, compression='flate', quality=85, color='color', max_size=None):
+    """Encode img (a PIL image or image file path) as an EncodedImage.
+
+    color converts to "gray" or "bilevel"; max_size downscales so neither
+    side is longer than that many pixels (the page keeps the source size).
+    """
+    from PIL import Image
+    if isinstance(img, str):
+        if compression == 'flate' and color == 'color':
+            with open(img, 'rb') as f:
+                data = f.read()
+            parts = _png_parts(data)
+            if parts is not None and (not max_size or max(parts[0], parts[1]) <= max_size):
+                encoded = _encode_png(data)
+                if encoded is not None:
+                    return encoded  # PNG frames from ffmpeg pass through undecoded
+        img = Image.open(img)
+        img.load()
+
+    source_size = img.size
+    if max_size and max(img.size) > max_size:
+        factor = max_size / max(img.size)
+        img = img.resize((max(1, round(img.width * factor)), max(1, round(img.height * factor))), Image.BOX)
+    if color == 'gray' and img.mode != 'L':
+        img = img.convert('L')
+    elif color == 'bilevel' and img.mode != '1':
+        import numpy as np
+        import ocr_preprocess
+        gray = np.asarray(img.convert('L'), dtype=np.int16)
+        img = Image.fromarray(ocr_preprocess.binarize(gray)).convert('1', dither=Image.NONE)
+    elif img.mode not in ('RGB', 'L', '1'):
+        img = img.convert('RGB')
+
+    if compression == 'jpeg' and img.mode != '1':
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG', quality=quality, optimize=True)
+        color_space = '/DeviceGray' if img.mode == 'L' else '/DeviceRGB'
+        entries = f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /DCTDecode"
+        return EncodedImage(img.width, img.height, entries, buf.getvalue(), source_size)
+
+    if img.mode == '1':
+        # 1 bit per pixel, rows padded to a byte, 0 = black: exactly DeviceGray at 1 bpc
+        data = zlib.compress(img.tobytes())
+        entries = "/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode"
+        return EncodedImage(img.width, img.height, entries, data, source_size)
+    buf = io.BytesIO()
+    img.save(buf, 'PNG', compress_level=6)
+    return _encode_png(buf.getvalue(), source_size)
+
+# Settings fit_options() picks from, best looking first; the bilevel ones
+# are a last resort, as they lose pictures
+SIZE_LADDER = [
+    {'compression': 'flate'},
+    {'compression': 'jpeg', 'quality': 90},
+    {'compression': 'jpeg', 'quality': 75},
+    {'compression': 'jpeg', 'quality': 60},
+    {'compression': 'jpeg', 'quality': 60, 'max_size': 1920},
+    {'compression': 'jpeg', 'quality': 50, 'max_size': 1280},
+    {'compression': 'jpeg', 'quality': 50, 'max_size': 1280, 'color': 'gray'},
+    {'compression': 'jpeg', 'quality': 35, 'max_size': 960, 'color': 'gray'},
+    {'compression': 'jpeg', 'quality': 25, 'max_size': 640, 'color': 'gray'},
+    {'compression': 'flate', 'max_size': 1280, 'color': 'bilevel'},
+    {'compression': 'flate', 'max_size': 800, 'color': 'bilevel'},
+]
+
+# Sizes are estimated from this many evenly spaced pages
+SAMPLE_PAGES = 8
+# Bytes per page besides the image (page and content objects, xref entry)
+PAGE_OVERHEAD = 300
+
+def fit_options(images, target_bytes, options=None, samples=SAMPLE_PAGES):
+    """PdfWriter options for images (a list) whose PDF should come to at most
+    target_bytes: the first SIZE_LADDER entry, merged over options, whose
+    estimate fits (else the last one). Returns (options, estimated bytes).
+
+    Each estimate encodes up to samples evenly spaced images and scales
+    their mean size up to the whole list.
+    """
+    options = dict(options or {})
+    step = max(1, len(images) / samples)
+    sample = [images[int(index * step)] for index in range(min(samples, len(images)))]
+    if not sample:
+        return options, 0
+    with ThreadPoolExecutor(max_workers=options.get('workers') or 1) as executor:
+        for settings in SIZE_LADDER:
+            candidate = {**options, **settings}
+            sizes = executor.map(lambda img: len(encode_image(
+                img, candidate.get('compression', 'flate'), candidate.get('quality', 85),
+                candidate.get('color', 'color'), candidate.get('max_size')).data), sample)
+            estimate = round((sum(sizes) / len(sample) + PAGE_OVERHEAD) * len(images))
+            if estimate <= target_bytes:
+                break
+    return candidate, estimate
+
+def _num(value):
+    """Format a number for a PDF content stream"""
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+def _png_parts(data):
+    """Split PNG bytes into (width, height, color_type, bit_depth, interlace, idat).
+
+    The concatenated IDAT payload is a zlib stream with PNG row filters, which
+    PDF's FlateDecode reads as-is given the matching /Predictor parameters.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    pos = len(PNG_SIGNATURE)
+    header = None
+    idat = []
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif chunk_type == b'IDAT':
+            idat.append(chunk)
+        elif chunk_type == b'IEND':
+            break
+        pos += length + 12
+    if header is None:
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = header
+    return width, height, color_type, bit_depth, interlace, b''.join(idat)
+
+class PdfWriter:
+    """Incremental PDF writer for image pages, optionally with an invisible OCR text layer.
+
+    Each add_page() call encodes one image and writes its objects straight to
+    the file, so memory use stays flat however many pages are added; only the
+    object offsets are kept for the cross-reference table written by close().
+
+    page_size is None (each page sized to its image at dpi), a name from
+    PAGE_SIZES, or a (width, height) tuple in points; images are scaled to fit
+    and centred, with the page turned to match the image orientation.
+
+    compression ("flate" or "jpeg" at quality), color ("color", "gray" or
+    "bilevel") and max_size (longest image side in pixels) set how page
+    images are encoded; see encode_image(). encode_all() encodes on workers
+    threads ahead of add_page().
+    """
+
+    def __init__(self, path, page_size=None, dpi=300, compression='flate', quality=85, color='color',
+                 max_size=None, workers=1):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown PDF compression: {compression}")
+        if color not in COLORS:
+            raise ValueError(f"Unknown PDF color mode: {color}")
+        if isinstance(page_size, str):
+            if page_size not in PAGE_SIZES:
+                raise ValueError(f"Unknown page size: {page_size}")
+            page_size = PAGE_SIZES[page_size]
+        self.page_size = page_size
+        self.dpi = dpi
+        self.compression = compression
+        self.quality = quality
+        self.color = color
+        self.max_size = max_size
+        self.workers = max(1, int(workers or 1))
+        self.page_count = 0
+        self._file = open(path, 'wb')
+        self._offsets = [None, None, None]  # object 0 is the free-list head; 1 catalog, 2 page tree
+        self._page_ids = []
+        self._image_ids = []
+        self._font_id = None  # text layer font, written with the first page that needs it
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def _new_object(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode())
+        self._file.write(body.encode())
+        if stream is not None:
+            self._file.write(b'\nstream\n')
+            self._file.write(stream)
+            self._file.write(b'\nendstream')
+        self._file.write(b'\nendobj\n')
+
+    def encode(self, img, compression=None, quality=None):
+        """img encoded with the writer's settings (compression and quality override them)"""
+        return encode_image(img, compression or self.compression, quality or self.quality,
+                            self.color, self.max_size)
+
+    def encode_all(self, images):
+        """Yield (image, EncodedImage) for images in order, encoded on
+        self.workers threads (PIL and zlib release the GIL while encoding)
+        with a few images in flight per thread"""
+        if self.workers <= 1:
+            for img in images:
+                yield img, self.encode(img)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for img in images:
+                pending.append((img, executor.submit(self.encode, img)))
+                if len(pending) >= self.workers * 2:
+                    img, future = pending.popleft()
+                    yield img, future.result()
+            while pending:
+                img, future = pending.popleft()
+                yield img, future.result()
+
+    def _page_geometry(self, width, height):
+        """MediaBox size and image placement (page_w, page_h, x, y, w, h) in points"""
+        img_w = width * 72.0 / self.dpi
+        img_h = height * 72.0 / self.dpi
+        if self.page_size is None:
+            return img_w, img_h, 0, 0, img_w, img_h
+        page_w, page_h = self.page_size
+        if (width > height) != (page_w > page_h):
+            page_w, page_h = page_h, page_w
+        scale = min(page_w / img_w, page_h / img_h)
+        w, h = img_w * scale, img_h * scale
+        return page_w, page_h, (page_w - w) / 2, (page_h - h) / 2, w, h
+
+    def _text_font(self):
+        """Object id of the text layer font, writing it on first use"""
+        if self._font_id is None:
+            to_unicode = _to_unicode_cmap()
+            cmap_id, descriptor_id, cid_font_id = self._new_object(), self._new_object(), self._new_object()
+            self._write_object(cmap_id, f"<< /Length {len(to_unicode)} >>", to_unicode)
+            self._write_object(
+                descriptor_id,
+                f"<< /Type /FontDescriptor /FontName /{TEXT_FONT} /Flags 5 /FontBBox [0 0 {int(GLYPH_WIDTH * 1000)} 1000] "
+                f"/ItalicAngle 0 /Ascent 1000 /Descent 0 /CapHeight 1000 /StemV 80 >>",
+            )
+            self._write_object(
+                cid_font_id,
+                f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{TEXT_FONT} "
+                f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                f"/FontDescriptor {descriptor_id} 0 R /DW {int(GLYPH_WIDTH * 1000)} /CIDToGIDMap /Identity >>",
+            )
+            self._font_id = self._new_object()
+            self._write_object(
+                self._font_id,
+                f"<< /Type /Font /Subtype /Type0 /BaseFont /{TEXT_FONT} /Encoding /Identity-H "
+                f"/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {cmap_id} 0 R >>",
+            )
+        return self._font_id
+
+    @staticmethod
+    def _text_layer(words, width, height, x, y, w, h):
+        """Content stream operators drawing words (text, left, top, width,
+        height in image pixels) invisibly over an image placed at x, y, w, h"""
+        scale_x, scale_y = w / width, h / height
+        ops = ["BT", "3 Tr"]
+        for text, left, top, box_w, box_h in words:
+            size = max(1.0, box_h * scale_y)
+            # Stretch the word across its box; the trailing space separates words when copied
+            stretch = 100 * box_w * scale_x / (len(text) * GLYPH_WIDTH * size)
+            ops.append(f"/F0 {_num(size)} Tf {_num(stretch)} Tz "
+                       f"1 0 0 1 {_num(x + left * scale_x)} {_num(y + h - (top + box_h) * scale_y)} Tm "
+                       f"<{_utf16_hex(text + ' ')}> Tj")
+        ops.append("ET")
+        return ' '.join(ops)
+
+    def add_page(self, img, compression=None, quality=None, words=None):
+        """Append one page showing img (a PIL image, an image file path or an
+        EncodedImage from encode()/encode_all()).
+
+        compression and quality override the writer defaults for this page.
+        words, a list of (text, left, top, width, height) boxes in image
+        pixels, are laid over the image as invisible text, which makes the
+        page searchable and its text selectable.
+        Returns the zero-based page number.
+        """
+        if not isinstance(img, EncodedImage):
+            img = self.encode(img, compression, quality)
+        width, height, entries, data, (source_w, source_h) = img
+        page_w, page_h, x, y, w, h = self._page_geometry(source_w, source_h)
+
+        image_id = self._new_object()
+        self._write_object(
+            image_id,
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"{entries} /Length {len(data)} >>",
+            data,
+        )
+        content = f"q {_num(w)} 0 0 {_num(h)} {_num(x)} {_num(y)} cm /Im0 Do Q"
+        fonts = ""
+        words = [word for word in words or [] if word[0]]
+        if words:
+            content += "\n" + self._text_layer(words, source_w, source_h, x, y, w, h)
+            fonts = f" /Font << /F0 {self._text_font()} 0 R >>"
+        content = content.encode()
+        content_id = self._new_object()
+        if len(content) > 1024:
+            compressed = zlib.compress(content)
+            self._write_object(content_id, f"<< /Length {len(compressed)} /Filter /FlateDecode >>", compressed)
+        else:
+            self._write_object(content_id, f"<< /Length {len(content)} >>", content)
+        page_id = self._new_object()
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(page_w)} {_num(page_h)}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >>{fonts} >> /Contents {content_id} 0 R >>",
+        )
+        self._page_ids.append(page_id)
+        self._image_ids.append(image_id)
+        self.page_count += 1
+        return self.page_count - 1
+
+    def append_pdf(self, path, skip=()):
+        """Append the pages of a PDF that PdfWriter wrote (a segment of a
+        distributed run, say), copying their objects without decoding them.
+
+        skip holds zero-based page numbers of path to leave out. Returns the
+        number of pages added.
+        """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            xref = int(data[data.rfind(b'startxref') + 9:].split()[0])
+            # "xref", "0 <count>", then one entry per object, object 0 first
+            lines = data[xref:data.find(b'trailer', xref)].split(b'\n')
+            count = int(lines[1].split()[1])
+            objects = {}
+            for obj_id in range(1, count):
+                offset = int(lines[2 + obj_id][:10])
+                start = data.find(b'\n', offset) + 1  # after "<id> 0 obj"
+                end = data.find(b'\n', start)
+                body = data[start:end].decode('latin-1')
+                stream = None
+                if data[end + 1:end + 8] == b'stream\n':
+                    length = int(re.search(r'/Length (\d+)', body).group(1))
+                    stream = data[end + 8:end + 8 + length]
+                objects[obj_id] = (body, stream)
+
+        pages = [int(kid) for kid in re.findall(r'(\d+) 0 R', objects[2][0])]
+        dropped = set()
+        for number in skip:
+            body = objects[pages[number]][0]
+            dropped.add(pages[number])
+            dropped.add(int(re.search(r'/Contents (\d+) 0 R', body).group(1)))
+            dropped.add(int(re.search(r'/Im0 (\d+) 0 R', body).group(1)))
+        # The source's catalog (1) and page tree (2) give way to this file's
+        ids = {1: 1, 2: 2}
+        for obj_id in objects:
+            if obj_id not in ids and obj_id not in dropped:
+                ids[obj_id] = self._new_object()
+        for obj_id, (body, stream) in objects.items():
+            if obj_id in (1, 2) or obj_id in dropped:
+                continue
+            body = re.sub(r'(\d+) 0 R', lambda match: f"{ids[int(match.group(1))]} 0 R", body)
+            self._write_object(ids[obj_id], body, stream)
+        added = 0
+        for page_id in pages:
+            if page_id in dropped:
+                continue
+            self._page_ids.append(ids[page_id])
+            self._image_ids.append(ids[int(re.search(r'/Im0 (\d+) 0 R', objects[page_id][0]).group(1))])
+            self.page_count += 1
+            added += 1
+        return added
+
+    def image_offset(self, page):
+        """Byte offset in the file of the image object on zero-based page"""
+        return self._offsets[self._image_ids[page]]
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        if self._file.closed:
+            return
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        lines = [f"xref\n0 {len(self._offsets)}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{offset:010d} 00000 n \n" for offset in self._offsets[1:])
+        self._file.write(''.join(lines).encode())
+        self._file.write(
+            f"trailer\n<< /Size {len(self._offsets)} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        self._file.close()
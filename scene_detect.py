@@ -0,0 +1,196 @@
+import os
+import re
+import subprocess
+import threading
+import numpy as np
+
+# Frames are scored at this size (letterboxed to keep the aspect ratio)
+SIZE = (160, 90)
+BATCH_SIZE = 64
+
+# How much each metric counts towards the combined score
+WEIGHTS = {'hist': 0.2, 'edge': 0.4, 'ssim': 0.4}
+
+# Score files are only reused when they were made with the same settings
+SETTINGS = {'detector': 'numpy', 'version': 1, 'size': list(SIZE)}
+
+HIST_BINS = 32
+EDGE_THRESHOLD = 24
+SSIM_BLOCK = 8
+
+class SceneScores:
+    """Difference scores for every frame of a video against the frame before it.
+
+    Each metric is in [0, 1] and the first frame scores 0 everywhere:
+        hist  half the L1 distance between grayscale histograms
+        edge  edge change ratio, the share of edge pixels that appear or
+              vanish beyond a one-pixel tolerance (shifts from camera
+              motion cost little, new text on a slide costs a lot)
+        ssim  1 - mean SSIM over 8x8 blocks
+    Keeping the metrics separate lets cuts() be re-run with any threshold or
+    weights without decoding the video again.
+    """
+
+    def __init__(self, timestamps, hist, edge, ssim):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.hist = np.asarray(hist, dtype=np.float32)
+        self.edge = np.asarray(edge, dtype=np.float32)
+        self.ssim = np.asarray(ssim, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def score(self, weights=None):
+        weights = weights or WEIGHTS
+        total = sum(weights.values())
+        return (weights['hist'] * self.hist + weights['edge'] * self.edge
+                + weights['ssim'] * self.ssim) / total
+
+    def cuts(self, threshold, min_gap=0.0, weights=None):
+        """Cut points scoring above threshold, as [(timestamp, score)].
+
+        Cuts closer than min_gap seconds to the previous one are dropped.
+        """
+        score = self.score(weights)
+        cuts = []
+        for index in np.flatnonzero(score > threshold):
+            timestamp = float(self.timestamps[index])
+            if cuts and timestamp - cuts[-1][0] < min_gap:
+                continue
+            cuts.append((timestamp, round(float(score[index]), 4)))
+        return cuts
+
+    def save(self, path):
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, timestamps=self.timestamps, hist=self.hist,
+                                edge=self.edge, ssim=self.ssim)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['timestamps'], data['hist'], data['edge'], data['ssim'])
+
+def _histograms(frames):
+    """Normalised grayscale histograms of a (N, H, W) uint8 stack, shape (N, bins)"""
+    count = len(frames)
+    bins = (frames.reshape(count, -1) // (256 // HIST_BINS)).astype(np.int64)
+    bins += np.arange(count)[:, None] * HIST_BINS
+    counts = np.bincount(bins.ravel(), minlength=count * HIST_BINS).reshape(count, HIST_BINS)
+    return counts / frames[0].size
+
+def _edges(frames):
+    """Boolean edge maps from the absolute horizontal + vertical gradient"""
+    frames = frames.astype(np.int16)
+    magnitude = np.zeros(frames.shape, dtype=np.int16)
+    magnitude[:, :, 1:] += np.abs(np.diff(frames, axis=2))
+    magnitude[:, 1:, :] += np.abs(np.diff(frames, axis=1))
+    return magnitude > EDGE_THRESHOLD
+
+def _dilate(edges):
+    """3x3 dilation of boolean edge maps"""
+    grown = edges.copy()
+    grown[:, 1:, :] |= edges[:, :-1, :]
+    grown[:, :-1, :] |= edges[:, 1:, :]
+    wide = grown.copy()
+    wide[:, :, 1:] |= grown[:, :, :-1]
+    wide[:, :, :-1] |= grown[:, :, 1:]
+    return wide
+
+def _edge_change(before, after):
+    entering = (after & ~_dilate(before)).sum(axis=(1, 2))
+    exiting = (before & ~_dilate(after)).sum(axis=(1, 2))
+    return np.maximum(entering / np.maximum(after.sum(axis=(1, 2)), 1),
+                      exiting / np.maximum(before.sum(axis=(1, 2)), 1))
+
+def _ssim_distance(before, after):
+    """1 - mean blockwise SSIM for each pair of (N, H, W) frames"""
+    count, height, width = before.shape
+    rows, cols = height // SSIM_BLOCK, width // SSIM_BLOCK
+
+    def blocks(frames):
+        frames = frames[:, :rows * SSIM_BLOCK, :cols * SSIM_BLOCK].astype(np.float32)
+        return frames.reshape(count, rows, SSIM_BLOCK, cols, SSIM_BLOCK)
+
+    a, b = blocks(before), blocks(after)
+    mean_a, mean_b = a.mean(axis=(2, 4)), b.mean(axis=(2, 4))
+    var_a, var_b = a.var(axis=(2, 4)), b.var(axis=(2, 4))
+    covariance = (a * b).mean(axis=(2, 4)) - mean_a * mean_b
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)
+            / ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2)))
+    return np.clip(1 - ssim.mean(axis=(1, 2)), 0, 1)
+
+def frame_differences(previous, frames):
+    """(hist, edge, ssim) arrays for each frame of a (N, H, W) batch against
+    the frame before it; previous is the last frame of the previous batch or None"""
+    if previous is None:
+        stack = frames
+    else:
+        stack = np.concatenate([previous[None], frames])
+    histograms = _histograms(stack)
+    edges = _edges(stack)
+    hist = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+    edge = _edge_change(edges[:-1], edges[1:])
+    ssim = _ssim_distance(stack[:-1], stack[1:])
+    if previous is None:
+        # The first frame has nothing to differ from
+        hist, edge, ssim = (np.concatenate([[0.0], values]) for values in (hist, edge, ssim))
+    return hist, edge, ssim
+
+def score_video(video_file, size=SIZE, batch_size=BATCH_SIZE, progress=None):
+    """Decode video_file once at a small size and score every frame.
+
+    ffmpeg writes raw grayscale frames to a pipe that is read batch_size
+    frames at a time; frame timestamps come from showinfo on stderr.
+    progress(seconds) is called after each batch with the video time reached.
+    """
+    width, height = size
+    # showinfo checksums every frame, so it goes after the downscale
+    video_filter = (f"scale={width}:{height}:force_original_aspect_ratio=decrease:flags=area,"
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,showinfo")
+    cmd = ['ffmpeg', '-i', video_file, '-an', '-vf', video_filter, '-vsync', 'passthrough',
+           '-f', 'rawvideo', '-pix_fmt', 'gray', '-']
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    timestamps = []
+
+    def read_timestamps():
+        for line in proc.stderr:
+            match = re.search(rb"pts_time:\s*(-?[\d.]+)", line)
+            if match:
+                timestamps.append(float(match.group(1)))
+
+    reader = threading.Thread(target=read_timestamps, daemon=True)
+    reader.start()
+    frame_bytes = width * height
+    previous = None
+    metrics = ([], [], [])
+    try:
+        while True:
+            data = proc.stdout.read(frame_bytes * batch_size)
+            count = len(data) // frame_bytes
+            if count == 0:
+                break
+            frames = np.frombuffer(data[:count * frame_bytes], dtype=np.uint8).reshape(count, height, width)
+            for values, batch in zip(metrics, frame_differences(previous, frames)):
+                values.append(batch)
+            previous = frames[-1]
+            if progress is not None and timestamps:
+                progress(timestamps[-1])
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        reader.join()
+        proc.stderr.close()
+
+    if previous is None:
+        raise Exception("No frames could be decoded for scene detection.")
+    hist, edge, ssim = (np.concatenate(values) for values in metrics)
+    count = len(hist)
+    if len(timestamps) < count:
+        raise Exception("Could not read frame timestamps for scene detection.")
+    return SceneScores(timestamps[:count], hist, edge, ssim)
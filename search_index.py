@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+# Index file in the shared output folder, shared by every processed video
+INDEX_FILE = 'search.db'
+
+# Concurrent batch jobs write to the same index; wait this long for the lock
+LOCK_TIMEOUT = 60.0
+
+# Words of context around each match in a hit's snippet
+SNIPPET_WORDS = 12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,        -- absolute path of the video
+    output_dir TEXT,         -- folder with its output.pdf and output.md
+    indexed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5 (
+    text,
+    video_id UNINDEXED,
+    page UNINDEXED,          -- 1-based page in output.pdf
+    timestamp UNINDEXED,     -- seconds into the video
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '2 3'           -- prefix indexes, so short prefix* queries need no term scan
+);
+"""
+
+def _section_text(section):
+    """OCR text of an output.md section, without its "## Page" heading"""
+    heading, _, text = section.partition('\n\n')
+    return text.strip() if heading.startswith('## ') else section.strip()
+
+def _quote(query):
+    """query with every word quoted, so FTS5 operators and punctuation are matched literally"""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+def video_link(path, timestamp):
+    """file: URL that opens the video at timestamp (Media Fragments syntax)"""
+    link = Path(path).as_uri()
+    return f"{link}#t={timestamp:.1f}" if timestamp is not None else link
+
+def pdf_link(output_dir, page):
+    return f"{Path(output_dir, 'output.pdf').as_uri()}#page={page}"
+
+class SearchIndex:
+    """Full-text index (SQLite FTS5) over the OCR text of many processed videos.
+
+    Each PDF page with text is one document, stored with its video, page
+    number and video timestamp. Re-indexing a video replaces its pages.
+    Matching goes through FTS5's inverted index and results are ranked by
+    BM25, so queries stay in the milliseconds with thousands of videos.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=LOCK_TIMEOUT)
+        self._db.execute("PRAGMA journal_mode = WAL")  # searches don't block a writing job
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def add_video(self, video_file, output_dir, pages):
+        """Replace the indexed text of video_file with pages, a list of
+        (page, timestamp, text); returns the number of pages indexed"""
+        video_file = os.path.abspath(video_file)
+        with self._db:
+            row = self._db.execute("SELECT id FROM videos WHERE path = ?", (video_file,)).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM pages WHERE video_id = ?", (row[0],))
+                self._db.execute("UPDATE videos SET output_dir = ?, indexed_at = ? WHERE id = ?",
+                                 (os.path.abspath(output_dir), time.time(), row[0]))
+                video_id = row[0]
+            else:
+                video_id = self._db.execute(
+                    "INSERT INTO videos (path, output_dir, indexed_at) VALUES (?, ?, ?)",
+                    (video_file, os.path.abspath(output_dir), time.time())
+                ).lastrowid
+            rows = [(text, video_id, page, timestamp) for page, timestamp, text in pages if text]
+            self._db.executemany("INSERT INTO pages (text, video_id, page, timestamp) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def add_run(self, video_file, output_dir, frame_index):
+        """Index the output.md of a run through its FrameIndex (page, timestamp
+        and byte range of every section)"""
+        pages = []
+        with open(os.path.join(output_dir, 'output.md'), 'rb') as f:
+            for row in frame_index.frames(pages_only=True):
+                if row['text_offset'] is None:
+                    continue
+                f.seek(row['text_offset'])
+                section = f.read(row['text_length']).decode('utf-8')
+                pages.append((row['page'], row['timestamp'], _section_text(section)))
+        return self.add_video(video_file, output_dir, pages)
+
+    def remove_video(self, video_file):
+        video_file = os.path.abspath(video_file)
+        with self._db:
+            self._db.execute("DELETE FROM pages WHERE video_id IN (SELECT id FROM videos WHERE path = ?)",
+                             (video_file,))
+            self._db.execute("DELETE FROM videos WHERE path = ?", (video_file,))
+
+    def search(self, query, limit=20):
+        """Best matches for query, most relevant first, as dicts with video,
+        output_dir, page, timestamp, score, snippet and the two deep links.
+
+        query uses FTS5 syntax (words, "phrases", prefix*, AND/OR/NOT); if it
+        does not parse, its words are searched for literally instead.
+        """
+        sql = f"""
+            SELECT videos.path, videos.output_dir, pages.page, pages.timestamp, pages.rank,
+                   snippet(pages, 0, '[', ']', '...', {SNIPPET_WORDS})
+            FROM pages JOIN videos ON videos.id = pages.video_id
+            WHERE pages MATCH ? ORDER BY pages.rank LIMIT ?
+        """
+        if not query.strip():
+            return []
+        try:
+            rows = self._db.execute(sql, (query, limit)).fetchall()
+        except sqlite3.OperationalError:
+            rows = self._db.execute(sql, (_quote(query), limit)).fetchall()
+        return [{
+            "video": path,
+            "output_dir": output_dir,
+            "page": page,
+            "timestamp": timestamp,
+            "score": round(-rank, 4),  # bm25() is negative, lower is better
+            "snippet": snippet,
+            "video_link": video_link(path, timestamp),
+            "pdf_link": pdf_link(output_dir, page),
+        } for path, output_dir, page, timestamp, rank, snippet in rows]
+
+    def stats(self):
+        videos = self._db.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {"videos": videos, "pages": pages}
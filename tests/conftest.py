@@ -0,0 +1,60 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="needs ffmpeg")
+
+# Slides that share one layout (a title bar and two bullets) and differ only in their text
+SLIDE_TEXTS = [
+    ("Introduction", "- what we do", "- why it matters"),
+    ("Architecture", "- workers", "- the queue"),
+    ("Results", "- 2x faster", "- less memory"),
+    ("Related work", "- prior art", "- comparisons"),
+    ("Future work", "- GPUs", "- streaming"),
+    ("Questions?", "- thanks", "- contact us"),
+]
+
+def render_slide(title, *bullets, size=(1280, 720)):
+    """A slide image with title and bullets on a fixed template"""
+    from PIL import Image, ImageDraw, ImageFont
+    img = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, size[0], 90], fill=(30, 60, 120))
+    draw.text((40, 20), title, fill='white', font=ImageFont.load_default(size=48))
+    for number, bullet in enumerate(bullets):
+        draw.text((80, 160 + number * 70), bullet, fill='black', font=ImageFont.load_default(size=36))
+    return img
+
+@pytest.fixture
+def template_slides():
+    return [render_slide(*texts) for texts in SLIDE_TEXTS]
+
+def make_video(path, images, seconds_per_image, gop=None):
+    """Encode images as an H.264 video showing each for seconds_per_image at 25 fps"""
+    folder = os.path.join(os.path.dirname(path), 'slides_' + os.path.basename(path))
+    os.makedirs(folder, exist_ok=True)
+    for number, img in enumerate(images):
+        img.save(os.path.join(folder, f'{number:03d}.png'))
+    cmd = ['ffmpeg', '-v', 'error', '-y', '-framerate', f'1/{seconds_per_image}',
+           '-i', os.path.join(folder, '%03d.png'), '-r', '25', '-c:v', 'libx264', '-pix_fmt', 'yuv420p']
+    if gop:
+        cmd += ['-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0']
+    subprocess.run([*cmd, path], check=True, stdin=subprocess.DEVNULL)
+    return path
+
+@pytest.fixture(scope='session')
+def lavfi_clip(tmp_path_factory):
+    """A 30 s test pattern with a keyframe every 10 s, generated by ffmpeg's lavfi input"""
+    if shutil.which('ffmpeg') is None:
+        pytest.skip("needs ffmpeg")
+    path = str(tmp_path_factory.mktemp('clips') / 'testsrc.mp4')
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc2=size=320x180:rate=25:duration=30',
+                    '-c:v', 'libx264', '-g', '250', '-keyint_min', '250', '-sc_threshold', '0', path],
+                   check=True, stdin=subprocess.DEVNULL)
+    return path
@@ -0,0 +1,28 @@
+from conftest import make_video, needs_ffmpeg, render_slide
+from app import DEFAULT_PARAMS, adaptive_timestamps, video_packets
+
+pytestmark = needs_ffmpeg
+
+def _figure(number, size=(640, 360)):
+    from PIL import Image, ImageDraw
+    img = Image.new('RGB', size, (240, 240, 200))
+    ImageDraw.Draw(img).ellipse([200, 100, 440, 300], fill=(200, 40, 40))
+    ImageDraw.Draw(img).text((20, 320), f"figure {number}", fill='black')
+    return img
+
+def test_alternating_layouts_are_all_found_with_the_default_step(tmp_path):
+    # 7 s slides alternating between two layouts: a 10 s step lands on the
+    # same layout either side of some slides and misses them
+    slides = [render_slide(f"Part {k}", f"- point {k}", size=(640, 360)) if k % 2 == 0 else _figure(k)
+              for k in range(13)]
+    video = make_video(str(tmp_path / 'alternating.mp4'), slides, 7, gop=250)
+    assert adaptive_timestamps(video, DEFAULT_PARAMS['3']) == [7.0 * k for k in range(13)]
+
+def test_text_only_changes_are_found(tmp_path, template_slides):
+    video = make_video(str(tmp_path / 'deck.mp4'), template_slides, 5)
+    assert adaptive_timestamps(video, 3.0) == [0.0, 5.0, 10.0, 15.0, 20.0, 25.0]
+
+def test_video_packets_marks_keyframes(lavfi_clip):
+    packets = video_packets(lavfi_clip)
+    assert len(packets) == 750
+    assert [time for time, _, keyframe in packets if keyframe] == [0.0, 10.0, 20.0]
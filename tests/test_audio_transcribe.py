@@ -0,0 +1,85 @@
+import subprocess
+
+import numpy as np
+import pytest
+
+import app
+import audio_transcribe
+from audio_transcribe import FRAME_SAMPLES, SAMPLE_RATE, split_chunks, transcribe_video
+from conftest import needs_ffmpeg
+
+def _signal(*parts):
+    """int16 samples: (seconds, loud) parts, loud ones a 440 Hz tone"""
+    pieces = []
+    for seconds, loud in parts:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        pieces.append((np.sin(2 * np.pi * 440 * t) * 10000 * loud).astype(np.int16))
+    return np.concatenate(pieces)
+
+def _blocks(samples):
+    size = FRAME_SAMPLES * 33  # about a second, in whole frames as read_audio reads them
+    return [samples[start:start + size] for start in range(0, len(samples), size)]
+
+def _chunks(samples, **options):
+    return [(start, len(chunk) / SAMPLE_RATE) for start, chunk in split_chunks(_blocks(samples), **options)]
+
+def test_chunks_are_cut_in_the_middle_of_pauses():
+    chunks = _chunks(_signal((6, 1), (1, 0), (6, 1), (1, 0)))
+    assert len(chunks) == 2
+    assert chunks[0][0] == 0.0 and 6.0 < chunks[1][0] < 7.0
+    assert 13.0 < sum(length for _, length in chunks) <= 14.0  # trailing silence may be dropped
+
+def test_short_pauses_do_not_cut_before_min_chunk():
+    # Pauses shorter than MIN_SILENCE never cut
+    assert len(_chunks(_signal((1, 0), (3, 1), (0.3, 0), (3, 1), (0.3, 0), (3, 1)))) == 1
+    # Nor do pauses before the chunk is MIN_CHUNK long
+    chunks = _chunks(_signal((2, 1), (1, 0), (2, 1), (1, 0), (3, 1)))
+    assert len(chunks) == 2 and 5.0 < chunks[1][0] < 6.0
+
+def test_speech_without_long_pauses_is_cut_before_max_chunk():
+    # Words with short gaps between them (a steady tone would pass for noise)
+    chunks = _chunks(_signal(*[(0.8, 1), (0.2, 0)] * 40))
+    assert len(chunks) > 1
+    assert all(length <= 28.0 for _, length in chunks)
+    # At the quietest frame: inside a gap between words
+    assert all(0.8 <= start % 1.0 < 1.0 for start, _ in chunks[1:])
+
+def test_silence_gives_no_chunks():
+    assert _chunks(_signal((10, 0))) == []
+
+def test_serial_transcription_loads_the_model_once(monkeypatch):
+    created = []
+
+    def create_engine(name=None, threads=1):
+        created.append(name)
+        return audio_transcribe.StubEngine()
+    monkeypatch.setattr(audio_transcribe, 'create_engine', create_engine)
+    monkeypatch.setattr(audio_transcribe, 'read_audio', lambda video: iter(_blocks(_signal((3, 1), (1, 0)))))
+    monkeypatch.setattr(audio_transcribe, '_engines', {})
+    for _ in range(3):
+        assert len(list(transcribe_video('unused.mp4', workers=1, engine="stub"))) == 1
+    assert created == ["stub"]
+
+@needs_ffmpeg
+def test_transcribe_video_with_the_stub_engine(tmp_path):
+    video = str(tmp_path / 'speech.mp4')
+    # 6 s of tone, 2 s of silence, three times over, under a blank picture
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'color=c=white:s=160x90:d=24',
+                    '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=16000:duration=24',
+                    '-af', "volume='if(lt(mod(t,8),6),1,0)':eval=frame", '-shortest',
+                    '-c:v', 'libx264', '-c:a', 'aac', video], check=True, stdin=subprocess.DEVNULL)
+    assert audio_transcribe.has_audio(video)
+    segments = list(transcribe_video(video, workers=1, engine="stub"))
+    starts = [start for start, _, _ in segments]
+    assert len(starts) == 3
+    assert starts[0] == 0.0 and 6.0 <= starts[1] <= 8.0 and 14.0 <= starts[2] <= 16.0
+    assert all(text.startswith("[speech") for _, _, text in segments)
+
+def test_a_missing_speech_engine_fails_before_any_work(tmp_path, monkeypatch):
+    video = tmp_path / 'talk.mp4'
+    video.write_bytes(b'')
+    monkeypatch.setattr(audio_transcribe, '_installed', lambda module: False)
+    monkeypatch.setattr(app, 'extract_frames', lambda *args, **kwargs: pytest.fail("frames were extracted"))
+    with pytest.raises(ValueError, match="No speech engine"):
+        app.process_video(str(video), transcribe_audio=True, working_dir=str(tmp_path / 'out'))
+    assert not (tmp_path / 'out').exists()
@@ -0,0 +1,31 @@
+import json
+import os
+import re
+import shutil
+
+from batch import process_batch
+from conftest import needs_ffmpeg
+
+def _pages(path):
+    with open(path, 'rb') as f:
+        return int(re.findall(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', f.read())[-1])
+
+@needs_ffmpeg
+def test_two_jobs_on_the_same_video_share_the_cache(lavfi_clip, tmp_path, monkeypatch, capfd):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))  # the cache lives in the output folder
+    videos = []
+    for name in ('first.mp4', 'second.mp4'):
+        videos.append(str(tmp_path / name))
+        shutil.copyfile(lavfi_clip, videos[-1])
+    for run in range(2):
+        report = process_batch(videos, output_root=str(tmp_path / 'out'), jobs=2, method="1", param=5.0,
+                               extract_text=False, use_cache=True)
+        assert report["succeeded"] == 2, json.dumps(report)
+        for entry in report["videos"]:
+            assert _pages(os.path.join(entry["output_dir"], 'output.pdf')) == 6
+    entries = os.listdir(tmp_path / 'home' / 'Documents' / 'Downloads Documents' / 'Video_to_PDF_output'
+                         / '.cache' / 'entries')
+    assert len(entries) == 1
+    # The frames were extracted once: the other job waited for them instead
+    # of extracting into the same entry alongside it
+    assert capfd.readouterr().out.count("Reusing cached frames") == 3
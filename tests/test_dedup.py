@@ -0,0 +1,62 @@
+import os
+
+from conftest import SLIDE_TEXTS, make_video, needs_ffmpeg, render_slide
+from app import (dedup_frames, dedup_thumbnail, dhash, hamming_distance, iter_unique_frames, list_frames,
+                 select_unique_frames, thumbnails_differ)
+
+def test_dhash_is_64_bits_and_stable():
+    img = render_slide("Title", "- one")
+    value = dhash(img)
+    assert 0 <= value < 2 ** 64
+    assert dhash(img.copy()) == value
+    assert hamming_distance(value, value) == 0
+
+def test_template_slides_collide_on_the_hash_but_not_the_pixels(template_slides):
+    # The case dedup must not fall for: same layout, different text
+    hashes = [dhash(img) for img in template_slides]
+    assert min(hamming_distance(a, b) for a, b in zip(hashes, hashes[1:])) <= 4
+    thumbnails = [dedup_thumbnail(img) for img in template_slides]
+    assert all(thumbnails_differ(a, b) for a, b in zip(thumbnails, thumbnails[1:]))
+
+def test_repeated_frames_are_dropped(tmp_path, template_slides):
+    paths = []
+    for number, img in enumerate([template_slides[0]] * 3 + [template_slides[1]] * 2):
+        path = str(tmp_path / f'frame{number + 1:04d}.png')
+        img.save(path)
+        paths.append(path)
+    assert select_unique_frames(paths, max_distance=4) == [paths[0], paths[3]]
+
+def test_a_frame_that_fails_to_hash_is_kept_and_breaks_the_run(tmp_path, template_slides):
+    paths = []
+    for number, img in enumerate([template_slides[0]] * 5):
+        path = str(tmp_path / f'frame{number + 1:04d}.png')
+        img.save(path)
+        paths.append(path)
+    with open(paths[2], 'wb') as f:
+        f.write(b'not a png')
+    # The frame after the broken one is compared with nothing, not with frame 1
+    assert select_unique_frames(paths, max_distance=4) == [paths[0], paths[2], paths[3]]
+
+def test_streaming_keeps_every_template_slide(template_slides):
+    frames = []
+    for number, img in enumerate(img for img in template_slides for _ in range(3)):
+        img = img.copy()
+        img.info['frame'] = number + 1
+        frames.append(img)
+    hashes = {}
+    kept = list(iter_unique_frames(frames, max_distance=4, hashes=hashes))
+    assert [frame.info['frame'] for frame in kept] == [1, 4, 7, 10, 13, 16]
+    assert len(hashes) == len(frames)
+
+@needs_ffmpeg
+def test_dedup_keeps_every_slide_of_a_template_deck(tmp_path, template_slides):
+    from app import extract_frames, iter_video_frames
+    video = make_video(str(tmp_path / 'deck.mp4'), template_slides, 5)
+    frames_dir = tmp_path / 'frames'
+    frames_dir.mkdir()
+    extract_frames(video, "1", 1.0, str(frames_dir))
+    assert dedup_frames(str(frames_dir), max_distance=4) == 30 - len(SLIDE_TEXTS)
+    kept = [os.path.basename(path) for path in list_frames(str(frames_dir))]
+    assert len(kept) == len(SLIDE_TEXTS)
+    streamed = list(iter_unique_frames(iter_video_frames(video, "1", 1.0), max_distance=4))
+    assert [frame.info['timestamp'] for frame in streamed] == [0.0, 5.0, 10.0, 15.0, 20.0, 25.0]
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from app import extract_frames_fast, interval_timestamps, iter_video_frames
+from conftest import needs_ffmpeg
+
+def test_interval_timestamps():
+    assert interval_timestamps(30.0, 1.0) == [float(k) for k in range(30)]
+    assert interval_timestamps(10.5, 5.0) == [0.0, 5.0, 10.0]
+    assert interval_timestamps(0.2, 5.0) == [0.0]
+
+@needs_ffmpeg
+def test_streaming_frames_are_timed(lavfi_clip):
+    frames = list(iter_video_frames(lavfi_clip, "1", 5.0))
+    assert [frame.info['timestamp'] for frame in frames] == [0.0, 5.0, 10.0, 15.0, 20.0, 25.0]
+    assert [frame.info['frame'] for frame in frames] == [1, 2, 3, 4, 5, 6]
+    assert frames[0].size == (320, 180)
+
+@needs_ffmpeg
+def test_streaming_keyframes_match_disk(lavfi_clip, tmp_path):
+    # Keyframes at 0, 10 and 20 s: the samples after the last one repeat it
+    frames = list(iter_video_frames(lavfi_clip, "1", 1.0, fast_seek="keyframes"))
+    assert [frame.info['timestamp'] for frame in frames] == [float(k) for k in range(30)]
+    timestamps = extract_frames_fast(lavfi_clip, 1.0, str(tmp_path), mode="keyframes", workers=2)
+    assert timestamps == [frame.info['timestamp'] for frame in frames]
+    for index, frame in enumerate(frames):
+        with Image.open(os.path.join(tmp_path, f'frame{index + 1:04d}.png')) as on_disk:
+            assert np.array_equal(np.asarray(frame.convert('RGB')), np.asarray(on_disk.convert('RGB')))
+    assert np.array_equal(np.asarray(frames[20]), np.asarray(frames[29]))
+    assert not np.array_equal(np.asarray(frames[19]), np.asarray(frames[20]))
+
+@needs_ffmpeg
+def test_streaming_seeks_match_keyframes_on_keyframe_times(lavfi_clip):
+    seeks = list(iter_video_frames(lavfi_clip, "1", 10.0, fast_seek="seek"))
+    keyframes = list(iter_video_frames(lavfi_clip, "1", 10.0, fast_seek="keyframes"))
+    assert [frame.info['timestamp'] for frame in seeks] == [0.0, 10.0, 20.0]
+    for seek, keyframe in zip(seeks, keyframes):
+        assert np.array_equal(np.asarray(seek.convert('RGB')), np.asarray(keyframe.convert('RGB')))
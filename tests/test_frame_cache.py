@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+from frame_cache import CacheEntry, FrameCache
+
+def _video(tmp_path):
+    path = tmp_path / 'talk.mp4'
+    path.write_bytes(b'video bytes')
+    return str(path)
+
+def _fill(entry, size):
+    os.makedirs(entry.frames_dir, exist_ok=True)
+    with open(os.path.join(entry.frames_dir, 'frame0001.png'), 'wb') as f:
+        f.write(b'\0' * size)
+
+def test_an_entry_is_used_by_one_job_at_a_time(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    with cache.entry(_video(tmp_path), "1", 0.5) as entry:
+        other = CacheEntry(entry.path)
+        assert not other.lock(wait=False)
+        entry.reset_frames()  # keeps the lock file it holds
+        assert os.path.exists(os.path.join(entry.path, 'lock'))
+        assert not other.lock(wait=False)
+    assert other.lock(wait=False)
+    other.close()
+
+def test_the_lock_holds_across_processes(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    script = ("import sys; from frame_cache import CacheEntry; "
+              "entry = CacheEntry(sys.argv[1]); print(entry.lock(wait=False))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with cache.entry(_video(tmp_path), "1", 0.5) as entry:
+        result = subprocess.run([sys.executable, '-c', script, entry.path], capture_output=True, text=True, cwd=root)
+        assert result.stdout.strip() == "False"
+    result = subprocess.run([sys.executable, '-c', script, entry.path], capture_output=True, text=True, cwd=root)
+    assert result.stdout.strip() == "True"
+
+def test_evict_skips_entries_in_use(tmp_path):
+    video = _video(tmp_path)
+    cache = FrameCache(str(tmp_path / 'cache'), max_bytes=500)
+    with cache.entry(video, "1", 0.5) as idle, cache.entry(video, "1", 1.0) as busy:
+        _fill(idle, 1000)
+        _fill(busy, 1000)
+    os.utime(os.path.join(busy.path, 'last_used'), (0, 0))
+    os.utime(os.path.join(idle.path, 'last_used'), (1, 1))
+    busy.lock()  # as another job would
+    with cache.entry(video, "2", 0.3) as mine:
+        cache.evict(keep=mine)
+        # The least recently used entry is in use, so the next one goes instead
+        assert os.path.exists(busy.frames_dir) and os.path.exists(mine.path)
+        assert not os.path.exists(idle.path)
+    busy.close()
+    cache.evict()
+    assert not os.path.exists(busy.path)
+
+def test_an_entry_evicted_while_waiting_is_recreated(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'))
+    entry = cache.entry(_video(tmp_path), "1", 0.5)
+    _fill(entry, 10)
+    entry.close()
+    cache.max_bytes = 0
+    cache.evict()
+    assert not os.path.exists(entry.path)
+    assert entry.lock(wait=False) and os.path.exists(os.path.join(entry.path, 'lock'))
+    entry.close()
@@ -0,0 +1,43 @@
+from frame_index import FrameIndex, frame_number
+
+def _index(tmp_path):
+    index = FrameIndex(str(tmp_path / 'frames.db'), reset=True)
+    # Frame 2 was dropped by dedup: it has no page
+    for frame, timestamp in [(1, 0.0), (2, 0.5), (3, 1.0)]:
+        index.add(frame, f'frame{frame:04d}.png', timestamp)
+    index.set_page(1, 1, 100)
+    index.set_page(3, 2, 900)
+    index.set_text(1, 0, 20)
+    index.set_text(2, 20, 30)
+    return index
+
+def test_frame_number():
+    assert frame_number('frame0042.png') == 42
+
+def test_lookups(tmp_path):
+    with _index(tmp_path) as index:
+        assert len(index) == 3 and index.page_count() == 2
+        assert index.page_frame(2)['frame'] == 3
+        assert index.frame_at(1.7)['page'] == 2
+        assert index.frame_at(-5)['page'] == 1  # before the first frame
+        assert index.frame_at_text_offset(25)['page'] == 2
+        assert [row['frame'] for row in index.frames(pages_only=True)] == [1, 3]
+
+def test_time_of_a_dropped_frame_maps_to_the_page_showing_it(tmp_path):
+    with _index(tmp_path) as index:
+        row = index.frame_at(0.7)
+        assert (row['frame'], row['page']) == (1, 1)
+
+def test_hashes_keep_all_64_bits(tmp_path):
+    with _index(tmp_path) as index:
+        index.set_hash(1, 2 ** 64 - 1)
+        index.set_hash(3, 5)
+        assert index.frame(1)['phash'] == 2 ** 64 - 1
+        assert index.frame(3)['phash'] == 5
+
+def test_reset_and_reopen(tmp_path):
+    _index(tmp_path).close()
+    with FrameIndex(str(tmp_path / 'frames.db')) as index:
+        assert len(index) == 3
+    with FrameIndex(str(tmp_path / 'frames.db'), reset=True) as index:
+        assert len(index) == 0
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import job_server
+from app import JobCancelled
+from job_server import MAX_ATTEMPTS, JobQueue, JobServer, check_options
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    yield queue
+    queue.close()
+
+def test_jobs_run_in_submit_order(queue, tmp_path):
+    first = queue.submit('a.mp4', {"method": "1"}, str(tmp_path))
+    second = queue.submit('b.mp4', {}, str(tmp_path))
+    assert queue.get(first)["status"] == "queued"
+    assert queue.get(first)["options"] == {"method": "1"}
+    assert [queue.position(first), queue.position(second)] == [1, 2]
+    record = queue.claim()
+    assert record["id"] == first
+    assert queue.get(first)["status"] == "running" and queue.get(first)["attempts"] == 1
+    assert queue.position(second) == 1
+    assert queue.claim()["id"] == second
+    assert queue.claim() is None
+
+def test_cancel_only_stops_queued_jobs(queue, tmp_path):
+    running = queue.submit('a.mp4', {}, str(tmp_path))
+    queued = queue.submit('b.mp4', {}, str(tmp_path))
+    queue.claim()
+    assert queue.cancel(queued) == "queued"
+    assert queue.get(queued)["status"] == "cancelled"
+    assert queue.cancel(queued) == "cancelled"
+    # A running job is left to the server, which stops its process
+    assert queue.cancel(running) == "running"
+    assert queue.get(running)["status"] == "running"
+    assert queue.cancel('nope') is None
+
+def test_interrupted_jobs_are_requeued(queue, tmp_path):
+    job_id = queue.submit('a.mp4', {}, str(tmp_path))
+    queue.claim()
+    queue.update(job_id, stage="ocr", progress=0.5)
+    assert queue.requeue_interrupted() == (1, 0)
+    record = queue.get(job_id)
+    assert record["status"] == "queued" and record["stage"] is None
+    queue.claim()
+    assert queue.get(job_id)["attempts"] == 2
+
+def test_a_job_that_keeps_getting_interrupted_fails(queue, tmp_path):
+    job_id = queue.submit('a.mp4', {}, str(tmp_path))
+    for _ in range(MAX_ATTEMPTS - 1):
+        queue.claim()
+        assert queue.requeue_interrupted() == (1, 0)
+    queue.claim()
+    assert queue.requeue_interrupted() == (0, 1)
+    record = queue.get(job_id)
+    assert record["status"] == "failed" and record["error"] == f"Interrupted {MAX_ATTEMPTS} times"
+    assert queue.claim() is None
+
+def test_metrics(queue, tmp_path):
+    done = queue.submit('a.mp4', {}, str(tmp_path))
+    queue.submit('b.mp4', {}, str(tmp_path))
+    queue.claim()
+    queue.update(done, status="done", finished=queue.get(done)["started"] + 2)
+    metrics = queue.metrics()
+    assert metrics["queue_depth"] == 1 and metrics["running"] == 0
+    assert metrics["jobs"] == {"done": 1, "queued": 1}
+    assert metrics["done_in_window"] == 1 and metrics["mean_run_seconds"] == 2
+
+def test_check_options():
+    check_options({"method": "1", "param": 1.0})
+    with pytest.raises(ValueError):
+        check_options({"working_dir": "/tmp"})
+    with pytest.raises(ValueError):
+        check_options([])
+    # Nothing that makes the server write to a path the client picks
+    check_options({"search_index": True})
+    with pytest.raises(ValueError):
+        check_options({"metrics_file": "/etc/cron.d/job"})
+    with pytest.raises(ValueError):
+        check_options({"search_index": "/tmp/elsewhere.db"})
+
+class FakeJob:
+    def __init__(self):
+        self.cancelled = asyncio.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    async def wait(self):
+        await self.cancelled.wait()
+        raise JobCancelled()
+
+def test_cancel_while_the_job_is_starting(tmp_path, monkeypatch):
+    started = []
+
+    async def slow_start_job(video, **options):
+        started.append(video)
+        await asyncio.sleep(0.2)
+        return FakeJob()
+    monkeypatch.setattr(job_server, 'start_job', slow_start_job)
+    server = JobServer(str(tmp_path))
+    video = tmp_path / 'talk.mp4'
+    video.write_bytes(b'')
+
+    async def scenario():
+        server._loop = asyncio.get_running_loop()
+        server._wakeup = asyncio.Event()
+        job_id = server.submit(str(video), {})
+        run = asyncio.create_task(server._run(server.queue.claim()))
+        while not started:
+            await asyncio.sleep(0.01)
+        assert server.cancel(job_id) == "running"
+        await asyncio.wait_for(run, 5)
+        return job_id
+    try:
+        job_id = asyncio.run(scenario())
+        assert server.queue.get(job_id)["status"] == "cancelled"
+        assert not server._cancel_requested and not server._running
+    finally:
+        server.queue.close()
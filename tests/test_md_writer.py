@@ -0,0 +1,34 @@
+import io
+
+from md_writer import MarkdownWriter, format_timestamp
+
+def test_format_timestamp():
+    assert format_timestamp(0) == "0:00.0"
+    assert format_timestamp(205.04) == "3:25.0"
+    assert format_timestamp(3725.5) == "1:02:05.5"
+    assert format_timestamp(-3) == "0:00.0"
+
+def test_sections_and_their_byte_ranges(tmp_path):
+    path = tmp_path / 'output.md'
+    sections = []
+    with MarkdownWriter(str(path), on_section=lambda *section: sections.append(section)) as writer:
+        assert writer.add_frame(1, "Grüße\n", 12.0) == (0, len("## Page 1 (0:12.0)\n\nGrüße\n\n".encode()))
+        assert writer.add_frame(2, "   ") is None
+        writer.add_frame(3, "Next slide")
+    data = path.read_bytes()
+    assert [page for page, _, _ in sections] == [1, 3]
+    page, offset, length = sections[1]
+    assert data[offset:offset + length].decode() == "## Page 3\n\nNext slide\n\n"
+    assert offset + length == len(data)
+
+def test_flushes_every_few_frames_and_leaves_open_files_open():
+    target = io.StringIO()
+    flushed = []
+    target.flush = lambda: flushed.append(len(target.getvalue()))
+    writer = MarkdownWriter(target, flush_frames=2, flush_seconds=3600)
+    writer.add_frame(1, "a")
+    assert not flushed
+    writer.add_frame(2, "b")
+    assert len(flushed) == 1
+    writer.close()
+    assert not target.closed
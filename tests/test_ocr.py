@@ -0,0 +1,38 @@
+from PIL import Image
+
+from app import extract_text_from_images, ocr_frames
+
+def _frames(tmp_path, count):
+    """Frames of different widths, so the stub engine's labels show their order"""
+    paths = []
+    for number in range(1, count + 1):
+        path = tmp_path / f'frame{number:04d}.png'
+        Image.new('RGB', (100 + number, 50), 'white').save(path)
+        paths.append(str(path))
+    return paths
+
+def test_parallel_results_keep_the_frame_order(tmp_path):
+    frames = _frames(tmp_path, 9)
+    results = list(ocr_frames(frames, ocr_workers=3, engine="stub", preprocess="grayscale"))
+    assert results == [(f"[frame {100 + number}x50]", None) for number in range(1, 10)]
+    with_words = list(ocr_frames(frames, ocr_workers=3, engine="stub", preprocess="grayscale", words=True))
+    assert [words for _, _, words in with_words] == [[(text, 0, 0, 100 + number, 50)]
+                                                      for number, (text, _) in enumerate(results, start=1)]
+
+def test_a_failing_frame_does_not_stop_the_others(tmp_path):
+    frames = _frames(tmp_path, 6)
+    with open(frames[2], 'wb') as f:
+        f.write(b'not a png')
+    done = []
+    results = list(ocr_frames(frames, ocr_workers=2, engine="stub", preprocess="grayscale",
+                              progress=lambda count, total, unit: done.append((count, total))))
+    assert len(results) == 6 and done[-1] == (6, 6)
+    text, error = results[2]
+    assert text == "" and error
+    assert [result for index, result in enumerate(results) if index != 2] == \
+        [(f"[frame {100 + number}x50]", None) for number in (1, 2, 4, 5, 6)]
+    # The Markdown leaves the failed frame out and keeps every other page
+    markdown = extract_text_from_images(str(tmp_path), ocr_workers=2, engine="stub", preprocess="grayscale")
+    assert [line for line in markdown.splitlines() if line.startswith("[frame")] == \
+        [f"[frame {100 + number}x50]" for number in (1, 2, 4, 5, 6)]
+    assert "Page 3" not in markdown and "Page 4" in markdown
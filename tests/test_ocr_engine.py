@@ -0,0 +1,47 @@
+import subprocess
+
+import pytest
+from PIL import Image
+
+import ocr_engine
+from ocr_engine import PAGE_SEPARATOR, TesseractBatchEngine, parse_tsv, resolve_engine
+
+TSV = "\n".join([
+    "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext",
+    "1\t1\t0\t0\t0\t0\t0\t0\t640\t360\t-1\t",
+    "5\t1\t1\t1\t1\t1\t10\t20\t50\t12\t95.0\tHello",
+    "5\t1\t1\t1\t1\t2\t70\t20\t40\t12\t94.0\t ",
+    "5\t2\t1\t1\t1\t1\t5\t6\t7\t8\t90.0\tWorld",
+    "short\trow",
+])
+
+def test_parse_tsv_groups_words_by_page():
+    assert parse_tsv(TSV) == {1: [("Hello", 10, 20, 50, 12)], 2: [("World", 5, 6, 7, 8)]}
+
+def test_resolve_engine():
+    assert resolve_engine("pytesseract") == "pytesseract"
+    assert resolve_engine() in ("tesserocr", "tesseract-batch")
+    with pytest.raises(ValueError):
+        resolve_engine("easyocr")
+
+def _fake_tesseract(monkeypatch, stdout, returncode=0):
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode, stdout.encode(), b"")
+    monkeypatch.setattr(ocr_engine.subprocess, 'run', run)
+    monkeypatch.setattr(ocr_engine.PytesseractEngine, 'recognize', lambda self, img: "one by one")
+    return calls
+
+def test_batch_output_is_split_on_the_page_separator(monkeypatch):
+    images = [Image.new('L', (32, 32), 255) for _ in range(3)]
+    calls = _fake_tesseract(monkeypatch, PAGE_SEPARATOR.join(["first", "second", "third", ""]))
+    results = TesseractBatchEngine().recognize_batch(images)
+    assert results == [("first", None), ("second", None), ("third", None)]
+    assert len(calls) == 1  # one process for the whole batch
+
+def test_batch_that_does_not_split_cleanly_is_redone_frame_by_frame(monkeypatch):
+    images = [Image.new('L', (32, 32), 255) for _ in range(3)]
+    _fake_tesseract(monkeypatch, PAGE_SEPARATOR.join(["first", "second", ""]))
+    assert TesseractBatchEngine().recognize_batch(images) == [("one by one", None)] * 3
@@ -0,0 +1,44 @@
+import numpy as np
+from PIL import Image
+
+from app import ocr_settings
+from conftest import render_slide
+from ocr_preprocess import MARGIN, changed_tiles, map_words, prepare, region_changed
+
+def test_map_words_moves_boxes_back_to_the_frame():
+    # One crop of frame box (100, 50)-(300, 90), drawn at twice its size from row 12 of the page
+    layout = [(12, 92, (100, 50, 300, 90), 2.0, 2.0)]
+    words = [("hello", MARGIN + 20, 12 + 10, 60, 30), ("lost", 0, 500, 10, 10)]
+    assert map_words(words, layout) == [("hello", 110, 55, 30, 15)]
+    assert map_words(words, []) == words
+
+def test_prepare_keeps_text_regions_with_a_layout():
+    layout = []
+    page = prepare(render_slide("Results", "- 2x faster", "- less memory"), "regions", layout)
+    assert page.mode == 'L' and layout
+    values = set(np.unique(np.asarray(page)).tolist())
+    assert values <= {0, 255}  # binarized
+    assert prepare(Image.new('RGB', (640, 360), 'white'), "regions") is None
+    assert prepare(Image.new('RGB', (64, 36), 'white'), "grayscale").size == (64, 36)
+
+def test_changed_tiles_finds_the_changed_block():
+    before = np.full((64, 96), 200, dtype=np.uint8)
+    after = before.copy()
+    after[40:60, 70:90] = 0
+    changed = changed_tiles(before, after, tile=32)
+    assert changed.shape == (2, 3)
+    assert changed.tolist() == [[False, False, False], [False, False, True]]
+    assert region_changed(changed, (32, 64, 64, 96), tile=32)
+    assert not region_changed(changed, (0, 32, 0, 64), tile=32)
+    assert changed_tiles(None, after) is None
+    assert changed_tiles(before[:32], after) is None
+    noisy = (before.astype(np.int16) + np.random.default_rng(1).integers(-3, 4, before.shape)).astype(np.uint8)
+    assert not changed_tiles(before, noisy, tile=32).any()
+
+def test_incremental_ocr_cache_is_keyed_by_the_frames_it_diffed():
+    every = ['/cache/frames/frame0001.png', '/cache/frames/frame0002.png', '/cache/frames/frame0003.png']
+    kept = [every[0], every[2]]  # frame 2 dropped by dedup
+    assert ocr_settings("regions", True, every) != ocr_settings("regions", True, kept)
+    assert ocr_settings("regions", True, kept) == ocr_settings("regions", True, list(kept))
+    # Plain OCR text does not depend on the other frames
+    assert ocr_settings("regions", False, every) == ocr_settings("regions", False, kept)
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+from PIL import Image
+
+from conftest import render_slide
+from pdf_writer import PdfWriter
+
+def _write(path, images, **options):
+    with PdfWriter(str(path), **options) as writer:
+        for img, words in images:
+            writer.add_page(img, words=words)
+    return str(path)
+
+def _page_count(path):
+    with open(path, 'rb') as f:
+        return int(re.findall(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', f.read())[-1])
+
+def test_one_page_per_image(tmp_path):
+    path = tmp_path / 'out.pdf'
+    with PdfWriter(str(path)) as writer:
+        for color in ('red', 'green', 'blue'):
+            assert writer.add_page(Image.new('RGB', (64, 48), color)) == writer.page_count - 1
+    data = path.read_bytes()
+    assert data.startswith(b'%PDF-1.4') and data.rstrip().endswith(b'%%EOF')
+    assert _page_count(str(path)) == 3
+    assert data.count(b'/Subtype /Image /Width 64 /Height 48') == 3
+
+def test_unknown_options_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        PdfWriter(str(tmp_path / 'out.pdf'), compression='lzw')
+    with pytest.raises(ValueError):
+        PdfWriter(str(tmp_path / 'out.pdf'), page_size='Letterish')
+
+def test_image_offsets_point_at_each_page_image(tmp_path):
+    path = tmp_path / 'out.pdf'
+    with PdfWriter(str(path)) as writer:
+        for color in ('red', 'green', 'blue'):
+            writer.add_page(Image.new('RGB', (64, 48), color))
+        offsets = [writer.image_offset(page) for page in range(3)]
+    data = path.read_bytes()
+    assert len(set(offsets)) == 3
+    for offset in offsets:
+        assert re.match(rb'\d+ 0 obj\n<< /Type /XObject /Subtype /Image /Width 64 /Height 48', data[offset:])
+
+def test_text_layer_makes_words_searchable(tmp_path):
+    img = render_slide("Results", "- 2x faster", size=(640, 360))
+    words = [("Results", 20, 10, 160, 40), ("faster", 80, 90, 120, 30), ("", 0, 0, 1, 1)]
+    path = _write(tmp_path / 'out.pdf', [(img, words), (img, None)])
+    data = open(path, 'rb').read()
+    assert b'/ToUnicode' in data and b'3 Tr' in data
+    pypdf = pytest.importorskip('pypdf')
+    pages = pypdf.PdfReader(path).pages
+    assert pages[0].extract_text().split() == ["Results", "faster"]
+    assert pages[1].extract_text().strip() == ""
+
+def test_append_pdf_copies_pages_and_skips(tmp_path):
+    first = _write(tmp_path / 'a.pdf', [(Image.new('RGB', (32, 32), c), None) for c in ('red', 'green')])
+    second = _write(tmp_path / 'b.pdf', [(Image.new('RGB', (32, 32), c), None) for c in ('blue', 'white', 'black')])
+    merged = tmp_path / 'merged.pdf'
+    with PdfWriter(str(merged)) as writer:
+        assert writer.append_pdf(first) == 2
+        assert writer.append_pdf(second, skip={0}) == 2
+        assert writer.page_count == 4
+    assert _page_count(str(merged)) == 4
+    # A merged file reads back like any other
+    with PdfWriter(str(tmp_path / 'again.pdf')) as writer:
+        assert writer.append_pdf(str(merged)) == 4
+    pypdf = pytest.importorskip('pypdf')
+    colors = [page.images[0].image.convert('RGB').getpixel((0, 0)) for page in pypdf.PdfReader(str(merged)).pages]
+    assert colors == [(255, 0, 0), (0, 128, 0), (255, 255, 255), (0, 0, 0)]
@@ -0,0 +1,49 @@
+import os
+
+from frame_index import FrameIndex
+from md_writer import MarkdownWriter
+from search_index import SearchIndex
+
+def test_search_ranks_and_links(tmp_path):
+    with SearchIndex(str(tmp_path / 'search.db')) as index:
+        assert index.add_video('/videos/a.mp4', str(tmp_path / 'a'), [
+            (1, 0.0, "Introduction to queues"),
+            (2, 30.0, "Leases, heartbeats and queues of queues"),
+            (3, 60.0, ""),
+        ]) == 2
+        index.add_video('/videos/b.mp4', str(tmp_path / 'b'), [(1, 5.0, "Scene detection")])
+        hits = index.search("queue")  # porter stemming
+        assert [(hit['video'], hit['page']) for hit in hits] == [('/videos/a.mp4', 2), ('/videos/a.mp4', 1)]
+        assert hits[0]['video_link'].endswith('a.mp4#t=30.0')
+        assert hits[0]['pdf_link'].endswith('output.pdf#page=2')
+        assert '[' in hits[0]['snippet']
+        assert index.search("sce*")[0]['video'] == '/videos/b.mp4'
+        assert index.search("") == []
+        assert index.stats() == {"videos": 2, "pages": 3}
+
+def test_unparsable_queries_are_searched_literally(tmp_path):
+    with SearchIndex(str(tmp_path / 'search.db')) as index:
+        index.add_video('/videos/a.mp4', str(tmp_path), [(1, 0.0, "C++ (templates)")])
+        assert len(index.search('templates)')) == 1
+        assert len(index.search('"unterminated')) == 0
+
+def test_reindexing_replaces_and_remove_drops(tmp_path):
+    with SearchIndex(str(tmp_path / 'search.db')) as index:
+        index.add_video('/videos/a.mp4', str(tmp_path), [(1, 0.0, "old words")])
+        index.add_video('/videos/a.mp4', str(tmp_path), [(1, 0.0, "new words")])
+        assert index.search("old") == [] and len(index.search("new")) == 1
+        index.remove_video('/videos/a.mp4')
+        assert index.stats() == {"videos": 0, "pages": 0}
+
+def test_add_run_reads_sections_through_the_frame_index(tmp_path):
+    with FrameIndex(str(tmp_path / 'frames.db'), reset=True) as frames:
+        with MarkdownWriter(str(tmp_path / 'output.md'), on_section=frames.set_text) as md:
+            for frame, text in [(1, "first slide"), (2, "second slide")]:
+                frames.add(frame, None, frame * 10.0)
+                frames.set_page(frame, frame)
+                md.add_frame(frame, text, frame * 10.0)
+        with SearchIndex(str(tmp_path / 'search.db')) as index:
+            assert index.add_run(os.path.join(str(tmp_path), 'v.mp4'), str(tmp_path), frames) == 2
+            hit, = index.search("second")
+            assert (hit['page'], hit['timestamp']) == (2, 20.0)
+            assert "Page" not in hit['snippet']
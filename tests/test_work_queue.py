@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from work_queue import MAX_ATTEMPTS, WorkQueue
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'talk.mp4'
+    path.write_bytes(b'not decoded by these tests')
+    return str(path)
+
+def _expire(queue, task):
+    path = queue._path('leased', task['id'])
+    os.utime(path, (0, 0))
+
+def test_claim_renew_finish(tmp_path, video):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    task_id, = queue.submit(video, {"method": "1", "param": 1.0}, str(tmp_path / 'out'))
+    task = queue.claim('w1')
+    assert task['id'] == task_id and task['attempts'] == 1
+    assert queue.claim('w2') is None
+    assert queue.owns(task, 'w1') and not queue.owns(task, 'w2')
+    assert queue.renew(task, 'w1') and not queue.renew(task, 'w2')
+    assert not queue.finish(task, 'w2', 'done')
+    assert queue.finish(task, 'w1', 'done', finished_by='w1')
+    assert queue.state(task_id) == 'done'
+    assert queue.tasks('done')[0]['finished_by'] == 'w1'
+
+def test_submit_checks_its_input(tmp_path, video):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    with pytest.raises(ValueError):
+        queue.submit(str(tmp_path / 'missing.mp4'), {}, str(tmp_path))
+    with pytest.raises(ValueError):
+        queue.submit(video, {"no_such_option": 1}, str(tmp_path))
+
+def test_expired_leases_are_recovered_until_attempts_run_out(tmp_path, video):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    task_id, = queue.submit(video, {}, str(tmp_path / 'out'))
+    assert queue.recover() == 0
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        task = queue.claim(f'w{attempt}')
+        assert task['attempts'] == attempt
+        _expire(queue, task)
+        assert queue.recover() == 1
+        assert not queue.owns(task, f'w{attempt}')
+    assert queue.state(task_id) == 'failed'
+    assert 'expired' in queue.tasks('failed')[0]['error']
+
+def test_release_without_error_does_not_count(tmp_path, video):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    queue.submit(video, {}, str(tmp_path / 'out'))
+    task = queue.claim('w1')
+    assert queue.release(task, 'w1')
+    assert queue.claim('w1')['attempts'] == 1
+
+def test_finish_after_recover_took_the_lease(tmp_path, video):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    task_id, = queue.submit(video, {}, str(tmp_path / 'out'))
+    task = queue.claim('w1')
+    _expire(queue, task)
+    owns = queue.owns
+
+    def recovered_meanwhile(task, worker):
+        result = owns(task, worker)
+        queue.recover()  # another node, between the ownership check and the move
+        return result
+    queue.owns = recovered_meanwhile
+    assert not queue.finish(task, 'w1', 'done')
+    queue.owns = owns
+    assert not queue.release(task, 'w1')
+    assert queue.state(task_id) == 'pending'
+
+def test_merge_waits_for_its_segments(tmp_path, lavfi_clip):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    ids = queue.submit(lavfi_clip, {"method": "1", "param": 1.0}, str(tmp_path / 'out'), segments=3)
+    assert len(ids) == 4 and ids[-1].endswith('-merge')
+    segments = [queue.claim('w1') for _ in range(3)]
+    assert [task['kind'] for task in segments] == ['segment'] * 3
+    assert [task['start'] for task in segments] == [0.0, 10.0, 20.0]
+    assert queue.claim('w1') is None  # the merge is not claimable yet
+    for task in segments:
+        queue.finish(task, 'w1', 'done')
+    assert queue.claim('w1')['kind'] == 'merge'
+
+def test_a_failed_segment_fails_the_merge(tmp_path, lavfi_clip):
+    queue = WorkQueue(str(tmp_path / 'queue'))
+    ids = queue.submit(lavfi_clip, {}, str(tmp_path / 'out'), segments=2)
+    first, second = queue.claim('w1'), queue.claim('w1')
+    queue.finish(first, 'w1', 'failed', error="boom")
+    queue.finish(second, 'w1', 'done')
+    assert queue.claim('w1') is None
+    assert queue.state(ids[-1]) == 'failed'
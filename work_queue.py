@@ -0,0 +1,594 @@
+import json
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from app import (process_video, get_video_duration, hamming_distance, parse_time, get_search_index_file,
+                 AUDIO_HEADING, INDEX_FILE)
+from frame_index import FrameIndex
+from job_server import check_options
+from md_writer import MarkdownWriter, format_timestamp
+from pdf_writer import PdfWriter
+from search_index import SearchIndex
+
+# Task files move between these folders of the queue; a move is an atomic
+# rename, so exactly one worker wins each claim even on a network filesystem
+STATES = ("pending", "leased", "done", "failed")
+
+# A lease is renewed by touching the task file in leased/; one not touched
+# for LEASE_SECONDS belongs to a worker that died or lost the share, and the
+# task goes back to pending/. Workers renew every HEARTBEAT_SECONDS.
+LEASE_SECONDS = 60.0
+HEARTBEAT_SECONDS = 10.0
+
+# A task whose lease expired (or whose process died) this many times fails
+MAX_ATTEMPTS = 3
+
+# Idle workers look for claimable tasks this often
+POLL_INTERVAL = 2.0
+
+# Seconds a worker waits after SIGTERM before killing a task's processes outright
+KILL_TIMEOUT = 3.0
+
+# Segments of a split video are cut out losslessly enough for OCR, fast
+CLIP_ARGS = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '12', '-c:a', 'flac']
+
+# Segment outputs go here in the video's output folder until they are merged
+SEGMENTS_DIR = 'segments'
+
+def _new_id():
+    # Sorts in submission order
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+class WorkQueue:
+    """Task queue in a folder that every worker node mounts (NFS, SMB, ...).
+
+    Each task is a JSON file that moves pending/ -> leased/ -> done/ or
+    failed/ by rename, so claims need no lock server. The worker holding a
+    lease touches its file every HEARTBEAT_SECONDS; recover() hands tasks
+    whose file went LEASE_SECONDS without a touch back to pending/, and a
+    worker that finds its file gone stops working on it. Node clocks must
+    roughly agree (NTP), since lease ages compare file times with local time.
+
+    Tasks are "video" (one whole process_video run), "segment" (a time range
+    of a video, processed on its own) and "merge" (puts a video's segments
+    back together; claimable once they are all done).
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        for state in (*STATES, 'tmp', 'workers'):
+            os.makedirs(os.path.join(self.root, state), exist_ok=True)
+
+    def _path(self, state, task_id):
+        return os.path.join(self.root, state, task_id + '.json')
+
+    def _write(self, path, task):
+        temp = os.path.join(self.root, 'tmp', uuid.uuid4().hex)
+        with open(temp, 'w') as f:
+            json.dump(task, f, indent=1)
+        os.replace(temp, path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _ids(self, state):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.root, state)) if name.endswith('.json'))
+
+    def state(self, task_id):
+        """Folder task_id is in (None if unknown)"""
+        for state in STATES:
+            if os.path.exists(self._path(state, task_id)):
+                return state
+        return None
+
+    def submit(self, video, options, output_root, segments=None):
+        """Queue video for processing into a new folder under output_root.
+
+        With segments > 1 the video is split into that many time ranges,
+        queued as separate tasks, plus a merge task that puts their PDFs,
+        Markdown and frame indexes back together in order. Returns the ids
+        of the tasks queued; the last one's result is the video's output.
+        """
+        if not os.path.isfile(video):
+            raise ValueError(f"No such video: {video}")
+        check_options(options)
+        video = os.path.abspath(video)
+        task_id = _new_id()
+        output_dir = os.path.join(os.path.abspath(output_root),
+                                  f"{os.path.splitext(os.path.basename(video))[0]}-{task_id[-8:]}")
+        base = {"video": video, "options": options, "output_dir": output_dir, "attempts": 0,
+                "submitted": time.time()}
+        if not segments or segments < 2:
+            self._write(self._path('pending', task_id), dict(base, id=task_id, kind="video"))
+            return [task_id]
+
+        if options.get('pdf_engine', 'native') != 'native':
+            raise ValueError("Segmented runs need the native PDF engine")
+        duration = get_video_duration(video)
+        if not duration:
+            raise ValueError(f"Cannot split {video}: unknown duration")
+        length = duration / segments
+        if options.get('method', '1') == '1':
+            # Keep every segment on the same sampling grid as a single run
+            interval = options.get('param') or 0.5
+            length = max(interval, round(length / interval) * interval)
+        segment_options = dict(options, search_index=False)  # the merged run is indexed instead
+        pdf_options = dict(options.get('pdf_options') or {})
+        if pdf_options.get('target_bytes'):
+            pdf_options['target_bytes'] = pdf_options['target_bytes'] // segments
+            segment_options['pdf_options'] = pdf_options
+
+        parts = []
+        start = 0.0
+        while start < duration - 0.01:
+            end = min(duration, start + length) if len(parts) < segments - 1 else duration
+            part_id = f"{task_id}-{len(parts):03d}"
+            parts.append({"id": part_id, "start": start, "length": end - start,
+                          "output_dir": os.path.join(output_dir, SEGMENTS_DIR, f"{len(parts):03d}")})
+            start = end
+        for part in parts:
+            self._write(self._path('pending', part['id']),
+                        dict(base, id=part['id'], kind="segment", options=segment_options,
+                             start=part['start'], length=part['length'], output_dir=part['output_dir']))
+        merge_id = f"{task_id}-merge"
+        self._write(self._path('pending', merge_id),
+                    dict(base, id=merge_id, kind="merge", depends=[part['id'] for part in parts],
+                         segments=[{"start": part['start'], "output_dir": part['output_dir']} for part in parts]))
+        return [part['id'] for part in parts] + [merge_id]
+
+    def claim(self, worker):
+        """Lease the oldest claimable pending task to worker; None if there is none"""
+        for task_id in self._ids('pending'):
+            path = self._path('pending', task_id)
+            task = self._read(path)
+            if task is None:
+                continue
+            if task.get('depends'):
+                states = [self.state(dep) for dep in task['depends']]
+                if 'failed' in states:
+                    self._fail_unclaimed(path, task, "A segment failed")
+                    continue
+                if any(state != 'done' for state in states):
+                    continue
+            try:
+                # Fresh mtime first: rename keeps it, and an old one would look expired
+                os.utime(path)
+                os.rename(path, self._path('leased', task_id))
+            except FileNotFoundError:
+                continue  # another worker got it
+            task['attempts'] += 1
+            task['lease'] = {"worker": worker, "claimed": time.time()}
+            self._write(self._path('leased', task_id), task)
+            return task
+        return None
+
+    def _fail_unclaimed(self, path, task, error):
+        temp = os.path.join(self.root, 'tmp', uuid.uuid4().hex)
+        try:
+            os.rename(path, temp)
+        except FileNotFoundError:
+            return
+        self._write(self._path('failed', task['id']), dict(task, error=error, finished=time.time()))
+        os.remove(temp)
+
+    def owns(self, task, worker):
+        """Whether worker still holds task's lease"""
+        current = self._read(self._path('leased', task['id']))
+        return current is not None and current.get('lease', {}).get('worker') == worker
+
+    def renew(self, task, worker):
+        """Extend worker's lease on task; False if it has lost it"""
+        if not self.owns(task, worker):
+            return False
+        try:
+            os.utime(self._path('leased', task['id']))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _take(self, task, worker):
+        """Move worker's lease file of task out of leased/ and return its new
+        path, or None if the lease is lost. The rename is what settles a race
+        with recover() on another node: whoever renames the file owns it."""
+        if not self.owns(task, worker):
+            return None
+        temp = os.path.join(self.root, 'tmp', f"{task['id']}.{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(self._path('leased', task['id']), temp)
+        except FileNotFoundError:
+            return None  # recovered after the lease expired
+        current = self._read(temp)
+        if current is None or current.get('lease', {}).get('worker') != worker:
+            os.rename(temp, self._path('leased', task['id']))  # requeued and claimed again meanwhile
+            return None
+        return temp
+
+    def finish(self, task, worker, status, **fields):
+        """Move a leased task to done/ or failed/; False (and nothing moved)
+        if worker lost the lease"""
+        temp = self._take(task, worker)
+        if temp is None:
+            return False
+        task = dict(task, finished=time.time(), **fields)
+        task.pop('lease', None)
+        self._write(self._path(status, task['id']), task)
+        os.remove(temp)
+        return True
+
+    def release(self, task, worker, error=None):
+        """Give a leased task back: to pending/, or to failed/ once it has
+        used up MAX_ATTEMPTS. A release without error (a worker shutting
+        down) does not count as an attempt. False if worker lost the lease."""
+        temp = self._take(task, worker)
+        if temp is None:
+            return False
+        self._requeue(temp, dict(task), error)
+        return True
+
+    def _requeue(self, path, task, error):
+        task.pop('lease', None)
+        if error is None:
+            task['attempts'] -= 1
+        elif task['attempts'] >= MAX_ATTEMPTS:
+            self._write(self._path('failed', task['id']), dict(task, error=error, finished=time.time()))
+            os.remove(path)
+            return 'failed'
+        else:
+            task['last_error'] = error
+        self._write(self._path('pending', task['id']), task)
+        os.remove(path)
+        return 'pending'
+
+    def recover(self, lease_seconds=LEASE_SECONDS):
+        """Requeue every task whose lease expired, and forget workers silent
+        for as long; returns how many tasks were requeued"""
+        count = 0
+        now = time.time()
+        for record in self.workers():
+            if now - record['time'] >= lease_seconds:
+                self.forget_worker(record['worker'])
+        for task_id in self._ids('leased'):
+            path = self._path('leased', task_id)
+            try:
+                if now - os.stat(path).st_mtime < lease_seconds:
+                    continue
+                # Whoever renames the file away recovers the task
+                temp = os.path.join(self.root, 'tmp', f"{task_id}.{uuid.uuid4().hex[:8]}")
+                os.rename(path, temp)
+            except FileNotFoundError:
+                continue
+            task = self._read(temp)
+            if os.path.exists(self._path('done', task_id)) or os.path.exists(self._path('failed', task_id)):
+                os.remove(temp)  # finished just before its lease ran out
+                continue
+            worker = task.get('lease', {}).get('worker')
+            state = self._requeue(temp, task, f"Lease of worker {worker} expired")
+            print(f"Recovered task {task_id} from {worker} ({state})")
+            count += 1
+        return count
+
+    def tasks(self, state):
+        return [task for task in (self._read(self._path(state, task_id)) for task_id in self._ids(state))
+                if task is not None]
+
+    def workers(self):
+        """Latest heartbeat of every worker, with the task and stage it is on"""
+        folder = os.path.join(self.root, 'workers')
+        records = [self._read(os.path.join(folder, name)) for name in sorted(os.listdir(folder))]
+        return [record for record in records if record is not None]
+
+    def heartbeat(self, worker, **fields):
+        self._write(os.path.join(self.root, 'workers', worker + '.json'),
+                    dict(fields, worker=worker, time=time.time()))
+
+    def forget_worker(self, worker):
+        try:
+            os.remove(os.path.join(self.root, 'workers', worker + '.json'))
+        except FileNotFoundError:
+            pass
+
+def cut_segment(video_file, start, length, output):
+    """Re-encode [start, start + length) seconds of video_file into output,
+    with timestamps starting at zero (a stream copy could only cut at keyframes)"""
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-y', '-ss', f"{start:.3f}", '-i', video_file,
+           '-t', f"{length:.3f}", '-map', '0:v:0', '-map', '0:a:0?', *CLIP_ARGS, output]
+    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Cutting segment failed: {result.stderr.strip()}")
+
+def _shift_times(text, offset):
+    """Move the "[M:SS.s]" transcript line times in text on by offset seconds"""
+    return re.sub(r"^\[(\d+(?::\d+)+(?:\.\d+)?)\] ",
+                  lambda match: f"[{format_timestamp(parse_time(match.group(1)) + offset)}] ",
+                  text, flags=re.MULTILINE)
+
+def _shift_section(text, offset):
+    body, heading, audio = text.partition(AUDIO_HEADING)
+    return body + heading + _shift_times(audio, offset)
+
+def _ocr_text(section):
+    """The OCR part of an output.md section, without the transcript"""
+    return section.partition(AUDIO_HEADING)[0].strip()
+
+def _read_segment(output_dir):
+    """Index rows of a segment run, the text of each page's output.md
+    section (without its heading) and whatever output.md has after them"""
+    with FrameIndex(os.path.join(output_dir, INDEX_FILE)) as index:
+        rows = index.frames()
+    texts = {}
+    end = 0
+    md_file = os.path.join(output_dir, 'output.md')
+    if not os.path.exists(md_file):
+        return rows, texts, ""
+    with open(md_file, 'rb') as f:
+        for row in rows:
+            if row['page'] is not None and row['text_offset'] is not None:
+                f.seek(row['text_offset'])
+                _, _, text = f.read(row['text_length']).decode('utf-8').partition('\n\n')
+                texts[row['page']] = text.strip()
+                end = max(end, row['text_offset'] + row['text_length'])
+        f.seek(end)
+        rest = f.read().decode('utf-8')
+    return rows, texts, rest
+
+def merge_segments(video_file, segments, output_dir, dedup_distance=None, search_index=False):
+    """Put the outputs of segment runs back together in output_dir.
+
+    segments are {"start", "output_dir"} in video order. Pages are copied
+    into one output.pdf without re-encoding, output.md sections are
+    renumbered with their timestamps (transcript lines too) moved on by the
+    segment's start, and frames.db is rebuilt. With dedup_distance, a
+    segment's first page is dropped when it repeats the previous segment's
+    last one (hashes within dedup_distance and no different OCR text); its
+    transcript lines go to that page instead.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pdf_file = os.path.join(output_dir, 'output.pdf')
+    md_file = os.path.join(output_dir, 'output.md')
+    frame = 0
+    page = 0
+    previous_hash = None
+    previous_text = ""  # OCR text of the previous segment's last page
+    held = None  # last page's (page, text, timestamp), written once it can take no more transcript
+    trailing = []
+    index = FrameIndex(os.path.join(output_dir, INDEX_FILE), reset=True)
+    with index, PdfWriter(pdf_file) as writer, MarkdownWriter(md_file, on_section=index.set_text) as md:
+        for segment in segments:
+            offset = segment['start']
+            rows, texts, rest = _read_segment(segment['output_dir'])
+            pages = [row for row in rows if row['page'] is not None]
+            skip = set()
+            if (dedup_distance is not None and pages and previous_hash is not None
+                    and pages[0]['phash'] is not None
+                    and hamming_distance(previous_hash, pages[0]['phash']) <= dedup_distance):
+                # The hash barely sees text, so slides on one template need their OCR text to match too
+                first_text = _ocr_text(texts.get(pages[0]['page'], ""))
+                if not (previous_text and first_text and previous_text != first_text):
+                    skip.add(pages[0]['page'])
+            writer.append_pdf(os.path.join(segment['output_dir'], 'output.pdf'),
+                              skip={number - 1 for number in skip})
+            for row in rows:
+                frame += 1
+                timestamp = row['timestamp'] + offset if row['timestamp'] is not None else None
+                index.add(frame, None, timestamp)
+                if row['phash'] is not None:
+                    index.set_hash(frame, row['phash'])
+                if row['page'] is None:
+                    continue
+                text = _shift_section(texts.get(row['page'], ""), offset)
+                if row['page'] in skip:
+                    _, heading, audio = text.partition(AUDIO_HEADING)
+                    if heading and held is not None:
+                        held_page, held_text, held_time = held
+                        if AUDIO_HEADING in held_text:
+                            held_text = held_text.rstrip() + "\n" + audio.strip()
+                        else:
+                            held_text = "\n\n".join(part for part in (held_text.strip(), AUDIO_HEADING) if part)
+                            held_text += "\n\n" + audio.strip()
+                        held = (held_page, held_text, held_time)
+                    continue
+                page += 1
+                index.set_page(frame, page, writer.image_offset(page - 1))
+                if held is not None:
+                    md.add_frame(*held)
+                held = (page, text, timestamp)
+            if pages:
+                previous_hash = pages[-1]['phash']
+                previous_text = _ocr_text(texts.get(pages[-1]['page'], ""))
+            if rest.strip():
+                trailing.append(_shift_times(rest, offset))
+        if held is not None:
+            md.add_frame(*held)
+    if trailing:
+        with open(md_file, 'a', encoding='utf-8', newline='') as f:
+            f.write("".join(trailing))
+    if search_index:
+        with FrameIndex(os.path.join(output_dir, INDEX_FILE)) as index, \
+                SearchIndex(get_search_index_file() if search_index is True else search_index) as search:
+            pages = search.add_run(video_file, output_dir, index)
+        print(f"Added {pages} pages to the search index")
+    print(f"Merged {len(segments)} segments: {page} pages")
+    return output_dir
+
+def _watch_worker(worker_pid):
+    """Kill the task's process group once its worker is gone (SIGKILLed, say),
+    so an orphaned task never races the worker that takes it over"""
+    while os.getppid() == worker_pid:
+        time.sleep(1.0)
+    os.killpg(0, signal.SIGKILL)
+
+def _run_task(events, task):
+    """Body of a task process: run the task, sending events and the outcome to events"""
+    if hasattr(os, 'setsid'):
+        os.setsid()  # own process group, so a lost lease stops ffmpeg and the OCR pool too
+        threading.Thread(target=_watch_worker, args=(os.getppid(),), daemon=True).start()
+    try:
+        options = task['options']
+        if task['kind'] == 'merge':
+            merge_segments(task['video'], task['segments'], task['output_dir'],
+                           dedup_distance=options.get('dedup_distance'),
+                           search_index=options.get('search_index', False))
+            shutil.rmtree(os.path.join(task['output_dir'], SEGMENTS_DIR), ignore_errors=True)
+        elif task['kind'] == 'segment':
+            with tempfile.TemporaryDirectory(prefix='segment_') as tmp:
+                clip = os.path.join(tmp, os.path.splitext(os.path.basename(task['video']))[0] + '.mkv')
+                cut_segment(task['video'], task['start'], task['length'], clip)
+                process_video(clip, working_dir=task['output_dir'], on_event=events.put, **options)
+        else:
+            process_video(task['video'], working_dir=task['output_dir'], on_event=events.put, **options)
+        events.put({"event": "job_end", "status": "done", "working_dir": task['output_dir']})
+    except BaseException as e:
+        events.put({"event": "job_end", "status": "failed", "error": str(e) or repr(e)})
+
+class Worker:
+    """Runs tasks from a WorkQueue until stopped (SIGTERM or Ctrl-C).
+
+    Each task runs in its own process group; while it runs the worker
+    renews the lease and writes a heartbeat with the task's progress. If
+    the lease is lost (this node was cut off long enough for another to
+    take the task over) the task's processes are killed and its result
+    dropped. On shutdown the running task is stopped and given back.
+    """
+
+    def __init__(self, root, worker_id=None, lease_seconds=LEASE_SECONDS, heartbeat_seconds=HEARTBEAT_SECONDS):
+        self.queue = WorkQueue(root)
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._stopping = False
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def run(self, once=False):
+        """Work until stopped, or with once until no task is pending or leased; returns tasks run"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._stop)
+        print(f"Worker {self.id} on queue {self.queue.root}")
+        count = 0
+        try:
+            while not self._stopping:
+                self.queue.recover(self.lease_seconds)
+                task = self.queue.claim(self.id)
+                if task is None:
+                    if once and not self.queue._ids('pending') and not self.queue._ids('leased'):
+                        break
+                    self.queue.heartbeat(self.id, task=None)
+                    self._sleep(POLL_INTERVAL)
+                    continue
+                self._run(task)
+                count += 1
+        finally:
+            self.queue.forget_worker(self.id)
+        print(f"Worker {self.id} stopped after {count} tasks")
+        return count
+
+    def _sleep(self, seconds):
+        end = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < end:
+            time.sleep(min(0.2, end - time.monotonic()))
+
+    def _run(self, task):
+        print(f"Task {task['id']} ({task['kind']}, attempt {task['attempts']}): {task['video']}")
+        context = multiprocessing.get_context("spawn")
+        events = context.Queue()
+        process = context.Process(target=_run_task, args=(events, task), name=f"task-{task['id']}")
+        process.start()
+        self.queue.heartbeat(self.id, task=task['id'])
+        outcome = None
+        progress = {}
+        renewed = time.monotonic()
+        lost = False
+        while outcome is None:
+            process.join(0.2)
+            while True:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    break
+                if event['event'] == 'progress':
+                    progress = {key: event[key] for key in ('stage', 'done', 'total', 'unit')}
+                elif event['event'] == 'job_end':
+                    outcome = event
+            if outcome is not None:
+                break
+            if not process.is_alive():
+                outcome = {"status": "crashed", "error": f"Task process exited with code {process.exitcode}"}
+                break
+            if self._stopping:
+                break
+            if time.monotonic() - renewed >= self.heartbeat_seconds:
+                if not self.queue.renew(task, self.id):
+                    lost = True
+                    break
+                renewed = time.monotonic()
+                self.queue.heartbeat(self.id, task=task['id'], **progress)
+        if outcome is None:
+            self._kill(process)
+        process.join()
+        events.close()
+
+        if lost:
+            print(f"Task {task['id']}: lease lost, dropped")
+        elif outcome is None:
+            if self.queue.release(task, self.id):
+                print(f"Task {task['id']}: stopped, back in the queue")
+            else:
+                print(f"Task {task['id']}: stopped, lease lost")
+        elif outcome['status'] == 'done':
+            if self.queue.finish(task, self.id, 'done', finished_by=self.id):
+                print(f"Task {task['id']} done: {task['output_dir']}")
+            else:
+                print(f"Task {task['id']}: lease lost before it could be marked done, dropped")
+        elif outcome['status'] == 'crashed':
+            state = 'failed' if task['attempts'] >= MAX_ATTEMPTS else 'pending'
+            if self.queue.release(task, self.id, outcome['error']):
+                print(f"Task {task['id']}: {outcome['error']} ({state})")
+            else:
+                print(f"Task {task['id']}: {outcome['error']} (lease lost)")
+        else:
+            if self.queue.finish(task, self.id, 'failed', finished_by=self.id, error=outcome['error']):
+                print(f"Task {task['id']} failed: {outcome['error']}")
+            else:
+                print(f"Task {task['id']}: lease lost before it could be marked failed, dropped")
+
+    def _kill(self, process):
+        for signum, wait in ((signal.SIGTERM, KILL_TIMEOUT), (signal.SIGKILL, None)):
+            try:
+                os.killpg(process.pid, signum)
+            except (ProcessLookupError, PermissionError):
+                return
+            if wait is not None:
+                process.join(wait)
+
+def queue_status(root):
+    """Task counts per state, leased tasks with their lease age, and workers"""
+    work_queue = WorkQueue(root)
+    now = time.time()
+    leased = []
+    for task in work_queue.tasks('leased'):
+        try:
+            age = now - os.stat(work_queue._path('leased', task['id'])).st_mtime
+        except FileNotFoundError:
+            continue
+        leased.append({"id": task['id'], "kind": task['kind'], "worker": task.get('lease', {}).get('worker'),
+                       "attempts": task['attempts'], "lease_age": round(age, 1)})
+    return {
+        "counts": {state: len(work_queue._ids(state)) for state in STATES},
+        "leased": leased,
+        "failed": [{"id": task['id'], "error": task.get('error')} for task in work_queue.tasks('failed')],
+        "workers": work_queue.workers(),
+    }